@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import secrets
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.compression import compressed_responses
+from app.config import settings
+from app.database import get_db
+from app.services.llm_scheduler import get_scheduler, scheduler_states
+from app.services.loop_monitor import loop_monitor, sampling_profiler
+from app.services.model_router import model_router
+from app.services.prefetcher import GuidancePrefetcher
+from app.state import get_prefetcher
+
+router = APIRouter()
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and require it as X-Admin-Token."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/loop", dependencies=[Depends(require_admin)])
+async def get_loop_stats(limit: int = Query(10, ge=1, le=50)):
+    """
+    Event-loop lag and the slowest blocking call sites seen so far.
+    """
+    return loop_monitor.snapshot(limit=limit)
+
+
+@router.get("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=100),
+    loop_only: bool = False
+):
+    """
+    Sample stacks for a number of seconds and return a collapsed-stack profile
+    (feed it to flamegraph.pl or speedscope).
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.PROFILE_MAX_SECONDS}")
+    if sampling_profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    thread_id = loop_monitor.loop_thread_id if loop_only else None
+    try:
+        return await sampling_profiler.profile(seconds, interval=interval_ms / 1000, thread_id=thread_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/prefetch", dependencies=[Depends(require_admin)])
+async def get_prefetch_stats(
+    hours: int = Query(24, ge=2, le=24 * 30),
+    db: AsyncSession = Depends(get_db),
+    prefetcher: GuidancePrefetcher = Depends(get_prefetcher)
+):
+    """
+    Guidance prefetch hit rate and tokens wasted on prefetches nobody opened.
+    """
+    return await prefetcher.stats(db, hours=hours)
+
+
+@router.get("/models", dependencies=[Depends(require_admin)])
+async def get_model_stats():
+    """
+    Per-route model usage: escalation rate, latency, tokens and cost per model.
+    """
+    return model_router.snapshot()
+
+
+@router.get("/llm", dependencies=[Depends(require_admin)])
+async def get_llm_scheduler_stats():
+    """
+    LLM admission control per provider: concurrency limit, queue depth and
+    wait times by priority class, for this worker and every live worker.
+    """
+    return {
+        name: {"worker": state, "cluster": await get_scheduler(name).cluster_snapshot()}
+        for name, state in scheduler_states().items()
+    }
+
+
+@router.get("/compression", dependencies=[Depends(require_admin)])
+async def get_compression_stats():
+    """
+    Pre-compressed response cache: entries, hit rate and bytes saved, plus
+    the encodings this worker offers.
+    """
+    return compressed_responses.stats()
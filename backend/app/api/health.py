@@ -1,13 +1,48 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+
+from app.state import AppState, get_state
 
 router = APIRouter()
 
 
 @router.get("/health")
-async def health_check():
-    """Health check endpoint."""
+async def health_check(state: AppState = Depends(get_state)):
+    """
+    Health check endpoint.
+    Reports the cached result of the background dependency probes.
+    """
     return {
-        "status": "healthy",
+        **state.health.snapshot,
         "service": "homework.tools",
         "version": "1.0.0"
     }
+
+
+@router.get("/health/live")
+async def liveness_check(state: AppState = Depends(get_state)):
+    """
+    Liveness probe: 503 only when the background probes have stopped running,
+    i.e. the event loop is wedged and the process should be restarted.
+    """
+    if not state.health.live:
+        return JSONResponse(status_code=503, content={"status": "stalled"})
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness_check(request: Request, state: AppState = Depends(get_state)):
+    """
+    Readiness probe: 503 until startup (and warm-up, when enabled) has finished,
+    and whenever a dependency is down or this worker is saturated, so load
+    balancers drain it instead of routing more traffic to it.
+    """
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    snapshot = state.health.snapshot
+    if not snapshot["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": snapshot["status"], "reasons": snapshot.get("reasons", [])}
+        )
+    return {"status": "ready"}
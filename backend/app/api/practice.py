@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.database import get_db
+from app.models import PracticeAttempt, PracticeProblem, Session as SessionModel, Submission
+from app.schemas import PracticeAttemptCreate, PracticeAttemptResponse
+from app.services.answer_checker import answer_checker
+from app.services.learning import learning_recorder
+from app.services.llm_scheduler import set_tenant
+from app.services.openai_client import OpenAIClient
+from app.services.problem_engine import local_problem_engine
+from app.state import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/attempts", response_model=PracticeAttemptResponse)
+async def create_practice_attempt(
+    attempt: PracticeAttemptCreate,
+    db: AsyncSession = Depends(get_db),
+    openai_client: OpenAIClient = Depends(get_openai_client)
+):
+    """
+    Check a student's answer to a practice problem and record the attempt.
+    Math answers are checked locally; free-form or ambiguous ones go to the LLM.
+    The result updates the session's learning state (mastery, misconceptions,
+    scaffolding mode).
+    """
+    problem = await db.get(PracticeProblem, attempt.problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Practice problem not found")
+
+    # Answers are stored for locally generated problems; LLM-generated ones may still be solvable locally
+    expected = problem.answer
+    if not expected:
+        solution = local_problem_engine.recognize(problem.text)
+        expected = solution.answer if solution else None
+
+    topic, submission_session_id, student_id = (await db.execute(
+        select(Submission.topic, Submission.session_id, Submission.student_id)
+        .where(Submission.id == problem.submission_id)
+    )).one()
+
+    check = answer_checker.check(expected, attempt.student_answer) if expected else None
+    if check:
+        evaluation, evaluation_path = check.as_dict(), "local"
+    else:
+        set_tenant(student_id, submission_session_id)
+        evaluation = await openai_client.evaluate_answer(
+            problem_text=problem.text,
+            student_answer=attempt.student_answer,
+            expected_answer=expected or problem.solution
+        )
+        evaluation_path = "llm"
+
+    session_id = attempt.session_id or submission_session_id
+    session = await db.get(SessionModel, session_id) if session_id else None
+
+    record = PracticeAttempt(
+        session_id=session_id,
+        problem_id=problem.id,
+        student_answer=attempt.student_answer,
+        is_correct=bool(evaluation.get("is_correct")),
+        time_spent=attempt.time_spent,
+        evaluation_path=evaluation_path
+    )
+    db.add(record)
+    await learning_recorder.record_attempt(
+        db, session, topic, record.is_correct, attempt.time_spent,
+        problem_text=problem.text, feedback=evaluation.get("feedback", "")
+    )
+    await db.commit()
+
+    logger.info(
+        "Practice attempt evaluated",
+        extra={"stage": "practice", "evaluation_path": evaluation_path, "is_correct": record.is_correct}
+    )
+
+    next_hint = evaluation.get("next_hint")
+    return PracticeAttemptResponse(
+        id=record.id,
+        is_correct=record.is_correct,
+        feedback=evaluation.get("feedback", ""),
+        hints_available=1 if next_hint else 0,
+        next_hint=next_hint,
+        evaluation_path=evaluation_path
+    )
@@ -1,51 +1,84 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Header
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Header, Query, Request
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
+from sqlalchemy.orm import load_only
 from typing import Optional, List
+from contextlib import AsyncExitStack
+import hashlib
 import uuid
+from datetime import datetime, timezone
 from pathlib import Path
-import aiofiles
 from pydantic import BaseModel
+import logging
 
 from app.database import get_db
-from app.models import Submission, Session as SessionModel
+from app.models import Submission, Session as SessionModel, Student
+from app.pagination import keyset_page, split_page
 from app.schemas import (
     SubmissionResponse,
     PracticeProblem,
+    PracticeSetResponse,
     SessionCreate,
-    SessionResponse
+    SessionResponse,
+    SessionPage,
+    SubmissionPage,
+    ParentReport
 )
-from app.services.ocr import ParsingOrchestrator
-from app.services.openai_client import openai_client
-from app.services.gemini_client import gemini_client
-from app.services.llm_service import llm_service # New import
+from app.services.idempotency import IdempotencyConflict, IdempotencyMismatch
+from app.services.learning import learning_recorder
+from app.services.llm_scheduler import llm_priority_class, set_tenant
+from app.services.openai_client import OpenAIClient
+from app.services.problem_engine import local_problem_engine
+from app.services.storage import (
+    StorageBackend, LocalStorage, StorageError, content_key, file_sha256, is_content_key, is_staging_key, staging_key
+)
+from app.state import AppState, get_state, get_storage, get_artifacts, get_prefetcher
+from app.services.artifacts import ArtifactService
+from app.services.prefetcher import GuidancePrefetcher
+from app.services.similar_problems import SimilarProblemService
+from app.services.submission_problems import SubmissionProblem, submission_problems
+from app.compression import compressed_responses
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
-parsing_orchestrator = ParsingOrchestrator()
 
-# New Pydantic model for GuidanceResponse, replacing the one from app.schemas for this context
+
 class GuidanceResponse(BaseModel):
+    id: Optional[uuid.UUID] = None  # Stored artifact; None when generation failed
     micro_explanation: str
     step_breakdown: List[dict] = []
     error_warnings: List[str] = []
     interactive_checks: List[dict] = []
     reveal_sequence: List[dict] = []
 
-# Simple in-memory store for the demo (to support the new /text and /guidance flow)
-submission_store = {}
 
-@router.post("/upload", response_model=SubmissionResponse)
-async def create_submission_upload(
-    file: UploadFile = File(...),
-    session_id: Optional[str] = Form(None),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Upload a file (image or PDF) for homework help.
-    """
-    # Validate file type
-    file_ext = Path(file.filename).suffix.lower().replace('.', '')
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'pdf': 'application/pdf',
+    'txt': 'text/plain',
+}
+
+# Leading bytes of each binary format, checked before processing a direct upload
+FILE_SIGNATURES = {
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'webp': (b'RIFF',),
+    'pdf': (b'%PDF-',),
+}
+
+
+def _upload_type(filename: str) -> tuple[str, str]:
+    """Validate an upload's extension, returning it with the submission type."""
+    file_ext = Path(filename or "").suffix.lower().replace('.', '')
     if file_ext not in settings.allowed_extensions_list:
         raise HTTPException(
             status_code=400,
@@ -59,45 +92,65 @@ async def create_submission_upload(
         file_type = "pdf"
     else:
         file_type = "text"
+    return file_ext, file_type
 
-    # Save uploaded file
-    file_id = str(uuid.uuid4())
-    file_path = Path(settings.UPLOAD_DIR) / f"{file_id}.{file_ext}"
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
 
-    # Parse the submission
-    try:
-        parsed_data = await parsing_orchestrator.parse_submission(
-            file_path=str(file_path),
-            text=None,
-            file_type=file_type
+def _check_size(size: Optional[int]):
+    if size is not None and size > settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum: {settings.MAX_UPLOAD_SIZE_MB} MB"
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Parsing error: {str(e)}")
 
-    # Classify the submission
-    if parsed_data['detected_problems']:
-        first_problem = parsed_data['detected_problems'][0]['text']
-        classification = await openai_client.classify_submission(first_problem)
-    else:
-        classification = {
-            "subject": "other",
-            "topic": "unknown",
-            "grade_level": 8,
-            "difficulty": "intermediate",
-            "prerequisites": [],
-            "detected_gaps": []
-        }
+
+async def _save_upload(file: UploadFile, storage: StorageBackend) -> tuple[str, str]:
+    """Validate and store an uploaded file, returning its storage key and submission type."""
+    file_ext, file_type = _upload_type(file.filename)
+    _check_size(file.size)
+
+    # Stored under its content hash, so re-uploads of the same file are not written twice
+    stored = await storage.store_file(file.file, file_ext, CONTENT_TYPES[file_ext])
+    return stored.key, file_type
+
+
+async def _classify_problems(problems: List[dict], openai_client: OpenAIClient) -> dict:
+    """Classify a submission by its first problem (locally solvable problems skip the LLM)."""
+    if problems:
+        first_problem = problems[0]['text']
+        solution = local_problem_engine.recognize(first_problem)
+        if solution:
+            return local_problem_engine.classify(solution)
+        return await openai_client.classify_submission(first_problem)
+    return {
+        "subject": "other",
+        "topic": "unknown",
+        "grade_level": 8,
+        "difficulty": "intermediate",
+        "prerequisites": [],
+        "detected_gaps": []
+    }
+
+
+async def _store_parsed_submission(
+    db: AsyncSession,
+    parsed_data: dict,
+    file_key: str,
+    file_type: str,
+    session_id: Optional[str],
+    state: AppState,
+    content_hash: Optional[str] = None
+) -> SubmissionResponse:
+    """Classify parsed content and persist it as a Submission."""
+    classification = await _classify_problems(parsed_data['detected_problems'], state.openai_client)
+    session = await db.get(SessionModel, uuid.UUID(session_id)) if session_id else None
 
     # Create submission record
     submission = Submission(
+        student_id=session.student_id if session else None,
         session_id=uuid.UUID(session_id) if session_id else None,
-        file_path=str(file_path),
+        file_path=file_key,
         file_type=file_type,
+        content_hash=content_hash,
         raw_text=parsed_data['raw_text'],
         parsed_problems=parsed_data['detected_problems'],
         confidence_score=int(parsed_data['confidence_score']),
@@ -110,12 +163,347 @@ async def create_submission_upload(
     )
 
     db.add(submission)
+    await db.flush()
+    await learning_recorder.record_submission(db, submission, session)
     await db.commit()
     await db.refresh(submission)
+    response = await _remember_response(state, submission)
+
+    await _index_problems(db, submission, state.similar_problems)
+    state.prefetcher.schedule(submission)
+    return response
+
+
+async def _index_problems(db: AsyncSession, submission: Submission, similar_problems: SimilarProblemService):
+    """Add a new submission's problems to the similar-problem index (best effort)."""
+    try:
+        await similar_problems.index_submission(db, submission)
+    except Exception as e:
+        await db.rollback()
+        logger.warning("Could not index submission problems: %s", e, extra={"stage": "similarity"})
 
+
+async def _use_session_tenant(db: AsyncSession, session_id: Optional[str]):
+    """Queue this request's LLM calls (OCR, classification, embeddings) under the session's student."""
+    if not session_id:
+        return
+    try:
+        session_uuid = uuid.UUID(session_id)
+    except ValueError:
+        return
+    # Only a stored session counts: an unknown id would let a client pick a fresh tenant per request
+    row = (await db.execute(
+        select(SessionModel.id, SessionModel.student_id).where(SessionModel.id == session_uuid)
+    )).one_or_none()
+    if row:
+        set_tenant(row.student_id, row.id)
+
+
+def _request_key(request: Request, idempotency_key: Optional[str], session_id: Optional[str]) -> Optional[str]:
+    """
+    Redis key for a client-supplied Idempotency-Key, scoped to the endpoint
+    and the caller (the session, or the client address without one), so
+    clients choosing the same key never see each other's submissions.
+    """
+    if not idempotency_key:
+        return None
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    if session_id:
+        caller = f"session:{session_id}"
+    else:
+        caller = f"client:{request.client.host if request.client else 'unknown'}"
+    return f"{request.url.path}:{caller}:{idempotency_key}"
+
+
+def _response_key(submission_id: uuid.UUID) -> str:
+    return f"submission:{submission_id}"
+
+
+async def _remember_response(state: AppState, submission: Submission) -> SubmissionResponse:
+    """
+    A new submission's response, also kept in the shared store: its problems
+    are stored as offsets into the compressed raw_text, so rebuilding them
+    later means loading and decompressing the whole text.
+    """
+    response = SubmissionResponse.model_validate(submission)
+    await state.store.set(_response_key(response.id), response.model_dump(mode="json"))
+    return response
+
+
+async def _load_submission(db: AsyncSession, state: AppState, submission_id: uuid.UUID) -> Optional[SubmissionResponse]:
+    """A stored submission's response, read from the shared store while it is kept there."""
+    cached = await state.store.get(_response_key(submission_id))
+    if cached is not None:
+        return SubmissionResponse.model_validate(cached)
+
+    # Expired from the store: rebuild the problems from raw_text once and keep the result again
+    result = await db.execute(
+        select(Submission)
+        .options(load_only(
+            Submission.id, Submission.subject, Submission.topic, Submission.grade_level,
+            Submission.difficulty, Submission.stored_problems, Submission.raw_text, Submission.created_at
+        ))
+        .where(Submission.id == submission_id)
+    )
+    submission = result.scalar_one_or_none()
+    return await _remember_response(state, submission) if submission else None
+
+
+def _submission_record(submission: SubmissionResponse) -> dict:
+    return {"submission_id": str(submission.id)}
+
+
+async def _idempotent(db: AsyncSession, state: AppState, key: Optional[str], fingerprint: Optional[str], create) -> SubmissionResponse:
+    """
+    Run `create` once per key across workers: concurrent retries wait for the
+    first attempt and later ones get its submission back. `fingerprint`
+    identifies the request body; reusing a key for a different body is a 422.
+    """
+    if not key:
+        return await create()
+    try:
+        submission, replay = await state.idempotency.run(key, fingerprint, create, _submission_record)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail="This request is still being processed; retry shortly")
+    except IdempotencyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if replay:
+        submission = await _load_submission(db, state, uuid.UUID(replay["submission_id"]))
+        if not submission:
+            raise HTTPException(status_code=404, detail="Submission not found")
     return submission
 
 
+async def _deduplicated(db: AsyncSession, state: AppState, session_id: Optional[str], content_hash: str, create) -> SubmissionResponse:
+    """
+    The session's existing submission for identical content, or the result of
+    `create` (run once even when retries race). Outside a session every upload
+    is processed, since identical worksheets from different students must not
+    share a submission.
+    """
+    if not session_id:
+        return await create()
+    existing = await db.scalar(
+        select(Submission.id)
+        .where(Submission.session_id == uuid.UUID(session_id), Submission.content_hash == content_hash)
+        .order_by(Submission.created_at)
+        .limit(1)
+    )
+    if existing:
+        logger.info("Returning existing submission for identical content", extra={"stage": "upload", "submission_id": str(existing)})
+        return await _load_submission(db, state, existing)
+    return await _idempotent(db, state, f"content:{session_id}:{content_hash}", content_hash, create)
+
+
+@router.post("/upload", response_model=SubmissionResponse)
+async def create_submission_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    state: AppState = Depends(get_state)
+):
+    """
+    Upload a file (image or PDF) for homework help.
+    Retries with the same Idempotency-Key header, or of the same file in the
+    same session, return the original submission.
+    """
+    async def create():
+        file_key, file_type = await _save_upload(file, state.storage)
+        return await _process_stored_upload(db, file_key, file_type, session_id, state)
+
+    await _use_session_tenant(db, session_id)
+    key = _request_key(request, idempotency_key, session_id)
+    fingerprint = await file_sha256(file.file) if key else None
+    return await _idempotent(db, state, key, fingerprint, create)
+
+
+async def _process_stored_upload(
+    db: AsyncSession,
+    file_key: str,
+    file_type: str,
+    session_id: Optional[str],
+    state: AppState
+) -> SubmissionResponse:
+    """Parse a stored upload and persist it as a Submission (unless the session already has it)."""
+    content_hash = Path(file_key).stem  # Keys are content hashes
+
+    async def create():
+        try:
+            async with state.storage.local_copy(file_key) as file_path:
+                parsed_data = await state.parsing_orchestrator.parse_submission(
+                    file_path=str(file_path),
+                    text=None,
+                    file_type=file_type
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Parsing error: {str(e)}")
+
+        return await _store_parsed_submission(db, parsed_data, file_key, file_type, session_id, state, content_hash)
+
+    return await _deduplicated(db, state, session_id, content_hash, create)
+
+
+class PresignUploadRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: str  # Hex digest of the file, computed by the client
+
+
+class CompleteUploadRequest(BaseModel):
+    key: str
+    session_id: Optional[str] = None
+
+
+@router.post("/upload/presign")
+async def presign_upload(
+    request: PresignUploadRequest,
+    storage: StorageBackend = Depends(get_storage)
+):
+    """
+    Start a direct-to-storage upload.
+    The client PUTs the file to the returned URL, then calls /upload/complete.
+    The bytes are always uploaded, to a key only this client knows: a hash
+    alone must not grant access to someone else's file. Identical content is
+    deduplicated when the upload completes.
+    """
+    file_ext, _ = _upload_type(request.filename)
+    _check_size(request.size)
+    sha256 = request.sha256.lower()
+    if not is_content_key(content_key(sha256, file_ext)):
+        raise HTTPException(status_code=400, detail="sha256 must be a hex digest")
+    key = staging_key(sha256, file_ext)
+
+    return {
+        "key": key,
+        "upload_required": True,
+        "upload": storage.presign_upload(key, CONTENT_TYPES[file_ext], request.size, sha256),
+        "expires_in": settings.STORAGE_PRESIGN_EXPIRES
+    }
+
+
+@router.put("/upload/direct/{key:path}")
+async def direct_upload(
+    key: str,
+    request: Request,
+    size: int,
+    sha256: str,
+    expires: int,
+    signature: str,
+    storage: StorageBackend = Depends(get_storage)
+):
+    """
+    Presigned upload target for the local storage backend (object stores take
+    these uploads themselves). The body must match the signed size and hash.
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Direct uploads go to object storage")
+    if not is_staging_key(key) or not storage.verify_upload(key, size, sha256, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload URL")
+
+    try:
+        await storage.put_stream(key, request.stream(), sha256, size)
+    except StorageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"key": key}
+
+
+@router.post("/upload/complete", response_model=SubmissionResponse)
+async def complete_upload(
+    request: CompleteUploadRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    state: AppState = Depends(get_state)
+):
+    """
+    Process a file uploaded directly to storage via /upload/presign.
+    The staged upload is consumed: it moves to its content key (or is dropped
+    when identical content is already stored).
+    """
+    if not is_staging_key(request.key):
+        raise HTTPException(status_code=400, detail="Invalid upload key")
+    file_ext, file_type = _upload_type(request.key)
+
+    async def create():
+        storage = state.storage
+        size = await storage.size(request.key)
+        if size is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        _check_size(size)
+
+        # A ranged read of the header is enough to reject mislabelled files before OCR
+        signatures = FILE_SIGNATURES.get(file_ext)
+        if signatures:
+            header = await storage.read_range(request.key, 0, 16)
+            if not header.startswith(signatures):
+                raise HTTPException(status_code=400, detail=f"File content is not a valid {file_ext}")
+
+        file_key = await storage.promote(request.key)
+        return await _process_stored_upload(db, file_key, file_type, request.session_id, state)
+
+    await _use_session_tenant(db, request.session_id)
+    return await _idempotent(
+        db, state, _request_key(http_request, idempotency_key, request.session_id), request.key, create
+    )
+
+
+@router.post("/upload/batch", response_model=SubmissionResponse)
+async def create_submission_upload_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    state: AppState = Depends(get_state)
+):
+    """
+    Upload several files (e.g. photos of each page of a worksheet) as one submission.
+    Images are OCR'd together in batched Vision requests.
+    """
+    if len(files) > settings.MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum: {settings.MAX_BATCH_FILES}"
+        )
+
+    async def create():
+        saved = [await _save_upload(file, state.storage) for file in files]
+        if any(file_type == "text" for _, file_type in saved):
+            raise HTTPException(status_code=400, detail="Batch uploads accept images and PDFs only")
+        content_hash = hashlib.sha256("\n".join(key for key, _ in saved).encode()).hexdigest()
+
+        async def parse_and_store():
+            # Parse the set as one submission
+            try:
+                async with AsyncExitStack() as stack:
+                    paths = [await stack.enter_async_context(state.storage.local_copy(key)) for key, _ in saved]
+                    # Multi-page worksheets yield to interactive requests for LLM capacity
+                    with llm_priority_class("batch"):
+                        parsed_data = await state.parsing_orchestrator.parse_submission_set(
+                            [(str(path), file_type) for path, (_, file_type) in zip(paths, saved)]
+                        )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Parsing error: {str(e)}")
+
+            # The first file stands in for the set; problems record their source file index
+            return await _store_parsed_submission(
+                db, parsed_data, saved[0][0], parsed_data['format'], session_id, state, content_hash
+            )
+
+        return await _deduplicated(db, state, session_id, content_hash, parse_and_store)
+
+    await _use_session_tenant(db, session_id)
+    key = _request_key(request, idempotency_key, session_id)
+    fingerprint = None
+    if key:
+        digests = [await file_sha256(file.file) for file in files]
+        fingerprint = hashlib.sha256("\n".join(digests).encode()).hexdigest()
+    return await _idempotent(db, state, key, fingerprint, create)
+
+
 class TextSubmissionCreate(BaseModel):
     text: str
     session_id: Optional[str] = None
@@ -123,10 +511,15 @@ class TextSubmissionCreate(BaseModel):
 @router.post("/text", response_model=SubmissionResponse)
 async def create_submission_text(
     submission_data: TextSubmissionCreate,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    state: AppState = Depends(get_state)
 ):
     """
     Submit typed text for homework help.
+    Retries with the same Idempotency-Key header, or of the same text in the
+    same session, return the original submission.
     """
     text = submission_data.text
     session_id = submission_data.session_id
@@ -134,26 +527,54 @@ async def create_submission_text(
     if not text or len(text.strip()) < 2:
         raise HTTPException(status_code=400, detail="Text too short")
 
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    await _use_session_tenant(db, session_id)
+    return await _idempotent(
+        db, state, _request_key(request, idempotency_key, session_id), content_hash,
+        lambda: _deduplicated(
+            db, state, session_id, content_hash,
+            lambda: _store_text_submission(db, text, session_id, content_hash, state)
+        )
+    )
+
+
+async def _store_text_submission(
+    db: AsyncSession,
+    text: str,
+    session_id: Optional[str],
+    content_hash: str,
+    state: AppState
+) -> SubmissionResponse:
+    """Classify typed text and persist it as a Submission."""
+
     # Use Gemini for immediate dual response
     # Note: We are bypassing the full parsing orchestrator for speed in this "Zero-Friction" flow
     # But we still create a submission record for history
     
-    # Classify briefly (or default)
-    classification = {
-        "subject": "general",
-        "topic": "unknown",
-        "grade_level": 8,
-        "difficulty": "intermediate",
-        "prerequisites": [],
-        "detected_gaps": []
-    }
+    # Classify locally when the problem is recognized, otherwise default
+    solution = local_problem_engine.recognize(text)
+    if solution:
+        classification = local_problem_engine.classify(solution)
+    else:
+        classification = {
+            "subject": "general",
+            "topic": "unknown",
+            "grade_level": 8,
+            "difficulty": "intermediate",
+            "prerequisites": [],
+            "detected_gaps": []
+        }
+
+    session = await db.get(SessionModel, uuid.UUID(session_id)) if session_id else None
 
     # Create submission record
     submission = Submission(
+        student_id=session.student_id if session else None,
         session_id=uuid.UUID(session_id) if session_id else None,
         file_type="text",
+        content_hash=content_hash,
         raw_text=text,
-        parsed_problems=[{"text": text, "order": 0, "type": "text"}],
+        parsed_problems=[{"text": text, "order": 0, "type": solution.kind if solution else "text", "start": 0, "end": len(text)}],
         confidence_score=100,
         subject=classification['subject'],
         topic=classification['topic'],
@@ -164,98 +585,92 @@ async def create_submission_text(
     )
 
     db.add(submission)
+    await db.flush()
+    await learning_recorder.record_submission(db, submission, session)
     await db.commit()
     await db.refresh(submission)
+    response = await _remember_response(state, submission)
 
-    return submission
+    if not solution:
+        await _index_problems(db, submission, state.similar_problems)
+    return response
+
+
+async def _get_problem(db: AsyncSession, submission_id: str, problem_index: int) -> SubmissionProblem:
+    """
+    One parsed problem of a submission (cached), or 404/400. The request's
+    LLM calls are queued under the submission's student from here on.
+    """
+    try:
+        problem = await submission_problems.get(db, uuid.UUID(submission_id), problem_index)
+    except IndexError:
+        raise HTTPException(status_code=400, detail="Invalid problem index")
+    if not problem:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    set_tenant(problem.student_id, problem.session_id)
+    return problem
 
 
 @router.get("/{submission_id}/guidance", response_model=GuidanceResponse)
 async def get_guidance(
+    request: Request,
     submission_id: str,
     problem_index: int = 0,
     x_api_key: Optional[str] = Header(None),
     x_provider: Optional[str] = Header("gemini"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    artifacts: ArtifactService = Depends(get_artifacts)
 ):
     """
     Get scaffolded guidance for a specific problem in a submission.
+    Generated once, then served from the stored artifact (kept pre-compressed).
     """
-    # Fetch submission
-    result = await db.execute(
-        select(Submission).where(Submission.id == uuid.UUID(submission_id))
-    )
-    submission = result.scalar_one_or_none()
-
-    if not submission:
-        raise HTTPException(status_code=404, detail="Submission not found")
-
-    # Get the specific problem
-    if problem_index >= len(submission.parsed_problems):
-        raise HTTPException(status_code=400, detail="Invalid problem index")
-
-    problem = submission.parsed_problems[problem_index]
-
-    # Use LLMService for the dual response (Student + Parent)
-    # We map the response to the GuidanceResponse structure
-    
-    llm_response = await llm_service.generate_dual_response(
-        user_query=problem['text'],
-        provider=x_provider,
-        api_key=x_api_key
-    )
-    
-    # Map to GuidanceResponse
-    return {
-        "micro_explanation": llm_response.get("student_response", ""),
-        "step_breakdown": [], # Not used in this view
-        "error_warnings": [
-            f"Parent Tip: {llm_response.get('parent_context', {}).get('teaching_tips', '')}",
-            f"Deeper Terms: {', '.join(llm_response.get('parent_context', {}).get('deeper_terms', []))}"
-        ],
-        "interactive_checks": [],
-        "reveal_sequence": []
-    }
+    problem = await _get_problem(db, submission_id, problem_index)
+    key = ("guidance", problem.submission_id, problem.problem_index)
+    entry = compressed_responses.get(key)
+    if entry is None:
+        guidance = await artifacts.get_guidance(
+            db, problem,
+            provider=x_provider,
+            api_key=x_api_key
+        )
+        if guidance.get("id") is None:
+            # Unsaved fallback: the next request tries generating again
+            return guidance
+        entry = compressed_responses.put(key, GuidanceResponse(**guidance))
+    return await compressed_responses.response(request, entry)
 
 
-@router.get("/{submission_id}/practice")
+@router.get("/{submission_id}/practice", response_model=PracticeSetResponse)
 async def get_practice_problems(
     submission_id: str,
     problem_index: int = 0,
-    count: int = 3,
-    db: AsyncSession = Depends(get_db)
+    count: int = Query(3, ge=1, le=settings.PRACTICE_MAX_COUNT),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    artifacts: ArtifactService = Depends(get_artifacts)
 ):
     """
-    Generate practice problems similar to the original.
+    Get practice problems similar to the original, `count` at a time from `offset`.
+    Only problems not stored yet are generated; when `pending` is non-zero the
+    rest are being generated in the background and can be fetched from `next_offset`.
     """
-    # Fetch submission
-    result = await db.execute(
-        select(Submission).where(Submission.id == uuid.UUID(submission_id))
-    )
-    submission = result.scalar_one_or_none()
+    problem = await _get_problem(db, submission_id, problem_index)
 
-    if not submission:
-        raise HTTPException(status_code=404, detail="Submission not found")
+    if offset >= settings.PRACTICE_MAX_COUNT:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PRACTICE_MAX_COUNT} practice problems per problem")
 
-    if problem_index >= len(submission.parsed_problems):
-        raise HTTPException(status_code=400, detail="Invalid problem index")
-
-    problem = submission.parsed_problems[problem_index]
+    practice_problems, pending = await artifacts.get_practice(db, problem, offset=offset, count=count)
 
-    # Generate practice problems
-    practice_problems = await openai_client.generate_practice_problems(
-        original_problem=problem['text'],
-        subject=submission.subject or "other",
-        topic=submission.topic or "unknown",
-        difficulty=submission.difficulty or "intermediate",
-        count=count
+    return PracticeSetResponse(
+        submission_id=problem.submission_id,
+        problem_index=problem_index,
+        offset=offset,
+        practice_problems=[PracticeProblem(**problem) for problem in practice_problems],
+        pending=pending,
+        next_offset=offset + len(practice_problems)
     )
 
-    return {
-        "submission_id": submission_id,
-        "practice_problems": practice_problems
-    }
-
 
 @router.post("/sessions", response_model=SessionResponse)
 async def create_session(
@@ -277,20 +692,163 @@ async def create_session(
     return session
 
 
+@router.post("/sessions/{session_id}/end", response_model=SessionResponse)
+async def end_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+    prefetcher: GuidancePrefetcher = Depends(get_prefetcher)
+):
+    """
+    End a learning session and cancel its pending guidance prefetches.
+    """
+    session = await db.get(SessionModel, uuid.UUID(session_id))
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    if session.ended_at is None:
+        session.ended_at = datetime.now(timezone.utc)
+        await db.commit()
+        await db.refresh(session)
+    prefetcher.cancel(session.id)
+
+    return session
+
+
+@router.get("/sessions/{session_id}/report", response_model=ParentReport)
+async def get_session_report(
+    session_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Parent report for a session: problems attempted, concepts mastered,
+    misconceptions and time on task.
+    """
+    session = await db.get(SessionModel, uuid.UUID(session_id))
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return await learning_recorder.report(db, session)
+
+
+# Fields a history listing can return; raw_text and parsed_problems are never loaded
+SUMMARY_COLUMNS = {
+    "session_id": Submission.session_id,
+    "file_type": Submission.file_type,
+    "subject": Submission.subject,
+    "topic": Submission.topic,
+    "grade_level": Submission.grade_level,
+    "difficulty": Submission.difficulty,
+    "confidence_score": Submission.confidence_score,
+    "problem_count": func.coalesce(func.jsonb_array_length(Submission.parsed_problems), 0),
+}
+
+
+def _summary_columns(fields: Optional[str]) -> list:
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else list(SUMMARY_COLUMNS)
+    unknown = [name for name in names if name not in SUMMARY_COLUMNS and name not in ("id", "created_at")]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [SUMMARY_COLUMNS[name].label(name) for name in dict.fromkeys(names) if name in SUMMARY_COLUMNS]
+
+
+async def _submission_page(db: AsyncSession, condition, cursor: Optional[str], limit: int, fields: Optional[str]) -> dict:
+    query = select(Submission.id, Submission.created_at, *_summary_columns(fields)).where(condition)
+    result = await db.execute(keyset_page(query, Submission.created_at, Submission.id, cursor, limit))
+    items, next_cursor = split_page([dict(row) for row in result.mappings()], limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/sessions/{session_id}/submissions", response_model=SubmissionPage, response_model_exclude_unset=True)
+async def list_session_submissions(
+    session_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated summary fields (default: all)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    A session's submissions, newest first. Pass next_cursor back as ?cursor=
+    for the next page.
+    """
+    if not await db.get(SessionModel, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return await _submission_page(db, Submission.session_id == session_id, cursor, limit, fields)
+
+
+@router.get("/students/{student_id}/submissions", response_model=SubmissionPage, response_model_exclude_unset=True)
+async def list_student_submissions(
+    student_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated summary fields (default: all)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    A student's submissions across all sessions, newest first.
+    """
+    if not await db.get(Student, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await _submission_page(db, Submission.student_id == student_id, cursor, limit, fields)
+
+
+@router.get("/students/{student_id}/sessions", response_model=SessionPage)
+async def list_student_sessions(
+    student_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    A student's learning sessions, newest first.
+    """
+    if not await db.get(Student, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+    query = select(
+        SessionModel.id, SessionModel.student_level, SessionModel.pace,
+        SessionModel.scaffolding_mode, SessionModel.started_at, SessionModel.ended_at
+    ).where(SessionModel.student_id == student_id)
+    result = await db.execute(keyset_page(query, SessionModel.started_at, SessionModel.id, cursor, limit))
+    items, next_cursor = split_page([dict(row) for row in result.mappings()], limit, created_at_key="started_at")
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.get("/{submission_id}", response_model=SubmissionResponse)
 async def get_submission(
+    request: Request,
     submission_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    state: AppState = Depends(get_state)
 ):
     """
     Get submission details by ID.
+    Submissions don't change once stored, so the response is kept pre-compressed.
     """
-    result = await db.execute(
-        select(Submission).where(Submission.id == uuid.UUID(submission_id))
+    key = ("submission", uuid.UUID(submission_id))
+    entry = compressed_responses.get(key)
+    if entry is None:
+        submission = await _load_submission(db, state, key[1])
+
+        if not submission:
+            raise HTTPException(status_code=404, detail="Submission not found")
+
+        entry = compressed_responses.put(key, submission)
+    return await compressed_responses.response(request, entry)
+
+
+@router.get("/{submission_id}/file")
+async def get_submission_file(
+    submission_id: str,
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """
+    Redirect to the submission's original file, served by the storage backend.
+    """
+    file_path = await db.scalar(
+        select(Submission.file_path).where(Submission.id == uuid.UUID(submission_id))
     )
-    submission = result.scalar_one_or_none()
 
-    if not submission:
-        raise HTTPException(status_code=404, detail="Submission not found")
+    if not file_path:
+        raise HTTPException(status_code=404, detail="File not found")
 
-    return submission
+    return RedirectResponse(storage.download_url(Path(file_path).name))
@@ -0,0 +1,126 @@
+"""
+Compress stored submission text and drop problem text duplicated from raw_text.
+
+Rows written since compression was introduced are already compact; this
+rewrites older ones in batches and can train a zstd dictionary first. Only
+problems longer than PROBLEM_TEXT_INLINE_CHARS are stored as offsets; short
+ones stored as offsets by earlier versions get their text back inline.
+
+Usage (from backend/):
+    python -m app.compact_submissions [--batch-size 200] [--dry-run]
+    python -m app.compact_submissions --train-dictionary 1 [--samples 5000]
+
+A trained dictionary is written to TEXT_DICTIONARY_DIR/<id>.zdict. Deploy it
+to every worker before setting TEXT_DICTIONARY_ID=<id>, then run with
+--recompress to rewrite existing rows with it.
+"""
+import argparse
+import asyncio
+import uuid
+from pathlib import Path
+from sqlalchemy import LargeBinary, func, or_, select, true, type_coerce
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.models import Submission
+from app.text_storage import ZSTD_MAGIC, compact_problems, expand_problems, train_dictionary
+
+_SAMPLE_CHARS = 8192  # Dictionaries learn from many small samples better than from a few large ones
+
+
+async def train(dict_id: int, samples: int):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Submission.raw_text).where(Submission.raw_text.is_not(None)).order_by(func.random()).limit(samples)
+        )
+        texts = [
+            text[start:start + _SAMPLE_CHARS]
+            for text in result.scalars() if text
+            for start in range(0, len(text), _SAMPLE_CHARS)
+        ]
+    if len(texts) < 100:
+        raise SystemExit(f"Only {len(texts)} samples; need at least 100 to train a useful dictionary")
+
+    path = Path(settings.TEXT_DICTIONARY_DIR) / f"{dict_id}.zdict"
+    if path.exists():
+        raise SystemExit(f"{path} already exists; dictionary ids can't be reused")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(train_dictionary(texts, dict_id))
+    print(f"Wrote {path} from {len(texts)} samples")
+
+
+async def compact(batch_size: int, dry_run: bool, recompress: bool):
+    stored = type_coerce(Submission.raw_text, LargeBinary)
+    needs_work = or_(
+        func.substring(stored, 1, 4) != ZSTD_MAGIC,
+        # Long problems still carrying their text, or short ones stored as offsets
+        func.jsonb_path_exists(
+            Submission.stored_problems,
+            f'$[*] ? (exists(@.text) && exists(@.start) && @.text like_regex "^.{{{settings.PROBLEM_TEXT_INLINE_CHARS + 1}}}" flag "s")'
+        ),
+        func.jsonb_path_exists(
+            Submission.stored_problems,
+            f'$[*] ? (exists(@.text_span) && @.end - @.start <= {settings.PROBLEM_TEXT_INLINE_CHARS})'
+        )
+    )
+    if recompress:
+        # E.g. after switching TEXT_DICTIONARY_ID
+        needs_work = true()
+
+    last_id = uuid.UUID(int=0)
+    rows = before = after = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(
+                select(Submission.id)
+                .where(Submission.id > last_id, Submission.raw_text.is_not(None), needs_work)
+                .order_by(Submission.id)
+                .limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            last_id = ids[-1]
+            before += await db.scalar(select(func.sum(func.octet_length(stored))).where(Submission.id.in_(ids))) or 0
+
+            submissions = (await db.execute(select(Submission).where(Submission.id.in_(ids)))).scalars().all()
+            for submission in submissions:
+                flag_modified(submission, "raw_text")
+                problems = expand_problems(submission.raw_text, submission.stored_problems)
+                submission.stored_problems = compact_problems(submission.raw_text, problems)
+            if dry_run:
+                await db.rollback()
+            else:
+                await db.commit()
+                after += await db.scalar(select(func.sum(func.octet_length(stored))).where(Submission.id.in_(ids))) or 0
+            rows += len(ids)
+            print(f"{rows} rows processed", flush=True)
+
+    if rows and not dry_run:
+        print(f"raw_text: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    elif not rows:
+        print("Nothing to compact")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Count rows that need work without changing them")
+    parser.add_argument("--recompress", action="store_true", help="Rewrite every row, e.g. with a new dictionary")
+    parser.add_argument("--train-dictionary", type=int, metavar="ID", help="Train a dictionary with this id instead of compacting")
+    parser.add_argument("--samples", type=int, default=5000, help="Submissions sampled for training")
+    args = parser.parse_args()
+
+    try:
+        if args.train_dictionary is not None:
+            if not 0 < args.train_dictionary < 2 ** 31:
+                raise SystemExit("Dictionary id must be between 1 and 2^31 - 1")
+            await train(args.train_dictionary, args.samples)
+        else:
+            await compact(args.batch_size, args.dry_run, args.recompress)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+"""
+HTTP response compression.
+
+CompressionMiddleware compresses JSON and text responses with the best
+encoding the client accepts (br when brotli is installed, zstd, gzip).
+Responses whose body never changes once stored (stored guidance,
+submissions) are served from CompressedResponseCache instead, which keeps
+each encoding's bytes so they are compressed once per worker rather than
+on every request.
+"""
+import asyncio
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+import zstandard as zstd
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.config import settings
+
+try:
+    import brotli  # Optional: adds the br encoding
+except ImportError:
+    brotli = None
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+_local = threading.local()
+
+
+def _zstd_compress(body: bytes) -> bytes:
+    # Compressor objects aren't thread-safe and large bodies are compressed in worker threads
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        compressor = zstd.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL)
+        _local.compressor = compressor
+    return compressor.compress(body)
+
+
+_ENCODERS = {
+    "zstd": _zstd_compress,
+    "gzip": lambda body: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0),
+}
+if brotli is not None:
+    _ENCODERS["br"] = lambda body: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+_PREFERENCE = ("br", "zstd", "gzip")  # Among encodings the client accepts equally, smallest output first
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header, or None to send the body as is."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = [
+        (weights.get(name, wildcard), -rank, name)
+        for rank, name in enumerate(_PREFERENCE)
+        if name in _ENCODERS and weights.get(name, wildcard) > 0
+    ]
+    return max(candidates)[2] if candidates else None
+
+
+async def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a body, in a worker thread when it is large enough to stall the event loop."""
+    encode = _ENCODERS[encoding]
+    if len(body) >= settings.COMPRESSION_OFFLOAD_BYTES:
+        return await asyncio.to_thread(encode, body)
+    return encode(body)
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        content_type.startswith(_COMPRESSIBLE_TYPES)
+        and "content-encoding" not in headers
+        and "content-range" not in headers
+    )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete JSON/text responses of at least
+    COMPRESSION_MIN_BYTES. Streamed bodies (file downloads) and responses
+    that are already encoded pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            # First body message: decide now, with the headers still held back
+            passthrough = True
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if not is_compressible(headers):
+                await send(start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if not encoding or message.get("more_body") or len(body) < settings.COMPRESSION_MIN_BYTES:
+                await send(start)
+                await send(message)
+                return
+
+            body = await compress_body(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class _CompressedEntry:
+    """A serialized response and its encoded variants, each compressed at most once."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.encoded: dict[str, asyncio.Future] = {}
+
+    async def encode(self, encoding: str) -> bytes:
+        future = self.encoded.get(encoding)
+        if future is None:
+            # Shared so concurrent first requests don't each compress it
+            future = asyncio.ensure_future(compress_body(self.body, encoding))
+            self.encoded[encoding] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self.encoded.pop(encoding, None)
+            raise
+
+
+class CompressedResponseCache:
+    """
+    Per-worker LRU of immutable JSON responses kept pre-compressed.
+
+    Only for resources whose serialized body can't change once cached, such
+    as stored guidance and submissions; the response goes out with the
+    Content-Encoding already set, so CompressionMiddleware leaves it alone.
+    """
+
+    def __init__(self, max_entries: int = settings.COMPRESSED_RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _CompressedEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, key: Hashable) -> Optional[_CompressedEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, payload: BaseModel) -> _CompressedEntry:
+        """Serialize a response model and cache it under `key`."""
+        entry = _CompressedEntry(payload.model_dump_json(by_alias=True).encode("utf-8"))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def response(self, request: Request, entry: _CompressedEntry) -> Response:
+        """The entry encoded for this request's Accept-Encoding."""
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = negotiate(request.headers.get("accept-encoding")) if settings.COMPRESSION_ENABLED else None
+        if not encoding or len(entry.body) < settings.COMPRESSION_MIN_BYTES:
+            return Response(entry.body, media_type="application/json", headers=headers)
+        body = await entry.encode(encoding)
+        self.bytes_saved += len(entry.body) - len(body)
+        headers["Content-Encoding"] = encoding
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "encodings": sorted(_ENCODERS)
+        }
+
+
+compressed_responses = CompressedResponseCache()
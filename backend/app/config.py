@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -7,12 +7,21 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # Override for OpenAI-compatible endpoints (e.g. benchmark fakes)
+
+    # Google Gemini
+    GEMINI_API_ENDPOINT: Optional[str] = None  # Override; uses the REST transport when set
 
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 5  # Per worker process
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
 
     # Redis
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50  # Per worker process
+    SHARED_STATE_TTL: int = 86400  # Default expiry of cross-worker state in Redis
 
     # Environment
     ENVIRONMENT: str = "development"
@@ -25,6 +34,105 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
 
+    # Startup
+    DB_CREATE_TABLES: bool = True  # Run create_all on startup; disable when the schema is managed separately
+    STARTUP_WARMUP: bool = False  # Warm DB/Redis connections and SDK imports in the background
+    STARTUP_WARMUP_TIMEOUT: float = 10.0
+    STARTUP_BUDGET_MS: int = 1500  # Slower startups are logged as warnings
+
+    # Health checks
+    HEALTH_PROBE_INTERVAL: float = 5.0  # Seconds between background dependency probes
+    HEALTH_PROBE_TIMEOUT: float = 2.0
+    HEALTH_MAX_POOL_SATURATION: float = 0.9  # Not ready when this share of DB connections is checked out
+    HEALTH_MAX_PDF_QUEUE: int = 20  # Not ready when more PDF jobs than this are waiting
+    HEALTH_MIN_FREE_DISK_MB: int = 500
+
+    # Circuit breakers (per LLM provider)
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before the circuit opens
+    CIRCUIT_RESET_SECONDS: float = 30.0  # How long it stays open before a trial call
+    CIRCUIT_BYOK_MAX_KEYS: int = 1000  # Users' own keys tracked, least recently used evicted first
+
+    # Model routing: the small model answers first and the large one only
+    # when the small one's output fails validation
+    MODEL_ROUTING_ENABLED: bool = True
+    MODEL_SMALL: str = "gpt-4o-mini"
+    MODEL_LARGE: str = "gpt-4o"
+    MODEL_SMALL_MAX_GRADE: int = 6  # Higher grade levels go straight to the large model
+    MODEL_SMALL_DIFFICULTIES: List[str] = ["basic", "intermediate"]
+    MODEL_SMALL_MAX_PROMPT_CHARS: int = 4000  # Longer prompts go straight to the large model
+    MODEL_PRICES: Dict[str, List[float]] = {  # USD per 1M input / output tokens, for cost metrics
+        "gpt-4o": [2.5, 10.0],
+        "gpt-4o-mini": [0.15, 0.6],
+    }
+
+    # LLM request scheduling (per provider and worker)
+    LLM_CONCURRENCY_INITIAL: int = 8
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 32
+    LLM_LATENCY_TARGET_MS: float = 10000.0  # Slower calls shrink the concurrency limit
+    LLM_PRIORITY_AGING_SECONDS: float = 30.0  # Each this long spent waiting raises a request one priority class
+    LLM_TENANT_WEIGHTS: Dict[str, float] = {}  # Fair-queuing weight by tenant ("student:<id>", "session:<id>" or client IP; default 1)
+    LLM_SYNC_INTERVAL: float = 1.0  # Seconds between exchanges of throttling signals through Redis
+
+    # Similar-problem reuse
+    SIMILARITY_ENABLED: bool = True
+    EMBEDDING_PROVIDER: str = "hashing"  # hashing (local), openai
+    EMBEDDING_DIM: int = 256
+    SIMILARITY_THRESHOLD: float = 0.92  # Cosine similarity above which a prior problem's outputs are reused
+    SIMILARITY_INDEX_MODE: str = "exact"  # exact (NumPy), hnsw (requires hnswlib)
+    SIMILARITY_INDEX_PATH: str = "data/similarity_index"
+    SIMILARITY_REFRESH_SECONDS: float = 30.0  # How often workers pick up problems indexed elsewhere
+
+    # Generated guidance and practice
+    PRACTICE_INITIAL_COUNT: int = 2  # Practice problems generated before responding; the rest follow in the background
+    PRACTICE_MAX_COUNT: int = 20  # Most practice problems kept per parsed problem
+    GENERATION_LOCK_SECONDS: int = 120  # Longest one worker holds a problem's generation lock
+    SUBMISSION_PROBLEM_CACHE_SIZE: int = 2048  # Parsed problems cached per worker for guidance/practice requests
+
+    # Learning state (event log aggregates)
+    MASTERY_STREAK: int = 3  # Consecutive correct answers on a topic that count as mastering it
+    MISCONCEPTION_STREAK: int = 2  # Consecutive wrong answers on a topic that flag a misconception
+    SCAFFOLDING_HEAVY_STREAK: int = 2  # Consecutive wrong answers in a session that switch to heavy scaffolding
+    SCAFFOLDING_MINIMAL_STREAK: int = 4  # Consecutive correct answers in a session that switch to minimal scaffolding
+
+    # Stored text compression (zstd)
+    TEXT_COMPRESSION_LEVEL: int = 6
+    TEXT_COMPRESSION_MIN_BYTES: int = 128  # Shorter texts are stored as plain UTF-8
+    TEXT_DICTIONARY_DIR: str = "data/zstd"  # Trained dictionaries (<id>.zdict); every worker needs all ids ever used
+    TEXT_DICTIONARY_ID: int = 0  # Dictionary new text is compressed with (0: none)
+    # Problems up to this long keep their text inline, so guidance/practice for them never read raw_text;
+    # longer ones are stored as offsets into raw_text
+    PROBLEM_TEXT_INLINE_CHARS: int = 256
+
+    # Response compression
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024  # Smaller responses gain less than the encoding costs
+    COMPRESSION_OFFLOAD_BYTES: int = 65536  # Larger bodies are compressed in a worker thread, off the event loop
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_BROTLI_QUALITY: int = 5  # br needs the optional brotli package
+    COMPRESSED_RESPONSE_CACHE_SIZE: int = 2048  # Pre-compressed guidance/submission responses kept per worker
+
+    # Speculative guidance prefetch
+    PREFETCH_GUIDANCE: bool = False  # Generate guidance for the first problems as soon as an upload is parsed
+    PREFETCH_PROBLEMS: int = 2  # Problems prefetched per submission
+    PREFETCH_CONCURRENCY: int = 4  # Prefetches generating at once per worker
+    PREFETCH_MAX_QUEUE_SECONDS: float = 60.0  # Prefetches that waited longer for a slot are dropped
+    PREFETCH_PROVIDER: str = "gemini"
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json, text
+    LOG_QUEUE_SIZE: int = 10000  # Records buffered for the writer thread before dropping
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1  # Fraction of DEBUG records kept
+
+    # Diagnostics
+    ADMIN_TOKEN: Optional[str] = None  # Enables /api/admin endpoints when set
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL_MS: int = 50
+    LOOP_BLOCK_THRESHOLD_MS: int = 100
+    PROFILE_MAX_SECONDS: int = 60
+
     # Rate Limiting
     RATE_LIMIT_FREE_TIER: int = 10
     RATE_LIMIT_PAID_TIER: int = 1000
@@ -33,11 +141,56 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE_MB: int = 10
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png,pdf,txt"
     UPLOAD_DIR: str = "uploads"
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # A completed Idempotency-Key replays its submission this long
+    IDEMPOTENCY_LOCK_SECONDS: int = 300  # Longest an attempt holds its key (covers a worker dying mid-request)
+    IDEMPOTENCY_WAIT_SECONDS: float = 120.0  # Retries wait this long for the first attempt before a 409
+
+    # Upload storage
+    STORAGE_BACKEND: str = "local"  # local, s3
+    STORAGE_PRESIGN_EXPIRES: int = 900  # Seconds a presigned upload/download URL stays valid
+    S3_BUCKET: Optional[str] = None
+    S3_PREFIX: str = "uploads/"
+    S3_ENDPOINT_URL: Optional[str] = None  # For S3-compatible stores such as MinIO
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None  # Falls back to the default AWS credential chain
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+
+    # PDF Processing
+    PDF_WORKER_THREADS: int = 4
+    PDF_NATIVE_MIN_CHARS: int = 25  # Below this a page with images is treated as scanned
+    PDF_MAX_VISION_PAGES: int = 5
+    PDF_RENDER_ZOOM: float = 2.0
+
+    # Local OCR (tried per region before Vision)
+    OCR_PROVIDERS: str = "tesseract,vision"  # In order; local engines read each region, Vision gets what they escalate
+    TESSERACT_CMD: str = "tesseract"  # Local OCR is skipped when this binary is not installed
+    TESSERACT_LANG: str = "eng"
+    OCR_LOCAL_CONCURRENCY: int = 4  # Tesseract processes running at once per worker
+    OCR_LOCAL_TIMEOUT_SECONDS: float = 20.0
+    OCR_LOCAL_MIN_CONFIDENCE: float = 85.0  # Mean word confidence (0-100) needed to skip Vision
+    OCR_LOCAL_WORD_CONFIDENCE: float = 60.0  # Words below this count as unreadable
+    OCR_LOCAL_MAX_LOW_WORDS: float = 0.15  # A larger share of unreadable words is treated as handwriting
+    OCR_LOCAL_MIN_WORDS: int = 3  # Regions with fewer words go to Vision
+    OCR_LOCAL_ESCALATE_MATH: bool = True  # Send exponents, radicals and stacked fractions to Vision
+
+    # Layout analysis / Vision
+    LAYOUT_ANALYSIS_SIZE: int = 800  # Long side in pixels of the preview used to find regions
+    LAYOUT_MAX_REGIONS: int = 8  # Per page; nearby regions are merged beyond this
+    LAYOUT_PADDING: float = 0.01  # Fraction of page size added around each region
+    VISION_MAX_CROP_SIDE: int = 2048
+    VISION_MAX_CONCURRENCY: int = 4
+    VISION_BATCH_SIZE: int = 4  # Images packed into one Vision request
+    VISION_CONFIDENCE: float = 95.0  # Vision reports no confidence of its own; assumed for its regions
+    MAX_BATCH_FILES: int = 10  # Files accepted by the multi-file upload endpoint
 
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
+    @property
+    def ocr_providers_list(self) -> List[str]:
+        return [name.strip() for name in self.OCR_PROVIDERS.split(",") if name.strip()]
+
     @property
     def allowed_extensions_list(self) -> List[str]:
         return [ext.strip() for ext in self.ALLOWED_EXTENSIONS.split(",")]
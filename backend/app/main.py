@@ -2,32 +2,83 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
+import time
 
 from app.config import settings
-from app.api import submissions, health
+from app.api import submissions, practice, health, admin
+from app.compression import CompressionMiddleware
 from app.database import engine, Base
+from app.migrations import lock_schema, run_migrations
+from app.services.loop_monitor import loop_monitor
+from app.logging_config import RequestContextMiddleware, setup_logging, shutdown_logging
+from app.state import AppState
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
     # Startup
-    print("🚀 Starting homework.tools backend...")
+    started = time.perf_counter()
+    setup_logging()
+    logger.info("Starting homework.tools backend", extra={"stage": "startup"})
+    app.state.ready = False
 
     # Create database tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if settings.DB_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await lock_schema(conn)
+            await conn.run_sync(Base.metadata.create_all)
+            await run_migrations(conn)
 
     # Create upload directory
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    if settings.STORAGE_BACKEND == "local":
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+
+    # Connection pools and services shared by this worker's requests
+    app.state.services = AppState.create()
+    await app.state.services.start()
+
+    # Watch for callbacks that block the event loop
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    # Serve immediately; readiness flips once warm-up is done
+    warmup_task = None
+    if settings.STARTUP_WARMUP:
+        warmup_task = asyncio.create_task(_warm_up(app))
+    else:
+        app.state.ready = True
 
-    print("✅ Backend ready!")
+    startup_ms = round((time.perf_counter() - started) * 1000, 1)
+    if startup_ms > settings.STARTUP_BUDGET_MS:
+        logger.warning(
+            "Startup took %.0f ms (budget %d ms)", startup_ms, settings.STARTUP_BUDGET_MS,
+            extra={"stage": "startup", "startup_ms": startup_ms}
+        )
+    logger.info("Backend ready", extra={"stage": "startup", "startup_ms": startup_ms})
 
     yield
 
     # Shutdown
-    print("👋 Shutting down...")
+    logger.info("Shutting down", extra={"stage": "shutdown"})
+    app.state.ready = False
+    if warmup_task:
+        warmup_task.cancel()
+    await loop_monitor.stop()
+    await app.state.services.close()
+    await engine.dispose()
+    shutdown_logging()
+
+
+async def _warm_up(app: FastAPI):
+    results = await app.state.services.warm_up()
+    app.state.ready = True
+    logger.info("Warm-up finished", extra={"stage": "startup", "warmup": results})
 
 
 app = FastAPI(
@@ -46,13 +97,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for uploads
-if os.path.exists(settings.UPLOAD_DIR):
-    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Compress JSON responses for slow (mobile) connections
+app.add_middleware(CompressionMiddleware)
+
+# Request IDs for log correlation
+app.add_middleware(RequestContextMiddleware)
+
+# Mount static files for uploads (object storage serves its own presigned URLs)
+if settings.STORAGE_BACKEND == "local":
+    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR, check_dir=False), name="uploads")
 
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(submissions.router, prefix="/api/submissions", tags=["submissions"])
+app.include_router(practice.router, prefix="/api/practice", tags=["practice"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/")
@@ -0,0 +1,68 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Key of the advisory lock that serializes schema setup across workers and replicas
+SCHEMA_LOCK_ID = 0x686F6D65  # "home"
+
+# create_all only creates missing tables; columns added to existing tables
+# are listed here. Statement n is schema version n: append only, never
+# reorder or edit applied entries. Each still has to be idempotent, since
+# databases set up before versioning run them all once.
+STATEMENTS = [
+    "ALTER TABLE guidance_artifacts ADD COLUMN IF NOT EXISTS tokens INTEGER",
+    "ALTER TABLE guidance_artifacts ADD COLUMN IF NOT EXISTS prefetched BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE guidance_artifacts ADD COLUMN IF NOT EXISTS served_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE practice_attempts ADD COLUMN IF NOT EXISTS evaluation_path VARCHAR(10)",
+    "CREATE INDEX IF NOT EXISTS ix_misconceptions_session_id ON misconceptions (session_id)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_session_id_created_at_id ON submissions (session_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_student_id_created_at_id ON submissions (student_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_sessions_student_id_started_at_id ON sessions (student_id, started_at, id)",
+    """DO $$ BEGIN
+         IF (SELECT data_type FROM information_schema.columns
+             WHERE table_name = 'submissions' AND column_name = 'parsed_problems') = 'json' THEN
+           ALTER TABLE submissions ALTER COLUMN parsed_problems TYPE JSONB USING parsed_problems::jsonb;
+         END IF;
+       END $$""",
+    # Existing raw_text becomes plain UTF-8 bytes; python -m app.compact_submissions compresses it
+    """DO $$ BEGIN
+         IF (SELECT data_type FROM information_schema.columns
+             WHERE table_name = 'submissions' AND column_name = 'raw_text') = 'text' THEN
+           ALTER TABLE submissions ALTER COLUMN raw_text TYPE BYTEA USING convert_to(raw_text, 'UTF8');
+         END IF;
+       END $$""",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_session_id_content_hash ON submissions (session_id, content_hash)",
+    # Submissions used to leave student_id empty; students' history is listed by it
+    """UPDATE submissions SET student_id = sessions.student_id FROM sessions
+       WHERE submissions.session_id = sessions.id AND submissions.student_id IS NULL AND sessions.student_id IS NOT NULL""",
+]
+
+
+async def lock_schema(conn: AsyncConnection):
+    """
+    Hold the schema lock until the transaction ends, so only one worker at a
+    time runs create_all and migrations; the others wait, then find nothing
+    left to do.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+
+
+async def run_migrations(conn: AsyncConnection):
+    """Apply the STATEMENTS newer than the recorded schema version (call after lock_schema and create_all)."""
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, applied_at TIMESTAMP WITH TIME ZONE DEFAULT now())"
+    ))
+    current = await conn.scalar(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations"))
+    pending = list(enumerate(STATEMENTS, start=1))[current:]
+    for version, statement in pending:
+        await conn.execute(text(statement))
+        await conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+    if pending:
+        logger.info(
+            "Migrated schema from version %d to %d", current, len(STATEMENTS),
+            extra={"stage": "startup", "schema_version": len(STATEMENTS)}
+        )
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary, UniqueConstraint, Index, event
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
 import uuid
 from app.database import Base
+from app.text_storage import CompressedText, compact_problems, expand_problems
 
 
 class Student(Base):
@@ -20,6 +22,7 @@ class Student(Base):
 class Session(Base):
     """Learning session model."""
     __tablename__ = "sessions"
+    __table_args__ = (Index("ix_sessions_student_id_started_at_id", "student_id", "started_at", "id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"), nullable=True)
@@ -35,6 +38,12 @@ class Session(Base):
 class Submission(Base):
     """Problem submission model."""
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Keyset pagination of history listings
+        Index("ix_submissions_session_id_created_at_id", "session_id", "created_at", "id"),
+        Index("ix_submissions_student_id_created_at_id", "student_id", "created_at", "id"),
+        Index("ix_submissions_session_id_content_hash", "session_id", "content_hash"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"), nullable=True)
@@ -43,10 +52,13 @@ class Submission(Base):
     # Original content
     file_path = Column(String(500), nullable=True)
     file_type = Column(String(50))  # image, pdf, text
-    raw_text = Column(Text)
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the upload (or text); re-uploads in a session return this row
+    raw_text = Column(CompressedText)  # zstd; see app/text_storage.py
 
-    # Parsed content
-    parsed_problems = Column(JSON, default=list)
+    # Parsed content: JSONB so one problem can be read with parsed_problems -> idx.
+    # Problems whose text is a slice of raw_text are stored as offsets only;
+    # use parsed_problems, which restores the text.
+    stored_problems = Column("parsed_problems", JSONB, default=list)
     confidence_score = Column(Integer, default=0)  # 0-100
 
     # Classification
@@ -59,6 +71,72 @@ class Submission(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @hybrid_property
+    def parsed_problems(self) -> list:
+        return expand_problems(self.raw_text, self.stored_problems)
+
+    @parsed_problems.inplace.setter
+    def _parsed_problems_setter(self, problems: list):
+        self.stored_problems = problems  # Compacted on flush, once raw_text is known
+
+    @parsed_problems.inplace.expression
+    @classmethod
+    def _parsed_problems_expression(cls):
+        return cls.stored_problems
+
+
+@event.listens_for(Submission, "before_insert")
+@event.listens_for(Submission, "before_update")
+def _compact_problems(mapper, connection, submission: Submission):
+    submission.stored_problems = compact_problems(submission.raw_text, submission.stored_problems)
+
+
+class ProblemEmbedding(Base):
+    """Embedding of one parsed problem, feeding the similar-problem index."""
+    __tablename__ = "problem_embeddings"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)  # Monotonic; indexes catch up by id
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), index=True)
+    problem_index = Column(Integer)
+    embedder = Column(String(50))  # hashing, openai
+    embedding = Column(LargeBinary)  # float32 vector, EMBEDDING_DIM long
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class GuidanceArtifact(Base):
+    """Guidance generated for one problem of a submission; served on every re-visit."""
+    __tablename__ = "guidance_artifacts"
+    __table_args__ = (UniqueConstraint("submission_id", "problem_index"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), nullable=False)
+    problem_index = Column(Integer, nullable=False)
+    source = Column(String(20))  # local, llm, reused
+    provider = Column(String(20), nullable=True)  # LLM provider when source is llm
+    content = Column(JSON)  # GuidanceResponse fields
+    tokens = Column(Integer, nullable=True)  # LLM tokens spent generating it
+    prefetched = Column(Boolean, default=False)  # Generated speculatively after upload
+    served_at = Column(DateTime(timezone=True), nullable=True)  # First request for a prefetched artifact
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PracticeProblem(Base):
+    """Practice problem generated for one problem of a submission, in display order."""
+    __tablename__ = "practice_problems"
+    __table_args__ = (UniqueConstraint("submission_id", "problem_index", "position"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), nullable=False)
+    problem_index = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)  # 0-based order within the problem's practice set
+    text = Column(Text)
+    difficulty = Column(String(20))  # basic, intermediate, advanced
+    variation_type = Column(String(50))
+    solution = Column(Text, nullable=True)
+    answer = Column(String(255), nullable=True)  # Known when generated locally
+    source = Column(String(20))  # local, llm, reused
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class PracticeAttempt(Base):
     """Student practice attempt model."""
@@ -66,11 +144,12 @@ class PracticeAttempt(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"))
-    problem_id = Column(UUID(as_uuid=True))  # Links to generated practice problem
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("practice_problems.id"))
     student_answer = Column(Text)
     is_correct = Column(Boolean)
     hints_used = Column(Integer, default=0)
     time_spent = Column(Integer)  # seconds
+    evaluation_path = Column(String(10), nullable=True)  # local, llm
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -80,10 +159,67 @@ class Misconception(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"))
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"))
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), index=True)
     topic = Column(String(100))
     description = Column(Text)
     example_problem = Column(Text, nullable=True)
     detected_at = Column(DateTime(timezone=True), server_default=func.now())
     resolved = Column(Boolean, default=False)
     resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class LearningEvent(Base):
+    """Append-only log of what a student did; the *Stats tables are maintained from it on write."""
+    __tablename__ = "learning_events"
+    __table_args__ = (Index("ix_learning_events_session_id_id", "session_id", "id"),)
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"), nullable=True, index=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), nullable=True)
+    kind = Column(String(30), nullable=False)  # submission, attempt, mastered, misconception, misconception_resolved
+    topic = Column(String(100), nullable=True)
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), nullable=True)
+    is_correct = Column(Boolean, nullable=True)  # Attempts only
+    time_spent = Column(Integer, nullable=True)  # seconds
+    data = Column(JSON, default=dict)  # Kind-specific details
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SessionStats(Base):
+    """Running totals for one session, updated with each LearningEvent."""
+    __tablename__ = "session_stats"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), primary_key=True)
+    submissions = Column(Integer, default=0, nullable=False)
+    problems_submitted = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    time_on_task = Column(Integer, default=0, nullable=False)  # seconds
+    streak = Column(Integer, default=0, nullable=False)  # Consecutive correct (> 0) or incorrect (< 0) attempts
+    last_event_id = Column(BigInteger, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SessionTopicStats(Base):
+    """Practice results for one topic within a session."""
+    __tablename__ = "session_topic_stats"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), primary_key=True)
+    topic = Column(String(100), primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    streak = Column(Integer, default=0, nullable=False)
+    mastered_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StudentTopicStats(Base):
+    """Practice results for one topic across all of a student's sessions."""
+    __tablename__ = "student_topic_stats"
+
+    student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"), primary_key=True)
+    topic = Column(String(100), primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    streak = Column(Integer, default=0, nullable=False)
+    time_on_task = Column(Integer, default=0, nullable=False)  # seconds
+    mastered_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,41 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """Opaque cursor for the row a page ended on."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query: Select, created_at_column, id_column, cursor: Optional[str], limit: int) -> Select:
+    """
+    Newest-first page of `query` after `cursor`, one row over `limit` so the
+    caller can tell whether there is a next page. Seeks on (created_at, id)
+    instead of OFFSET, so late pages cost the same as the first one given an
+    index on the filter column plus (created_at, id).
+    """
+    if cursor:
+        query = query.where(tuple_(created_at_column, id_column) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: list, limit: int, created_at_key: str = "created_at") -> Tuple[list, Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page (None on the last page)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[created_at_key], last["id"])
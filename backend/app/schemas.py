@@ -13,6 +13,10 @@ class Problem(BaseModel):
     text: str
     order: int = 0
     type: Optional[str] = None
+    label: Optional[str] = None
+    start: Optional[int] = None  # Offset into raw_text
+    end: Optional[int] = None
+    parts: List[dict] = []
 
 
 class ParsedSubmission(BaseModel):
@@ -54,6 +58,26 @@ class SubmissionResponse(BaseModel):
         from_attributes = True
 
 
+class SubmissionSummary(BaseModel):
+    """Submission in a history listing; heavy text columns are left out."""
+    id: UUID
+    created_at: datetime
+    session_id: Optional[UUID] = None
+    file_type: Optional[str] = None
+    subject: Optional[str] = None
+    topic: Optional[str] = None
+    grade_level: Optional[int] = None
+    difficulty: Optional[str] = None
+    confidence_score: Optional[int] = None
+    problem_count: Optional[int] = None
+
+
+class SubmissionPage(BaseModel):
+    """One page of submissions, newest first."""
+    items: List[SubmissionSummary]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
+
+
 # ============================================================================
 # Guidance Schemas
 # ============================================================================
@@ -102,11 +126,22 @@ class PracticeProblem(BaseModel):
     solution: Optional[str] = None  # Hidden by default
 
 
+class PracticeSetResponse(BaseModel):
+    """A window of a problem's stored practice set."""
+    submission_id: UUID
+    problem_index: int
+    offset: int
+    practice_problems: List[PracticeProblem]
+    pending: int = 0  # Requested problems still being generated; fetch again from next_offset
+    next_offset: int
+
+
 class PracticeAttemptCreate(BaseModel):
     """Create practice attempt."""
     problem_id: UUID
     student_answer: str
     time_spent: int  # seconds
+    session_id: Optional[UUID] = None
 
 
 class PracticeAttemptResponse(BaseModel):
@@ -116,6 +151,7 @@ class PracticeAttemptResponse(BaseModel):
     feedback: str
     hints_available: int
     next_hint: Optional[str] = None
+    evaluation_path: Literal["local", "llm"]  # Checked by the local answer checker or by the LLM
 
 
 # ============================================================================
@@ -135,11 +171,18 @@ class SessionResponse(BaseModel):
     pace: str
     scaffolding_mode: str
     started_at: datetime
+    ended_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class SessionPage(BaseModel):
+    """One page of sessions, newest first."""
+    items: List[SessionResponse]
+    next_cursor: Optional[str] = None
+
+
 # ============================================================================
 # Parent Dashboard Schemas
 # ============================================================================
@@ -0,0 +1,231 @@
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional, List
+
+from app.services.problem_engine import (
+    Poly, UNITS, UNIT_ALIASES, UNIT_NAMES, UnsupportedProblem, _SYMBOLS, _parse
+)
+
+_NO_SOLUTION_RE = re.compile(r"\bno\s+(?:real\s+)?(?:solutions?|roots?|answers?)\b|^\s*(?:none|no solution|∅)\s*\.?$", re.IGNORECASE)
+# Commas separate answers unless they are thousands separators (1,000)
+_SPLIT_RE = re.compile(r"\s*(?:,(?!\d{3}\b)|;|\bor\b|\band\b)\s*", re.IGNORECASE)
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_ASSIGN_RE = re.compile(r"^\s*[a-zA-Z]\s*=\s*")
+_MIXED_RE = re.compile(r"^(-?)(\d+)\s+(\d+)\s*/\s*(\d+)$")
+_QUANTITY_RE = re.compile(r"^([^a-zA-Z]*[\d)])\s*([a-zA-Z]+)$")
+_DECIMALS_RE = re.compile(r"\.(\d+)")
+_LETTERS_RE = re.compile(r"[a-zA-Z]")
+_EPSILON = Fraction(1, 10 ** 9)
+
+
+@dataclass
+class AnswerCheck:
+    """Outcome of checking an answer locally."""
+    is_correct: bool
+    feedback: str
+    next_hint: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {"is_correct": self.is_correct, "feedback": self.feedback, "next_hint": self.next_hint}
+
+
+@dataclass
+class _Value:
+    poly: Poly  # Constant for plain numbers
+    unit: Optional[str] = None
+    decimals: int = 0  # Digits after the decimal point as written, i.e. the precision it was rounded to
+    text: str = ""
+
+
+def _unit(word: str) -> Optional[str]:
+    unit = UNIT_ALIASES.get(word.lower(), word.lower())
+    return unit if any(unit in units for units in UNITS.values()) else None
+
+
+def _dimension(unit: str) -> Optional[str]:
+    return next((d for d, units in UNITS.items() if unit in units), None)
+
+
+def _parse_value(text: str) -> Optional[_Value]:
+    """Parse one answer ("3/4", "1 1/2", "x = -2", "2.5 km", "2(x + 3)"); None if it is not math."""
+    raw = text.strip().rstrip(".")
+    text = _THOUSANDS_RE.sub("", raw.translate(_SYMBOLS))
+    text = _ASSIGN_RE.sub("", text).strip()
+    if not text:
+        return None
+
+    unit = None
+    match = _QUANTITY_RE.match(text)
+    if match and _unit(match.group(2)):
+        text, unit = match.group(1).strip(), _unit(match.group(2))
+    decimals = max((len(d) for d in _DECIMALS_RE.findall(text)), default=0)
+
+    mixed = _MIXED_RE.match(text)
+    if mixed:
+        sign, whole, num, den = mixed.groups()
+        if int(den) == 0:
+            return None
+        value = int(whole) + Fraction(int(num), int(den))
+        return _Value(Poly.const(-value if sign else value), unit, decimals, raw)
+
+    letters = set(_LETTERS_RE.findall(text))
+    if len(letters) > 1 or not re.search(r"\d|[a-zA-Z]", text):
+        return None
+    try:
+        poly, _ = _parse(text, next(iter(letters), None))
+    except (UnsupportedProblem, ZeroDivisionError, OverflowError, RecursionError, ValueError):
+        return None
+    return _Value(poly, unit, decimals, raw)
+
+
+def _parse_answers(text: str) -> Optional[List[_Value]]:
+    parts = [part for part in _SPLIT_RE.split(text.strip()) if part.strip()]
+    values = [_parse_value(part) for part in parts]
+    if not values or any(value is None for value in values):
+        return None
+    return values
+
+
+class AnswerChecker:
+    """
+    Deterministic answer checking for math: numeric tolerance, fraction and
+    decimal equivalence, equivalent expressions in one variable, sets of
+    roots and unit conversion. Returns None whenever either answer is not
+    plain math, so callers escalate free-form answers to the LLM.
+    """
+
+    def check(self, expected: str, student: str) -> Optional[AnswerCheck]:
+        """Compare a student's answer with the expected one, or return None if it can't be decided locally."""
+        if not expected or not expected.strip():
+            return None
+        if not student or not student.strip():
+            return AnswerCheck(False, "Enter an answer to check.", None)
+
+        if _NO_SOLUTION_RE.search(expected):
+            if _NO_SOLUTION_RE.search(student):
+                return AnswerCheck(True, "Correct! There are no real solutions.")
+            if _parse_answers(student) is None:
+                return None
+            return AnswerCheck(False, "Not quite — check the discriminant before solving.", "Compute b² − 4ac. What does its sign tell you?")
+
+        expected_values = _parse_answers(expected)
+        student_values = _parse_answers(student)
+        if expected_values is None or student_values is None:
+            return None
+        # A double root may be listed once or twice ("2" and "2, 2" are the same set)
+        expected_values, student_values = self._distinct(expected_values), self._distinct(student_values)
+        if len(expected_values) == 1 and len(student_values) == 1:
+            return self._check_one(expected_values[0], student_values[0])
+        return self._check_set(expected_values, student_values)
+
+    def _check_one(self, expected: _Value, student: _Value) -> AnswerCheck:
+        converted = self._convert(student, expected)
+        if converted is None:
+            return AnswerCheck(
+                False,
+                f"Not quite — your answer is in {UNIT_NAMES[student.unit]}, but the question asks about {UNIT_NAMES[expected.unit]}.",
+                "Check which units the answer should be in."
+            )
+        if self._equal(expected, student, converted):
+            return AnswerCheck(True, self._praise(expected, student))
+        return AnswerCheck(False, "Not quite — check your work and try again.", self._hint(expected, student, converted))
+
+    def _check_set(self, expected: List[_Value], student: List[_Value]) -> AnswerCheck:
+        remaining = list(expected)
+        wrong = 0
+        for value in student:
+            match = next((
+                e for e in remaining
+                if (converted := self._convert(value, e)) is not None and self._equal(e, value, converted)
+            ), None)
+            if match is None:
+                wrong += 1
+            else:
+                remaining.remove(match)
+        if not remaining and not wrong:
+            return AnswerCheck(True, "Correct! You found all the solutions.")
+        found = len(expected) - len(remaining)
+        if found and not wrong:
+            return AnswerCheck(
+                False,
+                f"You found {found} of the {len(expected)} solutions. There's another one — keep going!",
+                "Equations with a squared term can have two solutions."
+            )
+        if found:
+            return AnswerCheck(False, f"{found} of your answers {'is' if found == 1 else 'are'} right, but not all of them.", "Substitute each answer back into the equation to check it.")
+        return AnswerCheck(False, "Not quite — check your work and try again.", "Substitute your answer back into the equation to check it.")
+
+    def _distinct(self, values: List[_Value]) -> List[_Value]:
+        """Values with repeats (equal after unit conversion) dropped, in order."""
+        distinct: List[_Value] = []
+        for value in values:
+            if not any(
+                (converted := self._convert(value, kept)) is not None and self._equal(kept, value, converted)
+                for kept in distinct
+            ):
+                distinct.append(value)
+        return distinct
+
+    @staticmethod
+    def _convert(student: _Value, expected: _Value) -> Optional[Poly]:
+        """The student's value in the expected answer's units; None when the dimensions differ."""
+        if not (student.unit and expected.unit) or student.unit == expected.unit:
+            return student.poly
+        dimension = _dimension(student.unit)
+        if dimension != _dimension(expected.unit):
+            return None
+        factor = UNITS[dimension][student.unit] / UNITS[dimension][expected.unit]
+        return Poly({d: c * factor for d, c in student.poly.coeffs.items()})
+
+    @staticmethod
+    def _tolerance(expected: _Value, student: _Value) -> Fraction:
+        # A rounded expected answer (1.414) or a student rounding to 2+ places (0.67 for 2/3) is accepted
+        tolerance = _EPSILON
+        if expected.decimals:
+            tolerance += Fraction(1, 2 * 10 ** expected.decimals)
+        if student.decimals >= 2:
+            tolerance += Fraction(1, 2 * 10 ** student.decimals)
+        return tolerance
+
+    def _equal(self, expected: _Value, student: _Value, converted: Poly) -> bool:
+        difference = expected.poly - converted
+        tolerance = self._tolerance(expected, student)
+        return all(abs(c) <= tolerance for c in difference.coeffs.values())
+
+    @staticmethod
+    def _praise(expected: _Value, student: _Value) -> str:
+        if expected.unit and not student.unit:
+            return f"Correct! Remember to include the units ({UNIT_NAMES[expected.unit]})."
+        if student.unit and expected.unit and student.unit != expected.unit:
+            return f"Correct! That's the same as {expected.text}."
+        if not expected.poly.is_const():
+            return "Correct! Your expression is equivalent to the answer."
+        if expected.poly.coeff(0) != student.poly.coeff(0):
+            return "Correct! (rounded)"
+        if re.sub(r"\s+", "", student.text) != re.sub(r"\s+", "", expected.text):
+            return f"Correct! {student.text} is the same as {expected.text}."
+        return "Correct!"
+
+    @staticmethod
+    def _hint(expected: _Value, student: _Value, converted: Poly) -> Optional[str]:
+        if not (expected.poly.is_const() and converted.is_const()):
+            return "Expand both expressions and compare the terms."
+        e, s = expected.poly.coeff(0), converted.coeff(0)
+        if s == 0 or e == 0:
+            return None
+        if s == -e:
+            return "Check the sign of your answer."
+        if s * e == 1:
+            return "Your answer looks flipped — check which number goes on top."
+        ratio = s / e if abs(s) > abs(e) else e / s
+        if ratio in (10, 100, 1000):
+            return f"Check the decimal point — your answer is off by a factor of {ratio}."
+        if expected.unit and student.unit in (None, expected.unit):
+            dimension = _dimension(expected.unit)
+            if any(ratio == f * f or ratio == f for f in (UNITS[dimension][u] / UNITS[dimension][expected.unit] for u in UNITS[dimension])):
+                return "Check whether to multiply or divide by the conversion factor."
+        return None
+
+
+answer_checker = AnswerChecker()
@@ -0,0 +1,437 @@
+import asyncio
+import logging
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import GuidanceArtifact, PracticeProblem
+from app.services.llm_scheduler import llm_priority_class
+from app.services.llm_service import LLMService
+from app.services.openai_client import OpenAIClient
+from app.services.problem_engine import local_problem_engine
+from app.services.shared_store import SharedStore
+from app.services.similar_problems import SimilarProblemService
+from app.services.submission_problems import SubmissionProblem, submission_problems
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ("basic", "intermediate", "advanced")
+
+
+class ArtifactService:
+    """
+    Guidance and practice problems persisted per (submission, problem index).
+
+    Stored rows are served on every re-visit, so the LLM is hit at most once
+    per artifact. Practice sets grow incrementally: a request only generates
+    the problems beyond those already stored, the first PRACTICE_INITIAL_COUNT
+    before responding and the rest in a background task. A Redis lock per
+    problem keeps concurrent requests (on any worker) from generating the
+    same positions twice.
+    """
+
+    def __init__(
+        self,
+        openai_client: OpenAIClient,
+        llm_service: LLMService,
+        similar_problems: SimilarProblemService,
+        store: SharedStore,
+        session_factory: async_sessionmaker
+    ):
+        self.openai_client = openai_client
+        self.llm_service = llm_service
+        self.similar_problems = similar_problems
+        self.store = store
+        self.session_factory = session_factory
+        self._background: dict[tuple, asyncio.Task] = {}
+        self._guidance_inflight: dict[tuple, asyncio.Task] = {}
+        self._guidance_waiters: dict[tuple, int] = {}
+        self.generated = 0
+        self.reused = 0
+        self.prefetch_hits = 0
+
+    async def close(self):
+        """Cancel background generation; unfinished artifacts are generated on the next request."""
+        tasks = [*self._background.values(), *self._guidance_inflight.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._background.clear()
+        self._guidance_inflight.clear()
+
+    # ------------------------------------------------------------------
+    # Guidance
+    # ------------------------------------------------------------------
+
+    async def get_guidance(
+        self,
+        db: AsyncSession,
+        problem: SubmissionProblem,
+        provider: Optional[str] = None,
+        api_key: Optional[str] = None,
+        prefetched: bool = False
+    ) -> dict:
+        """
+        Stored guidance for the problem, generating and storing it on first request.
+        Concurrent requests for the same problem share one generation.
+
+        Returns:
+            dict: GuidanceResponse fields plus the artifact id (None when
+            generation failed and nothing was stored)
+        """
+        row = await self._stored_guidance(db, problem.submission_id, problem.problem_index)
+        if row is None:
+            key = (problem.submission_id, problem.problem_index)
+            task = self._guidance_inflight.get(key)
+            if task is None:
+                task = asyncio.get_running_loop().create_task(self._generate_guidance(problem, provider, api_key, prefetched))
+                self._guidance_inflight[key] = task
+                task.add_done_callback(lambda _: self._guidance_inflight.pop(key, None))
+            self._guidance_waiters[key] = self._guidance_waiters.get(key, 0) + 1
+            try:
+                fallback = await asyncio.shield(task)
+            finally:
+                self._guidance_waiters[key] -= 1
+                if not self._guidance_waiters[key]:
+                    del self._guidance_waiters[key]
+                    # Nobody wants it any more (e.g. a cancelled prefetch): stop spending tokens
+                    if not task.done():
+                        task.cancel()
+            row = await self._stored_guidance(db, problem.submission_id, problem.problem_index)
+            if row is None:
+                return fallback
+
+        if row.prefetched and row.served_at is None and not prefetched:
+            row.served_at = datetime.now(timezone.utc)
+            await db.commit()
+            self.prefetch_hits += 1
+        return self._guidance_dict(row)
+
+    async def _generate_guidance(
+        self,
+        problem: SubmissionProblem,
+        provider: Optional[str],
+        api_key: Optional[str],
+        prefetched: bool
+    ) -> Optional[dict]:
+        """Generate and store guidance; returns the unsaved fallback when the provider failed."""
+        submission_id, problem_index, text = problem.submission_id, problem.problem_index, problem.text
+        async with self.session_factory() as db:
+            lock_key = f"locks:guidance:{submission_id}:{problem_index}"
+
+            async def stored():
+                return await self._stored_guidance(db, submission_id, problem_index)
+
+            locked = await self._lock_or_wait(lock_key, stored)
+            if locked is None:
+                return None
+            try:
+                if await stored():
+                    return None
+                tokens = None
+                solution = local_problem_engine.recognize(text)
+                if solution:
+                    content, source, provider = local_problem_engine.generate_guidance(solution), "local", None
+                else:
+                    content, source = await self._similar_guidance(db, submission_id, problem_index, text), "reused"
+                    if content is None:
+                        llm_response = await self.llm_service.generate_dual_response(
+                            user_query=text,
+                            provider=provider,
+                            api_key=api_key,
+                            grade_level=problem.grade_level,
+                            difficulty=problem.difficulty
+                        )
+                        parent_context = llm_response.get("parent_context", {})
+                        content = {
+                            "micro_explanation": llm_response.get("student_response", ""),
+                            "step_breakdown": [],  # Not used in this view
+                            "error_warnings": [
+                                f"Parent Tip: {parent_context.get('teaching_tips', '')}",
+                                f"Deeper Terms: {', '.join(parent_context.get('deeper_terms', []))}"
+                            ],
+                            "interactive_checks": [],
+                            "reveal_sequence": []
+                        }
+                        if llm_response.get("error"):
+                            # Don't store the fallback; the next visit retries the provider
+                            return {"id": None, **content}
+                        source, tokens = "llm", llm_response.get("tokens")
+                        self.generated += 1
+
+                db.add(GuidanceArtifact(
+                    submission_id=submission_id,
+                    problem_index=problem_index,
+                    source=source,
+                    provider=provider if source == "llm" else None,
+                    content=content,
+                    tokens=tokens,
+                    prefetched=prefetched
+                ))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Stored concurrently (lock unavailable); callers re-read it
+                    await db.rollback()
+                return None
+            finally:
+                if locked:
+                    await self._unlock(lock_key, locked)
+
+    @staticmethod
+    async def _stored_guidance(db: AsyncSession, submission_id: uuid.UUID, problem_index: int) -> Optional[GuidanceArtifact]:
+        result = await db.execute(
+            select(GuidanceArtifact).where(
+                GuidanceArtifact.submission_id == submission_id,
+                GuidanceArtifact.problem_index == problem_index
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def _similar_guidance(self, db: AsyncSession, submission_id: uuid.UUID, problem_index: int, text: str) -> Optional[dict]:
+        match = await self._find_similar(submission_id, problem_index, text)
+        if not match or not await self.similar_problems.matches_quantities(db, text, match):
+            return None
+        row = await self._stored_guidance(db, match.submission_id, match.problem_index)
+        if not row:
+            return None
+        self._log_reuse("guidance", match, 1)
+        return row.content
+
+    @staticmethod
+    def _guidance_dict(row: GuidanceArtifact) -> dict:
+        return {"id": row.id, **row.content}
+
+    # ------------------------------------------------------------------
+    # Practice
+    # ------------------------------------------------------------------
+
+    async def get_practice(
+        self,
+        db: AsyncSession,
+        problem: SubmissionProblem,
+        offset: int = 0,
+        count: int = 3
+    ) -> tuple[list[dict], int]:
+        """
+        Practice problems at positions offset..offset+count, generating only
+        those not stored yet. When the LLM is needed, the first
+        PRACTICE_INITIAL_COUNT of the window are generated before returning
+        and the rest are scheduled in the background.
+
+        Returns:
+            tuple: (problems, number of requested problems still being generated)
+        """
+        target = min(offset + count, settings.PRACTICE_MAX_COUNT)
+        rows = await self._stored_practice(db, problem.submission_id, problem.problem_index)
+        if len(rows) < target:
+            if local_problem_engine.recognize(problem.text):
+                # Local generation is instant: fill the whole window now
+                rows = await self._fill(db, problem, target)
+            else:
+                first = min(target, max(len(rows), offset + settings.PRACTICE_INITIAL_COUNT))
+                if len(rows) < first:
+                    rows = await self._fill(db, problem, first)
+                if len(rows) < target:
+                    self._schedule(problem.submission_id, problem.problem_index, target)
+
+        window = [self._practice_dict(row) for row in rows[offset:target]]
+        return window, max(0, target - offset - len(window))
+
+    @staticmethod
+    async def _stored_practice(db: AsyncSession, submission_id: uuid.UUID, problem_index: int) -> list[PracticeProblem]:
+        result = await db.execute(
+            select(PracticeProblem)
+            .where(
+                PracticeProblem.submission_id == submission_id,
+                PracticeProblem.problem_index == problem_index
+            )
+            .order_by(PracticeProblem.position)
+        )
+        return list(result.scalars().all())
+
+    def _schedule(self, submission_id: uuid.UUID, problem_index: int, target: int):
+        """Generate up to `target` practice problems after the response is sent."""
+        key = (submission_id, problem_index)
+        if key in self._background:
+            return
+        task = asyncio.get_running_loop().create_task(self._fill_in_background(submission_id, problem_index, target))
+        self._background[key] = task
+        task.add_done_callback(lambda _: self._background.pop(key, None))
+
+    async def _fill_in_background(self, submission_id: uuid.UUID, problem_index: int, target: int):
+        try:
+            # Nobody is waiting on the rest of the set yet
+            with llm_priority_class("prefetch"):
+                async with self.session_factory() as db:
+                    problem = await submission_problems.get(db, submission_id, problem_index)
+                    if problem:
+                        await self._fill(db, problem, target)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(
+                "Background practice generation failed: %s", e,
+                extra={"stage": "practice", "submission_id": str(submission_id)}
+            )
+
+    async def _fill(self, db: AsyncSession, problem: SubmissionProblem, target: int) -> list[PracticeProblem]:
+        """
+        Generate and store practice problems until `target` exist, unless another
+        request already is, in which case wait for its rows.
+        """
+        submission_id, problem_index = problem.submission_id, problem.problem_index
+        lock_key = f"locks:practice:{submission_id}:{problem_index}"
+
+        async def stored():
+            return len(await self._stored_practice(db, submission_id, problem_index)) >= target
+
+        locked = await self._lock_or_wait(lock_key, stored)
+        if locked is None:
+            return await self._stored_practice(db, submission_id, problem_index)
+
+        try:
+            rows = await self._stored_practice(db, submission_id, problem_index)
+            if len(rows) >= target:
+                return rows
+            new_rows = await self._generate(db, problem, rows, target)
+            if not new_rows:
+                return rows
+            db.add_all(new_rows)
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+            return await self._stored_practice(db, submission_id, problem_index)
+        finally:
+            if locked:
+                await self._unlock(lock_key, locked)
+
+    async def _generate(
+        self,
+        db: AsyncSession,
+        problem: SubmissionProblem,
+        rows: list[PracticeProblem],
+        target: int
+    ) -> list[PracticeProblem]:
+        """New (unsaved) rows for positions len(rows)..target: local, then reused, then LLM."""
+        text = problem.text
+        seen = {row.text for row in rows}
+        needed = target - len(rows)
+        problems = []
+
+        solution = local_problem_engine.recognize(text)
+        if solution:
+            for candidate in local_problem_engine.generate_practice_problems(solution, count=target):
+                if candidate["text"] not in seen and len(problems) < needed:
+                    problems.append((candidate, "local"))
+                    seen.add(candidate["text"])
+        else:
+            match = await self._find_similar(problem.submission_id, problem.problem_index, text)
+            # Reused rows carry answers, so they must be for the same numbers
+            if match and await self.similar_problems.matches_quantities(db, text, match):
+                for row in await self._stored_practice(db, match.submission_id, match.problem_index):
+                    if row.text not in seen and len(problems) < needed:
+                        problems.append(({
+                            "text": row.text, "difficulty": row.difficulty, "variation_type": row.variation_type,
+                            "solution": row.solution, "answer": row.answer
+                        }, "reused"))
+                        seen.add(row.text)
+                if problems:
+                    self._log_reuse("practice", match, len(problems))
+
+            if len(problems) < needed:
+                generated = await self.openai_client.generate_practice_problems(
+                    original_problem=text,
+                    subject=problem.subject or "other",
+                    topic=problem.topic or "unknown",
+                    difficulty=problem.difficulty or "intermediate",
+                    count=needed - len(problems),
+                    avoid=sorted(seen),
+                    grade_level=problem.grade_level
+                )
+                for candidate in generated:
+                    if isinstance(candidate, dict) and candidate.get("text") and candidate["text"] not in seen:
+                        if len(problems) < needed:
+                            problems.append((candidate, "llm"))
+                            seen.add(candidate["text"])
+                            self.generated += 1
+
+        return [
+            PracticeProblem(
+                submission_id=problem.submission_id,
+                problem_index=problem.problem_index,
+                position=len(rows) + i,
+                text=candidate["text"],
+                difficulty=candidate.get("difficulty") if candidate.get("difficulty") in DIFFICULTIES
+                else problem.difficulty or "intermediate",
+                variation_type=candidate.get("variation_type") or "same_structure",
+                solution=candidate.get("solution"),
+                answer=str(candidate["answer"]) if candidate.get("answer") is not None else None,
+                source=source
+            )
+            for i, (candidate, source) in enumerate(problems)
+        ]
+
+    @staticmethod
+    def _practice_dict(row: PracticeProblem) -> dict:
+        return {
+            "id": row.id,
+            "text": row.text,
+            "difficulty": row.difficulty,
+            "variation_type": row.variation_type,
+            "solution": row.solution
+        }
+
+    # ------------------------------------------------------------------
+
+    async def _lock_or_wait(self, lock_key: str, stored) -> Optional[str]:
+        """
+        Take the Redis generation lock, or wait while another request (on any
+        worker) holds it until `stored()` reports the artifact exists.
+
+        Returns:
+            None when the artifact is stored, otherwise the lock's token for
+            _unlock ("" when it was not taken because Redis is unavailable or
+            the holder took longer than GENERATION_LOCK_SECONDS; unique
+            constraints still prevent duplicates)
+        """
+        token = secrets.token_hex(16)
+        deadline = time.monotonic() + settings.GENERATION_LOCK_SECONDS
+        while True:
+            if await stored():
+                return None
+            try:
+                if await self.store.set_if_absent(lock_key, token, ttl=settings.GENERATION_LOCK_SECONDS):
+                    return token
+            except Exception as e:
+                logger.warning("Generation lock unavailable: %s", e, extra={"stage": "artifacts"})
+                return ""
+            if time.monotonic() > deadline:
+                return ""
+            await asyncio.sleep(0.5)
+
+    async def _unlock(self, lock_key: str, token: str):
+        """Release the lock unless it expired and another worker has taken it since."""
+        try:
+            await self.store.delete_if_equals(lock_key, token)
+        except Exception as e:
+            logger.warning("Could not release generation lock: %s", e, extra={"stage": "artifacts"})
+
+    async def _find_similar(self, submission_id: uuid.UUID, problem_index: int, text: str):
+        if not self.similar_problems.enabled:
+            return None
+        return await self.similar_problems.find_similar(text, exclude=(submission_id, problem_index))
+
+    def _log_reuse(self, kind: str, match, count: int):
+        self.reused += count
+        logger.info(
+            "Reusing %s from a similar problem", kind,
+            extra={"stage": "similarity", "score": round(match.score, 3), "source_submission": str(match.submission_id)}
+        )
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from app.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+# SDK exception types (openai, google.api_core) that mean the provider is unreachable or overloaded
+_PROVIDER_FAILURES = {
+    "APITimeoutError", "APIConnectionError", "InternalServerError", "RateLimitError",
+    "ServiceUnavailable", "DeadlineExceeded", "ResourceExhausted", "TooManyRequests", "BadGateway", "GatewayTimeout"
+}
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error says the provider is unhealthy: timeouts, connection
+    errors, 5xx and 429. Client errors (an invalid key, a bad request) say
+    nothing about the provider and must not open the circuit.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _PROVIDER_FAILURES:
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for an upstream provider.
+
+    closed: calls go through; CIRCUIT_FAILURE_THRESHOLD failures in a row open it.
+    open: calls fail fast with CircuitOpenError for CIRCUIT_RESET_SECONDS.
+    half_open: one trial call is let through; success closes, failure re-opens.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or settings.CIRCUIT_RESET_SECONDS
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.total_failures = 0
+        self.total_rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def check(self):
+        """Raise CircuitOpenError if a call should not be attempted now."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return
+        self.total_rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.total_failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    @contextmanager
+    def guard(self):
+        """Wrap one upstream call: fail fast when open, and record the outcome."""
+        self.check()
+        try:
+            yield
+        except Exception as e:
+            if is_provider_failure(e):
+                self.record_failure()
+            else:
+                # The provider answered; the request itself was at fault
+                self.trial_in_flight = False
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but free the trial slot
+            self.trial_in_flight = False
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "total_failures": self.total_failures,
+            "rejected": self.total_rejected
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for an upstream, used by clients on our own key."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+
+# Breakers for users' own (BYOK) keys, keyed by provider and key hash,
+# least recently used first so the oldest can be evicted
+_byok_breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+
+
+def get_byok_breaker(provider: str, api_key: str) -> CircuitBreaker:
+    """
+    The breaker for one user's own key. BYOK clients are built per request,
+    so breakers are kept here (by key hash, never the key itself) to carry
+    failures across requests; a bad key opens only its own circuit.
+    """
+    name = f"{provider}:byok:{hashlib.sha256(api_key.encode()).hexdigest()[:12]}"
+    breaker = _byok_breakers.get(name)
+    if breaker is None:
+        breaker = _byok_breakers[name] = CircuitBreaker(name)
+        while len(_byok_breakers) > settings.CIRCUIT_BYOK_MAX_KEYS:
+            _byok_breakers.popitem(last=False)
+    else:
+        _byok_breakers.move_to_end(name)
+    return breaker
+
+
+def breaker_states() -> dict:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def byok_breaker_states() -> dict:
+    """Per-provider counts of tracked and open BYOK circuits."""
+    states: dict[str, dict] = {}
+    for name, breaker in _byok_breakers.items():
+        provider = states.setdefault(name.split(":", 1)[0], {"keys": 0, "open": 0})
+        provider["keys"] += 1
+        provider["open"] += breaker.state == "open"
+    return states
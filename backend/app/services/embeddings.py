@@ -0,0 +1,110 @@
+import re
+import zlib
+from typing import Optional
+import numpy as np
+
+from app.config import settings
+from app.services.openai_client import OpenAIClient
+
+# Leading problem labels ("3.", "Q4)", "Problem 2:") differ between copies of the same problem
+_LEADING_LABEL = re.compile(r'^\s*(?:(?:q|question|problem|exercise|ex)\.?\s*)?\(?(?:\d{1,4}|[a-z]|[ivx]{1,4})[.):]\s+', re.IGNORECASE)
+_TOKEN = re.compile(r'[a-z]+|\d+(?:\.\d+)?|[^\sa-z\d]')
+# Numbers (with thousands separators and decimals) and the operators between them
+_QUANTITY = re.compile(r'\d[\d,]*(?:\.\d+)?|[+\-*/=×÷^<>≤≥%√]')
+
+
+def normalize_problem_text(text: str) -> str:
+    """Lowercase, drop the problem label and collapse whitespace."""
+    text = _LEADING_LABEL.sub("", text.strip().lower(), count=1)
+    return " ".join(text.split())
+
+
+def _normalize_quantity(token: str) -> str:
+    if not token[0].isdigit():
+        return {"×": "*", "÷": "/"}.get(token, token)
+    token = token.replace(",", "")
+    if "." in token:
+        token = token.rstrip("0").rstrip(".")
+    return token.lstrip("0") or "0"
+
+
+def problem_quantities(text: str) -> tuple:
+    """The numbers and operators of a problem in order, normalized ("1,200.50" -> "1200.5", "×" -> "*")."""
+    return tuple(_normalize_quantity(token) for token in _QUANTITY.findall(normalize_problem_text(text)))
+
+
+def same_quantities(text: str, other: str) -> bool:
+    """
+    Whether two problems can share answers: identical normalized text, or the
+    same numbers and operators in the same order. Embeddings barely separate
+    "5 hours" from "7 hours", so this is checked before any reuse.
+    """
+    return (
+        normalize_problem_text(text) == normalize_problem_text(other)
+        or problem_quantities(text) == problem_quantities(other)
+    )
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: word unigrams, word bigrams and character
+    trigrams hashed (CRC32, stable across processes) into a signed vector.
+    Near-identical problems, including OCR noise, land very close together.
+    Used by default and in tests instead of a hosted embedding model.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.EMBEDDING_DIM
+
+    def _features(self, text: str) -> list[str]:
+        words = _TOKEN.findall(text)
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        features += [f"c:{text[i:i + 3]}" for i in range(len(text) - 2)]
+        return features
+
+    def embed_sync(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        features = self._features(normalize_problem_text(text))
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (hashes % self.dim).astype(np.intp), signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def embed(self, text: str) -> np.ndarray:
+        return self.embed_sync(text)
+
+
+class OpenAIEmbedder:
+    """Hosted embeddings (text-embedding-3-*), reduced to EMBEDDING_DIM dimensions."""
+
+    name = "openai"
+
+    def __init__(self, openai_client: OpenAIClient, model: str = "text-embedding-3-small", dim: Optional[int] = None):
+        self.openai_client = openai_client
+        self.model = model
+        self.dim = dim or settings.EMBEDDING_DIM
+
+    async def embed(self, text: str) -> np.ndarray:
+        async with self.openai_client.slot():
+            with self.openai_client.breaker.guard():
+                response = await self.openai_client.client.embeddings.create(
+                    model=self.model,
+                    input=normalize_problem_text(text),
+                    dimensions=self.dim
+                )
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def create_embedder(openai_client: OpenAIClient):
+    """Build the embedder selected by EMBEDDING_PROVIDER."""
+    if settings.EMBEDDING_PROVIDER == "openai":
+        return OpenAIEmbedder(openai_client)
+    return HashingEmbedder()
@@ -1,21 +1,52 @@
-import google.generativeai as genai
 from app.config import settings
+from app.services.circuit_breaker import get_breaker, get_byok_breaker
+from app.services.llm_scheduler import get_scheduler
+from typing import Optional
+import asyncio
+import contextlib
 import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class GeminiClient:
     """Wrapper for Google Gemini API calls."""
 
-    def __init__(self):
-        # Configure the API key
+    def __init__(self, api_key: Optional[str] = None):
         # Note: In a real scenario, ensure GOOGLE_API_KEY is set in environment
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        # A custom endpoint (e.g. a local benchmark fake) is reached over REST
+        self.rest_transport = bool(settings.GEMINI_API_ENDPOINT)
+        self._configured = False
+        # A user's own key gets a breaker of its own, so a bad key can't open ours
+        self.breaker = get_breaker("gemini") if api_key is None else get_byok_breaker("gemini", api_key)
+        # Calls on a user's own key don't count against our rate limit
+        self.scheduler = get_scheduler("gemini") if api_key is None else None
         
         self.model_name = "gemini-pro"
         self.vision_model_name = "gemini-pro-vision"
 
+    def _model(self, name: str):
+        """
+        Import the Gemini SDK and configure it on first use; the import is slow
+        and most requests never reach Gemini.
+        """
+        import google.generativeai as genai
+
+        if not self._configured:
+            # Note: genai.configure is process-global
+            if self.rest_transport:
+                genai.configure(
+                    api_key=self.api_key or "unused",
+                    transport="rest",
+                    client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT}
+                )
+            elif self.api_key:
+                genai.configure(api_key=self.api_key)
+            self._configured = True
+        return genai.GenerativeModel(name)
+
     async def generate_dual_response(self, user_query: str, grade_level: int = 8) -> dict:
         """
         Generate a dual response: Student Explanation + Parent Context.
@@ -41,25 +72,32 @@ class GeminiClient:
         """
 
         try:
-            model = genai.GenerativeModel(self.model_name)
-            response = await model.generate_content_async(prompt)
+            model = self._model(self.model_name)
+            async with self.scheduler.slot() if self.scheduler else contextlib.nullcontext():
+                with self.breaker.guard():
+                    if self.rest_transport:
+                        # The SDK's async client is gRPC-only
+                        response = await asyncio.to_thread(model.generate_content, prompt)
+                    else:
+                        response = await model.generate_content_async(prompt)
             
             # Clean up response text to ensure it's valid JSON
             text = response.text.strip()
             if text.startswith("```json"):
                 text = text[7:-3]
             
-            return json.loads(text)
+            result = json.loads(text)
+            usage = getattr(response, "usage_metadata", None)
+            result["tokens"] = usage.total_token_count if usage else None
+            return result
         except Exception as e:
-            print(f"Gemini error: {e}")
+            logger.error("Gemini error: %s", e, extra={"stage": "dual_response", "provider": "gemini"})
             return {
                 "student_response": "I'm having trouble connecting to my brain right now. Please try again!",
                 "parent_context": {
                     "deeper_terms": [],
                     "teaching_tips": "Check internet connection or API status.",
                     "explanation": "Error generating response."
-                }
+                },
+                "error": True
             }
-
-# Singleton instance
-gemini_client = GeminiClient()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import shutil
+import time
+from typing import Optional
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.logging_config import get_log_stats
+from app.services.circuit_breaker import breaker_states, byok_breaker_states
+from app.services.llm_scheduler import scheduler_states
+from app.services.loop_monitor import loop_monitor
+from app.services.ocr import OCRService, pdf_queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Probes dependencies on an interval in a background task and caches the
+    result, so /health, /health/live and /health/ready cost nothing per request.
+
+    Readiness fails when Postgres or Redis is unreachable or when this worker
+    is saturated (DB pool nearly exhausted, PDF queue backed up), letting the
+    load balancer drain it before latency climbs.
+    """
+
+    def __init__(self, engine: AsyncEngine, redis_client: redis.Redis, ocr_service: OCRService):
+        self.engine = engine
+        self.redis = redis_client
+        self.ocr_service = ocr_service
+        self.interval = settings.HEALTH_PROBE_INTERVAL
+        self.snapshot: dict = {"status": "starting", "ready": False, "checks": {}}
+        self.last_probe: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def live(self) -> bool:
+        """False when probes have stopped running (the event loop is wedged or the task died)."""
+        if self.last_probe is None:
+            return self._task is not None and not self._task.done()
+        return time.monotonic() - self.last_probe < max(3 * self.interval, 10.0)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error("Health probe failed: %s", e, extra={"stage": "health"})
+            await asyncio.sleep(self.interval)
+
+    async def probe(self) -> dict:
+        """Run all probes concurrently and replace the cached snapshot."""
+        database, redis_check = await asyncio.gather(self._check_database(), self._check_redis())
+        checks = {
+            "database": database,
+            "redis": redis_check,
+            "disk": self._check_disk(),
+            "queues": self._check_queues(),
+            "providers": breaker_states(),
+            # Users' own keys: reported, but a bad key doesn't degrade the service
+            "byok_providers": byok_breaker_states(),
+        }
+        if loop_monitor.running:
+            checks["event_loop"] = loop_monitor.snapshot(limit=0)["lag_ms"]
+
+        reasons = [
+            f"{name} {check['error']}" for name, check in checks.items()
+            if isinstance(check, dict) and check.get("error")
+        ]
+        saturation = database.get("pool_saturation", 0.0)
+        if saturation >= settings.HEALTH_MAX_POOL_SATURATION:
+            reasons.append(f"database pool {saturation:.0%} checked out")
+        if checks["queues"]["pdf_queue"] > settings.HEALTH_MAX_PDF_QUEUE:
+            reasons.append(f"{checks['queues']['pdf_queue']} PDF jobs queued")
+        if checks["disk"].get("low"):
+            reasons.append("upload disk nearly full")
+
+        open_circuits = [name for name, state in checks["providers"].items() if state["state"] == "open"]
+        status = "unhealthy" if reasons else "degraded" if open_circuits else "healthy"
+        self.snapshot = {
+            "status": status,
+            "ready": not reasons,
+            "reasons": reasons,
+            "checks": checks,
+            "checked_at": time.time()
+        }
+        self.last_probe = time.monotonic()
+        return self.snapshot
+
+    async def _check_database(self) -> dict:
+        pool = self.engine.pool
+        capacity = pool.size() + max(0, pool._max_overflow)
+        result = {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "pool_saturation": round(pool.checkedout() / capacity, 2) if capacity else 0.0
+        }
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(settings.HEALTH_PROBE_TIMEOUT):
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except Exception as e:
+            result["error"] = f"unreachable: {e.__class__.__name__}"
+        else:
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def _check_redis(self) -> dict:
+        pool = self.redis.connection_pool
+        result = {
+            "in_use": len(pool._in_use_connections),
+            "max_connections": pool.max_connections
+        }
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(settings.HEALTH_PROBE_TIMEOUT):
+                await self.redis.ping()
+        except Exception as e:
+            result["error"] = f"unreachable: {e.__class__.__name__}"
+        else:
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    @staticmethod
+    def _check_disk() -> dict:
+        if settings.STORAGE_BACKEND != "local":
+            return {"backend": settings.STORAGE_BACKEND}
+        try:
+            usage = shutil.disk_usage(settings.UPLOAD_DIR)
+        except OSError as e:
+            return {"error": f"unavailable: {e}"}
+        free_mb = usage.free // (1024 * 1024)
+        return {"free_mb": free_mb, "low": free_mb < settings.HEALTH_MIN_FREE_DISK_MB}
+
+    def _check_queues(self) -> dict:
+        log_stats = get_log_stats()
+        return {
+            "pdf_queue": pdf_queue_depth(),
+            "vision_in_flight": self.ocr_service.vision_in_flight,
+            "vision_waiting": self.ocr_service.vision_waiting,
+            "ocr_regions": {**self.ocr_service.regions_read, "escalations": self.ocr_service.escalations},
+            "log_queue": log_stats["queue_depth"],
+            "log_dropped": log_stats["dropped"],
+            "llm": {
+                name: {"queued": sum(state["queued"].values()), "in_flight": state["in_flight"], "limit": state["limit"]}
+                for name, state in scheduler_states().items()
+            }
+        }
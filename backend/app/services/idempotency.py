@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from app.config import settings
+from app.services.shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """Another attempt with the same key is still running after IDEMPOTENCY_WAIT_SECONDS."""
+
+
+class IdempotencyMismatch(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class IdempotentRequests:
+    """
+    Runs a request at most once per key across all workers.
+
+    The first attempt claims the key in Redis and records its result when it
+    finishes; retries arriving meanwhile wait for that result instead of
+    redoing the work, and later retries get it straight away for
+    IDEMPOTENCY_TTL_SECONDS. Each record carries the fingerprint of the
+    request that claimed the key, and a retry with a different fingerprint
+    is rejected rather than given the other request's result. A failed
+    attempt releases the key so the next retry runs again. If Redis is down
+    requests simply run.
+    """
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self.counters = {"executed": 0, "replayed": 0, "waited": 0}
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Any]],
+        record: Callable[[Any], dict]
+    ) -> tuple[Any, Optional[dict]]:
+        """
+        Execute once for `key`; `record` turns the result into the JSON stored for replays.
+
+        Raises:
+            IdempotencyConflict: the first attempt is still running after IDEMPOTENCY_WAIT_SECONDS
+            IdempotencyMismatch: the key belongs to a request with another fingerprint
+
+        Returns:
+            tuple: (result, None) when executed here, or (None, stored record) for a replay
+        """
+        pending = {"status": "pending", "fingerprint": fingerprint, "token": secrets.token_hex(16)}
+        try:
+            stored = await self._claim(key, pending)
+        except (IdempotencyConflict, IdempotencyMismatch):
+            raise
+        except Exception as e:
+            logger.warning("Idempotency store unavailable: %s", e, extra={"stage": "idempotency"})
+            return await execute(), None
+        if stored is not None:
+            self.counters["replayed"] += 1
+            return None, stored
+
+        try:
+            result = await execute()
+        except BaseException:
+            await self._release(key, pending)
+            raise
+        self.counters["executed"] += 1
+        try:
+            done = {"status": "done", "fingerprint": fingerprint, **record(result)}
+            await self.store.set(key, done, ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+        except Exception as e:
+            logger.warning("Could not record idempotent result: %s", e, extra={"stage": "idempotency"})
+        return result, None
+
+    async def _claim(self, key: str, pending: dict) -> Optional[dict]:
+        """Claim the key (None), or return the finished attempt's record, waiting while it runs."""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        waited = False
+        while True:
+            if await self.store.set_if_absent(key, pending, ttl=settings.IDEMPOTENCY_LOCK_SECONDS):
+                return None
+            stored = await self.store.get(key)
+            if stored and stored.get("fingerprint") != pending["fingerprint"]:
+                raise IdempotencyMismatch(key)
+            if stored and stored.get("status") == "done":
+                return stored
+            if not waited:
+                waited = True
+                self.counters["waited"] += 1
+            if time.monotonic() > deadline:
+                raise IdempotencyConflict(key)
+            await asyncio.sleep(0.25)
+
+    async def _release(self, key: str, pending: dict):
+        """Delete our pending marker (not a later attempt's, if ours expired meanwhile)."""
+        try:
+            await self.store.delete_if_equals(key, pending)
+        except Exception as e:
+            logger.warning("Could not release idempotency key: %s", e, extra={"stage": "idempotency"})
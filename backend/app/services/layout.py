@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from statistics import median
+from typing import Optional
+from app.config import settings
+
+
+# Grayscale values below this count as ink
+INK_THRESHOLD = 160
+_INK_TABLE = bytes(1 if value < INK_THRESHOLD else 0 for value in range(256))
+
+
+@dataclass
+class RegionCrop:
+    """A cropped text region ready for Vision, with its location on the page."""
+    page: int
+    bbox: Optional[tuple]  # (x0, y0, x1, y1) as fractions of the page/image size; None if uncropped
+    image: bytes
+    mime_type: str = "image/png"
+
+
+def find_text_regions(pix, max_regions: Optional[int] = None) -> list[tuple]:
+    """
+    Find text regions in a grayscale pixmap using whitespace projection.
+
+    Rows are projected to find text lines; lines separated by a gap much larger
+    than the typical line gap start a new region, which on worksheets usually
+    coincides with a problem boundary. Each region is trimmed to its ink columns.
+
+    Returns:
+        list: (x0, y0, x1, y1) boxes as fractions of the pixmap size, top to bottom;
+            the full page when no ink is found
+    """
+    width, height = pix.width, pix.height
+    if not width or not height:
+        return []
+    ink = pix.samples.translate(_INK_TABLE)
+    stride = pix.stride
+    noise = max(2, width // 500)
+
+    # Row projection: (first ink x, last ink x) per row, None for blank rows
+    rows = []
+    for y in range(height):
+        row = ink[y * stride:y * stride + width]
+        if row.count(1) >= noise:
+            rows.append((row.find(1), row.rfind(1)))
+        else:
+            rows.append(None)
+
+    # Group inked rows into text lines, bridging tiny gaps from speckle or descenders
+    line_gap = max(1, height // 250)
+    lines = []
+    start = last = None
+    for y, extent in enumerate(rows):
+        if extent is None:
+            continue
+        if start is not None and y - last > line_gap:
+            lines.append((start, last))
+            start = None
+        if start is None:
+            start = y
+        last = y
+    if start is not None:
+        lines.append((start, last))
+    if not lines:
+        # Nothing dark enough (light pencil, low-contrast scan): send the whole page rather than nothing
+        return [(0.0, 0.0, 1.0, 1.0)]
+
+    # Large vertical gaps between lines separate regions
+    gaps = [lines[i + 1][0] - lines[i][1] for i in range(len(lines) - 1)]
+    break_gap = max(2 * median(gaps), height * 0.02) if gaps else height
+    blocks = [[lines[0]]]
+    for gap, line in zip(gaps, lines[1:]):
+        if gap > break_gap:
+            blocks.append([line])
+        else:
+            blocks[-1].append(line)
+
+    boxes = []
+    for block in blocks:
+        y0, y1 = block[0][0], block[-1][1]
+        extents = [rows[y] for y in range(y0, y1 + 1) if rows[y] is not None]
+        x0 = min(extent[0] for extent in extents)
+        x1 = max(extent[1] for extent in extents)
+        boxes.append([x0, y0, x1 + 1, y1 + 1])
+
+    boxes = _merge_to_limit(boxes, max_regions or settings.LAYOUT_MAX_REGIONS)
+
+    pad_x, pad_y = width * settings.LAYOUT_PADDING, height * settings.LAYOUT_PADDING
+    return [
+        (
+            max(0.0, (x0 - pad_x) / width),
+            max(0.0, (y0 - pad_y) / height),
+            min(1.0, (x1 + pad_x) / width),
+            min(1.0, (y1 + pad_y) / height),
+        )
+        for x0, y0, x1, y1 in boxes
+    ]
+
+
+def _merge_to_limit(boxes: list, limit: int) -> list:
+    """Merge vertically adjacent boxes with the smallest gaps until at most `limit` remain."""
+    while len(boxes) > max(1, limit):
+        idx = min(range(len(boxes) - 1), key=lambda i: boxes[i + 1][1] - boxes[i][3])
+        upper, lower = boxes[idx], boxes.pop(idx + 1)
+        boxes[idx] = [min(upper[0], lower[0]), upper[1], max(upper[2], lower[2]), lower[3]]
+    return boxes
+
+
+def crop_page_regions(page, page_num: int, zoom: float) -> list[RegionCrop]:
+    """
+    Locate text regions on a page and render only those regions for Vision.
+
+    Layout analysis runs on a small grayscale render restricted to the page's
+    image blocks (the scan itself), then each region is rendered at `zoom`.
+    """
+    import fitz  # PyMuPDF; imported on first use to keep API startup fast
+
+    page_rect = page.rect
+    area = page_rect
+    image_rects = [fitz.Rect(info["bbox"]) for info in page.get_image_info()]
+    if image_rects:
+        area = fitz.Rect(image_rects[0])
+        for rect in image_rects[1:]:
+            area |= rect
+        area &= page_rect
+        if area.is_empty:
+            area = page_rect
+
+    # Analyse at a fixed small size regardless of the page's physical dimensions
+    scale = settings.LAYOUT_ANALYSIS_SIZE / max(area.width, area.height)
+    preview = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=area, colorspace=fitz.csGRAY, alpha=False)
+    boxes = find_text_regions(preview)
+
+    crops = []
+    for fx0, fy0, fx1, fy1 in boxes:
+        clip = fitz.Rect(
+            area.x0 + fx0 * area.width,
+            area.y0 + fy0 * area.height,
+            area.x0 + fx1 * area.width,
+            area.y0 + fy1 * area.height,
+        )
+        # Keep crops within Vision's useful resolution
+        crop_zoom = min(zoom, settings.VISION_MAX_CROP_SIDE / max(clip.width, clip.height))
+        image = page.get_pixmap(matrix=fitz.Matrix(crop_zoom, crop_zoom), clip=clip).tobytes("png")
+        bbox = (
+            round((clip.x0 - page_rect.x0) / page_rect.width, 4),
+            round((clip.y0 - page_rect.y0) / page_rect.height, 4),
+            round((clip.x1 - page_rect.x0) / page_rect.width, 4),
+            round((clip.y1 - page_rect.y0) / page_rect.height, 4),
+        )
+        crops.append(RegionCrop(page=page_num, bbox=bbox, image=image))
+    return crops
+
+
+def crop_image_regions(image_bytes: bytes, filetype: str) -> list[RegionCrop]:
+    """
+    Crop an uploaded image to its text regions.
+    The image is opened as a one-page document so it shares the PDF code path;
+    crops are rendered at the image's native resolution.
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(stream=image_bytes, filetype=filetype)
+    try:
+        page = doc[0]
+        images = page.get_images(full=False)
+        native_width = images[0][2] if images else page.rect.width
+        zoom = native_width / page.rect.width
+        return crop_page_regions(page, 0, zoom)
+    finally:
+        doc.close()
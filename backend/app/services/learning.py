@@ -0,0 +1,232 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import (
+    LearningEvent, Misconception, Session as SessionModel, SessionStats,
+    SessionTopicStats, StudentTopicStats, Submission
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _increment(model, key: dict, is_correct: Optional[bool] = None, **amounts):
+    """
+    Upsert that creates the aggregate row for `key` or adds `amounts` to it;
+    for attempts it also extends or restarts the streak. The row lock it
+    takes serialises concurrent writers.
+    """
+    values = {**key, **amounts}
+    if is_correct is not None:
+        values["streak"] = 1 if is_correct else -1
+    stmt = insert(model).values(**values)
+    set_ = {name: getattr(model, name) + stmt.excluded[name] for name in amounts if name != "last_event_id"}
+    if "last_event_id" in amounts:
+        set_["last_event_id"] = stmt.excluded.last_event_id
+    if is_correct is not None:
+        set_["streak"] = func.greatest(model.streak, 0) + 1 if is_correct else func.least(model.streak, 0) - 1
+    if hasattr(model, "updated_at"):
+        set_["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(index_elements=list(key), set_=set_)
+
+
+class LearningRecorder:
+    """
+    Appends LearningEvents and keeps the session and student aggregates
+    (SessionStats, SessionTopicStats, StudentTopicStats, Session.strengths
+    and misconceptions, scaffolding_mode) current in the same transaction,
+    so parent reports and scaffolding decisions read a few rows instead of
+    rescanning every attempt.
+
+    Methods only add to the caller's transaction; the caller commits.
+    """
+
+    async def record_submission(self, db: AsyncSession, submission: Submission, session: Optional[SessionModel]):
+        """Count a parsed submission towards its session (submissions outside a session are not tracked)."""
+        if session is None:
+            return
+        problems = len(submission.parsed_problems or [])
+        event = await self._append(db, LearningEvent(
+            student_id=session.student_id,
+            session_id=session.id,
+            kind="submission",
+            topic=submission.topic,
+            submission_id=submission.id,
+            data={"problems": problems}
+        ))
+        await db.execute(_increment(
+            SessionStats, {"session_id": session.id},
+            submissions=1, problems_submitted=problems, last_event_id=event.id
+        ))
+
+    async def record_attempt(
+        self,
+        db: AsyncSession,
+        session: Optional[SessionModel],
+        topic: Optional[str],
+        is_correct: bool,
+        time_spent: int,
+        problem_text: str = "",
+        feedback: str = ""
+    ):
+        """Record a checked practice answer and update mastery, misconceptions and scaffolding."""
+        topic = topic or "general"
+        event = await self._append(db, LearningEvent(
+            student_id=session.student_id if session else None,
+            session_id=session.id if session else None,
+            kind="attempt",
+            topic=topic,
+            is_correct=is_correct,
+            time_spent=time_spent,
+            data={"problem": problem_text[:500]}
+        ))
+        if session is None:
+            return
+
+        session_streak = await db.scalar(_increment(
+            SessionStats, {"session_id": session.id}, is_correct,
+            attempts=1, correct=int(is_correct), time_on_task=time_spent, last_event_id=event.id
+        ).returning(SessionStats.streak))
+        topic_streak, mastered_at = (await db.execute(_increment(
+            SessionTopicStats, {"session_id": session.id, "topic": topic}, is_correct,
+            attempts=1, correct=int(is_correct)
+        ).returning(SessionTopicStats.streak, SessionTopicStats.mastered_at))).one()
+
+        if session.student_id:
+            student_streak, student_mastered_at = (await db.execute(_increment(
+                StudentTopicStats, {"student_id": session.student_id, "topic": topic}, is_correct,
+                attempts=1, correct=int(is_correct), time_on_task=time_spent
+            ).returning(StudentTopicStats.streak, StudentTopicStats.mastered_at))).one()
+            if student_mastered_at is None and student_streak >= settings.MASTERY_STREAK:
+                await db.execute(
+                    update(StudentTopicStats)
+                    .where(StudentTopicStats.student_id == session.student_id, StudentTopicStats.topic == topic)
+                    .values(mastered_at=func.now())
+                )
+
+        if mastered_at is None and topic_streak >= settings.MASTERY_STREAK:
+            await self._mastered(db, session, topic)
+        elif topic_streak == -settings.MISCONCEPTION_STREAK:
+            await self._misconception(db, session, topic, problem_text, feedback)
+
+        mode = self._scaffolding_mode(session_streak, session.scaffolding_mode)
+        if mode != session.scaffolding_mode:
+            logger.info(
+                "Scaffolding changed from %s to %s", session.scaffolding_mode, mode,
+                extra={"stage": "learning", "session_id": str(session.id)}
+            )
+            session.scaffolding_mode = mode
+
+    async def _append(self, db: AsyncSession, event: LearningEvent) -> LearningEvent:
+        db.add(event)
+        await db.flush()  # Assigns the id the aggregates point back to
+        return event
+
+    async def _mastered(self, db: AsyncSession, session: SessionModel, topic: str):
+        await db.execute(
+            update(SessionTopicStats)
+            .where(SessionTopicStats.session_id == session.id, SessionTopicStats.topic == topic)
+            .values(mastered_at=func.now())
+        )
+        await self._append(db, LearningEvent(
+            student_id=session.student_id, session_id=session.id, kind="mastered", topic=topic
+        ))
+        session.strengths = [*(session.strengths or []), topic]
+
+        resolved = await db.execute(
+            update(Misconception)
+            .where(Misconception.session_id == session.id, Misconception.topic == topic, Misconception.resolved.is_(False))
+            .values(resolved=True, resolved_at=datetime.now(timezone.utc))
+        )
+        if resolved.rowcount:
+            await self._append(db, LearningEvent(
+                student_id=session.student_id, session_id=session.id, kind="misconception_resolved", topic=topic
+            ))
+            session.misconceptions = [t for t in session.misconceptions or [] if t != topic]
+
+    async def _misconception(self, db: AsyncSession, session: SessionModel, topic: str, problem_text: str, feedback: str):
+        # One open misconception per topic
+        if topic in (session.misconceptions or []):
+            return
+        db.add(Misconception(
+            student_id=session.student_id,
+            session_id=session.id,
+            topic=topic,
+            description=feedback or f"Repeated mistakes on {topic} problems",
+            example_problem=problem_text or None
+        ))
+        await self._append(db, LearningEvent(
+            student_id=session.student_id, session_id=session.id, kind="misconception", topic=topic,
+            data={"problem": problem_text[:500]}
+        ))
+        session.misconceptions = [*(session.misconceptions or []), topic]
+
+    @staticmethod
+    def _scaffolding_mode(streak: int, current: str) -> str:
+        """More support after a run of wrong answers, less after a run of right ones."""
+        if streak <= -settings.SCAFFOLDING_HEAVY_STREAK:
+            return "heavy"
+        if streak >= settings.SCAFFOLDING_MINIMAL_STREAK:
+            return "minimal"
+        if (current == "heavy" and streak > 0) or (current == "minimal" and streak < 0):
+            return "moderate"
+        return current
+
+    async def report(self, db: AsyncSession, session: SessionModel) -> dict:
+        """
+        Parent report for a session, read from the aggregates.
+
+        Returns:
+            dict: ParentReport fields
+        """
+        stats = await db.get(SessionStats, session.id)
+        topics = (await db.execute(
+            select(SessionTopicStats).where(SessionTopicStats.session_id == session.id)
+        )).scalars().all()
+        misconceptions = (await db.execute(
+            select(Misconception).where(Misconception.session_id == session.id).order_by(Misconception.detected_at)
+        )).scalars().all()
+
+        attempts = stats.attempts if stats else 0
+        correct = stats.correct if stats else 0
+        mastered = [t.topic for t in topics if t.mastered_at is not None]
+        struggling = [m.topic for m in misconceptions if not m.resolved]
+        practising = [
+            t.topic for t in topics
+            if t.mastered_at is None and t.topic not in struggling and t.correct < t.attempts * 0.7
+        ]
+
+        if not stats:
+            summary = "No work recorded in this session yet."
+        else:
+            summary = (
+                f"Submitted {stats.problems_submitted} problem{'s' if stats.problems_submitted != 1 else ''} "
+                f"and answered {correct} of {attempts} practice question{'s' if attempts != 1 else ''} correctly"
+            )
+            summary += f" across {len(topics)} topic{'s' if len(topics) != 1 else ''}." if topics else "."
+
+        recommendations = [f"More practice on {topic}, starting with easier problems." for topic in struggling]
+        recommendations += [f"Keep practising {topic}." for topic in practising]
+        recommendations += [f"Try harder {topic} problems." for topic in mastered]
+        starters = [f"Ask them to show you how to solve a {topic} problem." for topic in mastered]
+        starters += [f"Ask what felt tricky about {topic} today." for topic in struggling]
+
+        return {
+            "session_summary": summary,
+            "problems_attempted": attempts,
+            "concepts_mastered": mastered,
+            "misconceptions_map": [
+                {"topic": m.topic, "description": m.description, "example": m.example_problem, "resolved": m.resolved}
+                for m in misconceptions
+            ],
+            "practice_recommendations": recommendations[:5],
+            "conversation_starters": starters[:3] or ["Ask them what they worked on today."],
+            "time_on_task": round((stats.time_on_task if stats else 0) / 60)
+        }
+
+
+learning_recorder = LearningRecorder()
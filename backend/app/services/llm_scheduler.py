@@ -0,0 +1,296 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import redis.asyncio as redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Highest first; a waiting request is promoted one class per LLM_PRIORITY_AGING_SECONDS
+PRIORITIES = ("interactive", "prefetch", "batch")
+
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+# Who the request is for (its student or session once a route knows it, else the
+# client address); LLM calls are queued fairly per tenant. Never client-chosen.
+# The request middleware seeds it with the client address.
+tenant_var: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+# A burst of failures from one congestion event shrinks the limit once
+_DECREASE_COOLDOWN = 2.0
+
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@contextmanager
+def llm_priority_class(priority: str):
+    """Run the enclosed LLM calls (and tasks created inside) in a priority class."""
+    token = llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+def set_tenant(student_id=None, session_id=None):
+    """
+    Queue the current request's LLM calls (and tasks created after this) under
+    its student, or its session when it has none, instead of the client address.
+    Both must come from stored rows, never straight from the request.
+    """
+    if student_id:
+        tenant_var.set(f"student:{student_id}")
+    elif session_id:
+        tenant_var.set(f"session:{session_id}")
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether a provider error means we are over its rate limit (HTTP 429)."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ in ("RateLimitError", "ResourceExhausted")
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "start", "finish", "seq", "enqueued", "future")
+
+    def __init__(self, priority: int, tenant: str, start: float, finish: float, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.tenant = tenant
+        self.start = start
+        self.finish = finish
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.future = future
+
+
+class LLMScheduler:
+    """
+    Admission control for one LLM provider in this worker.
+
+    Calls beyond the concurrency limit wait in a queue ordered by priority
+    class (interactive > prefetch > batch, with aging so batch work is never
+    starved), then by weighted fair queuing across tenants: each request gets
+    a virtual finish tag of max(virtual time, the tenant's previous tag) +
+    1 / weight, so one tenant's bulk upload interleaves with everyone else's
+    requests instead of running ahead of them.
+
+    The limit adapts AIMD-style: +1/limit per call that finishes under
+    LLM_LATENCY_TARGET_MS, x0.9 for slower calls and x0.5 on a 429. Throttling
+    is shared through Redis so every worker backs off together.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit = float(settings.LLM_CONCURRENCY_INITIAL)
+        self.in_flight = 0
+        self._waiting: list[_Waiter] = []
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._throttled_at = 0.0  # Wall clock of the last 429 seen here
+        self._throttle_seen = 0.0  # Newest shared throttle signal already applied
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+        self.wait_ms = {priority: deque(maxlen=1000) for priority in PRIORITIES}
+        self.counters = {"dispatched": 0, "throttled": 0, "slow": 0, "shared_backoffs": 0}
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a turn, then run the enclosed provider call; its outcome adjusts the limit."""
+        await self.acquire()
+        start = time.perf_counter()
+        outcome = "error"  # Cancelled calls and other failures leave the limit alone
+        try:
+            yield
+            outcome = "ok"
+        except Exception as e:
+            if is_throttled(e):
+                outcome = "throttled"
+            raise
+        finally:
+            self.release((time.perf_counter() - start) * 1000, outcome)
+
+    async def acquire(self):
+        priority = PRIORITIES.index(llm_priority.get()) if llm_priority.get() in PRIORITIES else 0
+        tenant = tenant_var.get() or "anonymous"
+        if not self._waiting and self.in_flight < self._capacity():
+            self.in_flight += 1
+            self.counters["dispatched"] += 1
+            self.wait_ms[PRIORITIES[priority]].append(0.0)
+            return
+
+        weight = settings.LLM_TENANT_WEIGHTS.get(tenant, 1.0)
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[tenant] = finish
+        waiter = _Waiter(priority, tenant, start, finish, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted a slot just as we were cancelled: hand it on
+                self.in_flight -= 1
+                self._dispatch()
+            elif waiter in self._waiting:
+                self._waiting.remove(waiter)
+            raise
+
+    def release(self, latency_ms: float, outcome: str = "ok"):
+        """Free a slot; `outcome` is ok, throttled or error."""
+        saturated = self.in_flight >= self._capacity()
+        self.in_flight -= 1
+        if outcome == "throttled":
+            self.counters["throttled"] += 1
+            self._throttled_at = time.time()
+            self._decrease(0.5)
+        elif outcome == "ok" and latency_ms > settings.LLM_LATENCY_TARGET_MS:
+            self.counters["slow"] += 1
+            self._decrease(0.9)
+        elif outcome == "ok" and saturated:
+            # Only grow a limit that is actually being used
+            self.limit = min(float(settings.LLM_CONCURRENCY_MAX), self.limit + 1.0 / self.limit)
+        self._dispatch()
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < _DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(settings.LLM_CONCURRENCY_MIN), self.limit * factor)
+        logger.info(
+            "LLM concurrency limit for %s lowered to %.1f", self.name, self.limit,
+            extra={"stage": "llm_scheduler", "provider": self.name}
+        )
+
+    def _dispatch(self):
+        aging = settings.LLM_PRIORITY_AGING_SECONDS
+        while self._waiting and self.in_flight < self._capacity():
+            now = time.monotonic()
+            waiter = min(self._waiting, key=lambda w: (
+                max(0, w.priority - int((now - w.enqueued) / aging)) if aging > 0 else w.priority,
+                w.finish,
+                w.seq
+            ))
+            self._waiting.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            self.in_flight += 1
+            self.counters["dispatched"] += 1
+            self.wait_ms[PRIORITIES[waiter.priority]].append((now - waiter.enqueued) * 1000)
+            waiter.future.set_result(None)
+        if len(self._last_finish) > 1000:
+            # Tags at or behind virtual time no longer affect ordering
+            self._last_finish = {t: f for t, f in self._last_finish.items() if f > self._virtual_time}
+
+    # ------------------------------------------------------------------
+    # Cross-worker coordination
+    # ------------------------------------------------------------------
+
+    def start(self, redis_client: redis.Redis):
+        self._redis = redis_client
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.debug("LLM scheduler sync failed: %s", e, extra={"stage": "llm_scheduler"})
+            await asyncio.sleep(settings.LLM_SYNC_INTERVAL)
+
+    async def sync(self):
+        """Publish our 429s and this worker's stats; back off when another worker was throttled."""
+        key = f"llm:{self.name}:throttled_at"
+        if self._throttled_at > self._throttle_seen:
+            await self._redis.set(key, self._throttled_at, ex=300)
+            self._throttle_seen = self._throttled_at
+        remote = float(await self._redis.get(key) or 0)
+        if remote > self._throttle_seen:
+            self._throttle_seen = remote
+            self.counters["shared_backoffs"] += 1
+            self._decrease(0.5)
+
+        workers_key = f"llm:{self.name}:workers"
+        await self._redis.hset(workers_key, _WORKER_ID, json.dumps({**self.snapshot(), "at": time.time()}))
+        await self._redis.expire(workers_key, 60)
+
+    async def cluster_snapshot(self) -> dict:
+        """Latest stats published by every live worker."""
+        if self._redis is None:
+            return {}
+        entries = await self._redis.hgetall(f"llm:{self.name}:workers")
+        cutoff = time.time() - max(10.0, 5 * settings.LLM_SYNC_INTERVAL)
+        workers = {worker: json.loads(value) for worker, value in entries.items()}
+        return {worker: stats for worker, stats in workers.items() if stats.get("at", 0) >= cutoff}
+
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        queued = {priority: 0 for priority in PRIORITIES}
+        for waiter in self._waiting:
+            queued[PRIORITIES[waiter.priority]] += 1
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "tenants_waiting": len({waiter.tenant for waiter in self._waiting}),
+            "wait_ms": {
+                priority: {"p50": _percentile(samples, 50), "p95": _percentile(samples, 95)}
+                for priority, samples in self.wait_ms.items()
+            },
+            **self.counters
+        }
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 1)
+
+
+_schedulers: dict[str, LLMScheduler] = {}
+
+
+def get_scheduler(name: str) -> LLMScheduler:
+    """Shared scheduler for a provider, created on first use."""
+    if name not in _schedulers:
+        _schedulers[name] = LLMScheduler(name)
+    return _schedulers[name]
+
+
+def scheduler_states() -> dict:
+    return {name: scheduler.snapshot() for name, scheduler in _schedulers.items()}
+
+
+def start_schedulers(redis_client: redis.Redis):
+    for scheduler in _schedulers.values():
+        scheduler.start(redis_client)
+
+
+async def stop_schedulers():
+    for scheduler in _schedulers.values():
+        await scheduler.stop()
@@ -1,8 +1,6 @@
 from typing import Optional
 from app.services.gemini_client import GeminiClient
 from app.services.openai_client import OpenAIClient
-import google.generativeai as genai
-from openai import AsyncOpenAI
 
 class LLMService:
     """
@@ -10,10 +8,10 @@ class LLMService:
     Supports dynamic API key injection for BYOK (Bring Your Own Key).
     """
 
-    def __init__(self):
-        # Default clients (using env vars)
-        self.default_gemini = GeminiClient()
-        self.default_openai = OpenAIClient()
+    def __init__(self, default_gemini: GeminiClient, default_openai: OpenAIClient):
+        # Default clients (using env vars), shared with the rest of the app
+        self.default_gemini = default_gemini
+        self.default_openai = default_openai
 
     def get_client(self, provider: str, api_key: Optional[str] = None):
         """
@@ -22,25 +20,35 @@ class LLMService:
         if provider == "openai":
             if api_key:
                 # Create a temporary client with the user's key
-                client = OpenAIClient()
-                client.client = AsyncOpenAI(api_key=api_key)
-                return client
+                return OpenAIClient(api_key=api_key)
             return self.default_openai
 
         elif provider == "gemini":
             if api_key:
                 # Create a temporary client with the user's key
-                client = GeminiClient()
-                genai.configure(api_key=api_key) # Note: This configures globally, which might be tricky for concurrency but acceptable for this scale.
-                return client
+                # Note: Gemini is configured globally, which might be tricky for concurrency but acceptable for this scale.
+                return GeminiClient(api_key=api_key)
             return self.default_gemini
         
         # Default to Gemini if unknown
         return self.default_gemini
 
-    async def generate_dual_response(self, user_query: str, provider: str = "gemini", api_key: Optional[str] = None) -> dict:
+    async def generate_dual_response(
+        self,
+        user_query: str,
+        provider: str = "gemini",
+        api_key: Optional[str] = None,
+        grade_level: Optional[int] = None,
+        difficulty: Optional[str] = None
+    ) -> dict:
         client = self.get_client(provider, api_key)
-        return await client.generate_dual_response(user_query)
-
-# Singleton
-llm_service = LLMService()
+        kwargs = {"grade_level": grade_level} if grade_level else {}
+        if isinstance(client, OpenAIClient):
+            # Picks the model tier
+            kwargs["difficulty"] = difficulty
+        try:
+            return await client.generate_dual_response(user_query, **kwargs)
+        finally:
+            # Temporary BYOK clients own a connection pool of their own
+            if isinstance(client, OpenAIClient) and client is not self.default_openai:
+                await client.close()
@@ -0,0 +1,165 @@
+"""
+Local OCR engines tried before Vision.
+
+Each engine reads one cropped region and reports its own word confidences;
+OCRService keeps the text when it is trustworthy and escalates the region to
+Vision otherwise (see LocalOCRResult.escalation_reason).
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Notation printed worksheets use that Tesseract's text models flatten or misread
+_MATH_NOTATION = re.compile(
+    r'[√∫∑∏∞≤≥≠±πθ²³^]'  # Symbols outside the usual training alphabet
+    r'|\b[a-z]\d+\b'  # "x2": an exponent read onto the baseline
+    r'|^[^\S\n]*[-—_]{2,}[^\S\n]*$',  # A fraction bar on a line of its own
+    re.MULTILINE
+)
+
+
+@dataclass
+class LocalOCRResult:
+    """Text read by a local engine, with its confidence (0-100)."""
+    text: str
+    confidence: float  # Mean word confidence, weighted by word length
+    words: int
+    low_confidence_words: int  # Words below OCR_LOCAL_WORD_CONFIDENCE
+
+    def escalation_reason(self) -> Optional[str]:
+        """Why the region should go to Vision instead, or None to keep this text."""
+        if self.words < settings.OCR_LOCAL_MIN_WORDS:
+            return "too_few_words"
+        # Handwriting shows up as many unreadable words among readable print
+        if self.low_confidence_words / self.words > settings.OCR_LOCAL_MAX_LOW_WORDS:
+            return "handwriting"
+        if self.confidence < settings.OCR_LOCAL_MIN_CONFIDENCE:
+            return "low_confidence"
+        if settings.OCR_LOCAL_ESCALATE_MATH and _MATH_NOTATION.search(self.text):
+            return "math"
+        return None
+
+
+def parse_tesseract_tsv(tsv: str) -> LocalOCRResult:
+    """
+    Build text and confidence from Tesseract's TSV output: words joined by
+    line, with a blank line between blocks.
+    """
+    lines: list[list[str]] = []
+    line_key = block = None
+    weighted = chars = 0.0
+    words = low = 0
+    for row in tsv.splitlines()[1:]:
+        cols = row.split("\t")
+        if len(cols) < 12 or cols[0] != "5":  # Level 5 rows are words
+            continue
+        word = cols[11].strip()
+        try:
+            confidence = float(cols[10])
+        except ValueError:
+            continue
+        if not word or confidence < 0:
+            continue
+        key = (cols[2], cols[3], cols[4])  # block, paragraph, line
+        if key != line_key:
+            if block is not None and cols[2] != block:
+                lines.append([])
+            lines.append([])
+            line_key, block = key, cols[2]
+        lines[-1].append(word)
+        words += 1
+        low += confidence < settings.OCR_LOCAL_WORD_CONFIDENCE
+        weighted += confidence * len(word)
+        chars += len(word)
+
+    return LocalOCRResult(
+        text="\n".join(" ".join(line) for line in lines),
+        confidence=round(weighted / chars, 1) if chars else 0.0,
+        words=words,
+        low_confidence_words=low
+    )
+
+
+class TesseractEngine:
+    """
+    Tesseract run as a separate process per region (image on stdin, TSV on
+    stdout), at most OCR_LOCAL_CONCURRENCY at once per worker. Disabled with
+    a warning when the binary is not installed.
+    """
+
+    name = "tesseract"
+
+    def __init__(self):
+        self.command = shutil.which(settings.TESSERACT_CMD)
+        if not self.command:
+            logger.warning("%s is not installed; local OCR disabled", settings.TESSERACT_CMD, extra={"stage": "ocr"})
+        self._slots = asyncio.Semaphore(settings.OCR_LOCAL_CONCURRENCY)
+        # One thread per process; parallelism comes from running several processes
+        self._env = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+
+    @property
+    def available(self) -> bool:
+        return self.command is not None
+
+    async def extract(self, image: bytes) -> Optional[LocalOCRResult]:
+        """Read an encoded image, or None if Tesseract failed or timed out."""
+        async with self._slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.command, "stdin", "stdout", "-l", settings.TESSERACT_LANG, "tsv",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=self._env
+                )
+            except OSError as e:
+                # Binary removed, exec denied, or no processes left: let Vision read the region
+                logger.warning("Could not start Tesseract: %s", e, extra={"stage": "ocr"})
+                return None
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(image), timeout=settings.OCR_LOCAL_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Tesseract timed out", extra={"stage": "ocr"})
+                return None
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+        if process.returncode != 0:
+            logger.warning(
+                "Tesseract failed: %s", stderr.decode("utf-8", "replace").strip()[:200], extra={"stage": "ocr"}
+            )
+            return None
+        return parse_tesseract_tsv(stdout.decode("utf-8", "replace"))
+
+
+LOCAL_OCR_ENGINES = {
+    "tesseract": TesseractEngine,
+}
+
+
+def create_local_engines(providers: list[str]) -> list:
+    """Available local engines among OCR_PROVIDERS, in chain order ("vision" is handled by OCRService)."""
+    engines = []
+    for name in providers:
+        if name == "vision":
+            continue
+        engine_cls = LOCAL_OCR_ENGINES.get(name)
+        if engine_cls is None:
+            logger.warning("Unknown OCR provider %r ignored", name, extra={"stage": "ocr"})
+            continue
+        engine = engine_cls()
+        if engine.available:
+            engines.append(engine)
+    return engines
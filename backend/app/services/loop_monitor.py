@@ -0,0 +1,187 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Optional
+from app.config import settings
+
+
+class LoopMonitor:
+    """
+    Measures event-loop lag and catches callbacks that block the loop.
+
+    A heartbeat coroutine ticks every LOOP_MONITOR_INTERVAL_MS and records how
+    late it woke up. A watchdog thread checks the heartbeat; when it is older
+    than LOOP_BLOCK_THRESHOLD_MS it captures the loop thread's stack, which
+    points at the code that is holding the loop. Offenders are aggregated by
+    stack so the worst ones can be served from the admin API.
+    """
+
+    MAX_OFFENDERS = 50
+    STACK_DEPTH = 12
+
+    def __init__(self):
+        self.interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        self.threshold = settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        self.lag_samples: deque = deque(maxlen=2000)
+        self.max_lag_ms = 0.0
+        self.blocked_episodes = 0
+        self.offenders: dict = {}
+        self._lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._pending_stack: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - before - self.interval)
+            with self._lock:
+                self._last_beat = now
+                self.lag_samples.append(lag * 1000)
+                self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+                if lag >= self.threshold:
+                    self.blocked_episodes += 1
+                    self._record(self._pending_stack, lag * 1000)
+                self._pending_stack = None
+
+    def _watch(self):
+        check = min(self.interval, self.threshold) / 2
+        while not self._stopping.wait(check):
+            with self._lock:
+                stale = time.monotonic() - self._last_beat - self.interval
+                if stale < self.threshold or self._pending_stack is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._pending_stack = tuple(
+                        (summary.filename, summary.lineno, summary.name, summary.line or "")
+                        for summary in traceback.extract_stack(frame)[-self.STACK_DEPTH:]
+                    )
+
+    def _record(self, stack: Optional[tuple], blocked_ms: float):
+        """Attribute a blocked interval to the stack captured while it was happening."""
+        key = stack or (("<unknown>", 0, "blocked before the watchdog sampled", ""),)
+        entry = self.offenders.get(key)
+        if entry is None:
+            if len(self.offenders) >= self.MAX_OFFENDERS:
+                smallest = min(self.offenders, key=lambda k: self.offenders[k]["total_ms"])
+                del self.offenders[smallest]
+            entry = self.offenders[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_seen": 0.0}
+        entry["count"] += 1
+        entry["total_ms"] += blocked_ms
+        entry["max_ms"] = max(entry["max_ms"], blocked_ms)
+        entry["last_seen"] = time.time()
+
+    def snapshot(self, limit: int = 10) -> dict:
+        """Lag statistics and the slowest offenders, worst first."""
+        with self._lock:
+            samples = sorted(self.lag_samples)
+            offenders = sorted(self.offenders.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+
+        def pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 2) if samples else 0.0
+
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": pct(50), "p99": pct(99), "max": round(self.max_lag_ms, 2)},
+            "blocked_episodes": self.blocked_episodes,
+            "offenders": [
+                {
+                    **{key: round(value, 2) if isinstance(value, float) else value for key, value in stats.items()},
+                    "stack": [f"{filename}:{lineno} in {name}: {line}" for filename, lineno, name, line in stack]
+                }
+                for stack, stats in offenders
+            ]
+        }
+
+
+class SamplingProfiler:
+    """On-demand wall-clock sampling profiler producing collapsed (flamegraph) stacks."""
+
+    def __init__(self):
+        self._busy = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._busy.locked()
+
+    async def profile(self, seconds: float, interval: float = 0.005, thread_id: Optional[int] = None) -> str:
+        """
+        Sample stacks for `seconds` from a background thread.
+
+        Args:
+            thread_id: Only sample this thread (e.g. the event loop); all threads when None
+
+        Returns:
+            str: one "frame;frame;frame count" line per unique stack, as read by
+                 flamegraph.pl, speedscope and inferno
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            return await asyncio.to_thread(self._sample, seconds, interval, thread_id)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _sample(seconds: float, interval: float, thread_id: Optional[int]) -> str:
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (thread_id is not None and ident != thread_id):
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(interval)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+# Singleton instances
+loop_monitor = LoopMonitor()
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,103 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Routes that are small-model work whatever the problem (short, structured outputs)
+SMALL_ROUTES = {"classification", "evaluate"}
+
+
+@dataclass
+class ModelStats:
+    """Calls to one model on one route."""
+    calls: int = 0
+    invalid: int = 0  # Outputs that failed validation
+    latency_ms: float = 0.0  # Total
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "invalid": self.invalid,
+            "avg_latency_ms": round(self.latency_ms / self.calls, 1) if self.calls else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 4)
+        }
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    escalations: int = 0
+    models: dict = field(default_factory=dict)
+
+
+class ModelRouter:
+    """
+    Picks the model cascade for a request from the problem's grade level and
+    difficulty and the prompt size: the small model first when the policy in
+    Settings allows it, escalating to the large model when its output fails
+    validation. Records latency, tokens and cost per route and model.
+    """
+
+    def __init__(self):
+        self.routes: dict[str, RouteStats] = {}
+
+    def select(
+        self,
+        route: str,
+        grade_level: Optional[int] = None,
+        difficulty: Optional[str] = None,
+        prompt_chars: int = 0
+    ) -> list[str]:
+        """Models to try in order."""
+        if not settings.MODEL_ROUTING_ENABLED:
+            return [settings.MODEL_SMALL if route in SMALL_ROUTES else settings.MODEL_LARGE]
+        if route in SMALL_ROUTES:
+            return [settings.MODEL_SMALL, settings.MODEL_LARGE]
+        small_first = (
+            grade_level is not None and grade_level <= settings.MODEL_SMALL_MAX_GRADE
+            and (difficulty or "basic") in settings.MODEL_SMALL_DIFFICULTIES
+            and prompt_chars <= settings.MODEL_SMALL_MAX_PROMPT_CHARS
+        )
+        return [settings.MODEL_SMALL, settings.MODEL_LARGE] if small_first else [settings.MODEL_LARGE]
+
+    def record(self, route: str, model: str, latency_ms: float, usage=None, valid: bool = True, attempt: int = 0):
+        """Record one model call; `attempt` > 0 means it was an escalation."""
+        stats = self.routes.setdefault(route, RouteStats())
+        if attempt == 0:
+            stats.requests += 1
+        else:
+            stats.escalations += 1
+            logger.info("Escalated %s to %s", route, model, extra={"stage": "model_router", "route": route, "model": model})
+        model_stats = stats.models.setdefault(model, ModelStats())
+        model_stats.calls += 1
+        model_stats.latency_ms += latency_ms
+        if not valid:
+            model_stats.invalid += 1
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            model_stats.prompt_tokens += prompt_tokens
+            model_stats.completion_tokens += completion_tokens
+            input_price, output_price = settings.MODEL_PRICES.get(model, [0.0, 0.0])
+            model_stats.cost_usd += (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def snapshot(self) -> dict:
+        return {
+            route: {
+                "requests": stats.requests,
+                "escalation_rate": round(stats.escalations / stats.requests, 3) if stats.requests else None,
+                "models": {model: model_stats.snapshot() for model, model_stats in stats.models.items()}
+            }
+            for route, stats in self.routes.items()
+        }
+
+
+model_router = ModelRouter()
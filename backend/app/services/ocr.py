@@ -1,42 +1,412 @@
-from openai import AsyncOpenAI
-import fitz  # PyMuPDF
 from pathlib import Path
-from typing import Optional
+from typing import Optional, AsyncIterator
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import re
 import base64
+import threading
+import aiofiles
+import logging
 from app.config import settings
+from app.services.layout import RegionCrop, crop_page_regions, crop_image_regions
+from app.services.local_ocr import create_local_engines
+from app.services.openai_client import OpenAIClient
+from app.services.problem_engine import local_problem_engine
+from app.text_cleaning import clean_text
 
+logger = logging.getLogger(__name__)
 
-class OCRService:
-    """Service for extracting text from images and PDFs using OpenAI Vision."""
 
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+@dataclass
+class ProblemSpan:
+    """A problem (or sub-part) located by character offsets into the source text."""
+    start: int
+    end: int
+    label: Optional[str] = None
+    parts: list = field(default_factory=list)
+
+
+VISION_PROMPT = """Extract ALL text from this image. This is a homework problem.
+
+Include:
+- All problem text, questions, and instructions
+- Mathematical equations and expressions
+- Diagrams labels or annotations
+- Multiple choice options if present
+
+Format the output as clean, readable text. Preserve problem numbering if present."""
+
+VISION_BATCH_PROMPT = """You will receive {count} images, each labelled "IMAGE n:". Each is part of a homework worksheet.
+
+For EACH image, in order, output a line containing exactly "=== IMAGE n ===" followed by ALL text from that image.
+Include problem text, equations, diagram labels and multiple choice options. Preserve problem numbering.
+Output nothing else. If an image has no text, output its delimiter line with nothing after it."""
+
+_BATCH_DELIMITER = re.compile(r'^[ \t]*=== IMAGE (\d+) ===[ \t]*$', re.MULTILINE)
+
+IMAGE_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+# Bounded pool for PyMuPDF work so PDF parsing never runs on the event loop.
+# Pages of one document are read sequentially, so a single upload occupies at most one thread.
+_pdf_executor = ThreadPoolExecutor(max_workers=settings.PDF_WORKER_THREADS, thread_name_prefix="pdf")
+
+
+_pdf_queued = 0  # Jobs submitted to _pdf_executor that no thread has started yet
+_pdf_queued_lock = threading.Lock()
+
+
+def pdf_queue_depth() -> int:
+    """PDF jobs waiting for a worker thread."""
+    return _pdf_queued
+
+
+async def _run_pdf_job(func, *args):
+    """Run a blocking PyMuPDF call in the PDF pool, counted as queued until a thread starts it."""
+    global _pdf_queued
+    waiting = [True]
+
+    def dequeue():
+        # Called once the job starts, or when it is cancelled before starting; whichever comes first counts
+        global _pdf_queued
+        with _pdf_queued_lock:
+            if waiting[0]:
+                waiting[0] = False
+                _pdf_queued -= 1
+
+    def job():
+        dequeue()
+        return func(*args)
+
+    with _pdf_queued_lock:
+        _pdf_queued += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pdf_executor, job)
+    finally:
+        dequeue()
+
+
+@dataclass
+class PdfPage:
+    """One page of a PDF, either with native text or cropped regions for OCR."""
+    number: int
+    text: str = ""
+    scanned: bool = False
+    crops: list = field(default_factory=list)  # RegionCrop list for scanned pages
+
+
+@dataclass
+class TextRegion:
+    """Extracted text for one page or cropped region, with where it came from."""
+    text: str
+    page: int = 0
+    bbox: Optional[tuple] = None  # Fractions of the page size; None for the whole page
+    source: str = "native"  # native, vision, or the local OCR engine's name
+    confidence: float = 0.0  # 0-100, from the engine that read it
+    file: int = 0  # Index of the uploaded file in multi-file submissions
+
+
+def _open_pdf(pdf_path: str):
+    """Open a PDF (runs in the PDF worker pool, so the first PyMuPDF import happens off the loop too)."""
+    import fitz  # PyMuPDF
+
+    return fitz.open(pdf_path)
+
+
+def _read_pdf_page(doc, page_num: int, render: bool) -> PdfPage:
+    """Read one PDF page (runs in the PDF worker pool)."""
+    page = doc[page_num]
+    # "blocks" skips per-character layout work and gives reading-order text blocks
+    blocks = page.get_text("blocks", sort=True)
+    text = "\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+
+    if len(text) >= settings.PDF_NATIVE_MIN_CHARS or not page.get_images(full=False):
+        return PdfPage(number=page_num, text=text)
+
+    # Scanned page: only the regions that contain text are rendered for OCR
+    crops = crop_page_regions(page, page_num, settings.PDF_RENDER_ZOOM) if render else []
+    return PdfPage(number=page_num, text=text, scanned=True, crops=crops)
+
+
+def split_batch_output(output: str, count: int) -> Optional[list[str]]:
+    """Split delimited batch Vision output into per-image texts, or None if malformed."""
+    matches = list(_BATCH_DELIMITER.finditer(output))
+    if [int(match.group(1)) for match in matches] != list(range(1, count + 1)):
+        return None
+    return [
+        output[match.end():matches[idx + 1].start() if idx + 1 < len(matches) else len(output)].strip()
+        for idx, match in enumerate(matches)
+    ]
+
+
+def regions_confidence(regions: list) -> float:
+    """Confidence of a document: its regions' confidences weighted by text length."""
+    weighted = chars = 0
+    for region in regions:
+        length = len(region.text.strip())
+        weighted += region.confidence * length
+        chars += length
+    return round(weighted / chars, 1) if chars else 0.0
+
+
+def join_regions(regions: list) -> tuple[str, list]:
+    """
+    Join region texts into one document.
+
+    Returns:
+        tuple: (full_text, [(start, end), ...] offsets of each region in full_text)
+    """
+    parts, offsets, cursor = [], [], 0
+    for region in regions:
+        text = region.text.strip()
+        if not text:
+            offsets.append((cursor, cursor))
+            continue
+        if parts:
+            parts.append("\n\n")
+            cursor += 2
+        parts.append(text)
+        offsets.append((cursor, cursor + len(text)))
+        cursor += len(text)
+    return "".join(parts), offsets
+
+
+# Segmentation patterns, compiled once at import time
+_MARKER_RE = re.compile(
+    r'^[^\S\n]*(?P<marker>'
+    r'(?:Q|Question|Problem|Exercise|Ex)\.?[^\S\n]*(?P<qnum>\d{1,4})[^\S\n]*[:.)]?'
+    r'|\(?(?P<num>\d{1,4})[.)]'
+    r'|\((?P<paren_alpha>[ivxlc]{1,6}|[IVXLC]{1,6}|[a-zA-Z])\)'
+    r'|(?P<alpha>[ivxlc]{1,6}|[IVXLC]{1,6}|[a-zA-Z])[.)]'
+    r')(?:[^\S\n]+|$)',
+    re.MULTILINE
+)
+_ROMAN_RE = re.compile(r'^(?:x{0,3})(?:ix|iv|v?i{0,3})$', re.IGNORECASE)
+
+
+def _classify_marker(match: re.Match, prev_alpha: dict) -> tuple[Optional[str], Optional[str]]:
+    """Return the numbering scheme of a marker match, resolving letter/roman ambiguity."""
+    if match.group('qnum') or match.group('num'):
+        return "numeric", None
+    alpha = match.group('paren_alpha') or match.group('alpha')
+    case = "upper" if alpha.isupper() else "lower"
+    is_roman = bool(_ROMAN_RE.match(alpha))
+    if len(alpha) == 1:
+        # "i"/"v"/"x" continue a letter sequence when they follow the previous letter
+        prev = prev_alpha.get(("letter", case))
+        if not is_roman or (prev and ord(alpha) == ord(prev) + 1):
+            prev_alpha[("letter", case)] = alpha
+            return f"letter-{case}", alpha
+    if is_roman:
+        return f"roman-{case}", alpha
+    return None, None
+
+
+def _rstrip_offset(text: str, start: int, end: int) -> int:
+    """Move end back over trailing whitespace, never before start."""
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+class OCRService:
+    """
+    Service for extracting text from images and PDFs.
+
+    Cropped regions go through the OCR_PROVIDERS chain: local engines first,
+    then OpenAI Vision for regions none of them read confidently.
+    """
+
+    def __init__(self, openai_client: Optional[OpenAIClient] = None, local_engines: Optional[list] = None):
+        self.openai_client = openai_client or OpenAIClient()
+        providers = settings.ocr_providers_list
+        self.local_engines = create_local_engines(providers) if local_engines is None else local_engines
+        self.use_vision = "vision" in providers
+        self._vision_slots = asyncio.Semaphore(settings.VISION_MAX_CONCURRENCY)
+        self.vision_waiting = 0
+        self.vision_in_flight = 0
+        self.regions_read = {"local": 0, "vision": 0}
+        self.escalations: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def _vision_slot(self):
+        """Hold one of VISION_MAX_CONCURRENCY slots, counting queued and running requests."""
+        self.vision_waiting += 1
+        try:
+            await self._vision_slots.acquire()
+        finally:
+            self.vision_waiting -= 1
+        self.vision_in_flight += 1
+        try:
+            yield
+        finally:
+            self.vision_in_flight -= 1
+            self._vision_slots.release()
 
     async def extract_from_image(self, image_path: str) -> tuple[str, float]:
         """
-        Extract text from an image file using OpenAI Vision.
+        Extract text from an image file.
+
+        Returns:
+            tuple: (extracted_text, confidence_score)
+        """
+        regions = await self.extract_image_regions(image_path)
+        text, _ = join_regions(regions)
+        return text, regions_confidence(regions)
+
+    async def extract_image_regions(self, image_path: str) -> list[TextRegion]:
+        """Extract text from an image's cropped text regions."""
+        return await self.extract_regions(await self.crop_image(image_path))
+
+    async def crop_image(self, image_path: str) -> list[RegionCrop]:
+        """
+        Crop an image file to its text regions in the PDF worker pool.
+        Falls back to the whole image when it cannot be analysed locally.
+        """
+        try:
+            async with aiofiles.open(image_path, "rb") as image_file:
+                image_bytes = await image_file.read()
+        except OSError as e:
+            logger.error("Could not read image %s: %s", image_path, e, extra={"stage": "ocr"})
+            return []
+
+        suffix = Path(image_path).suffix.lower()
+        try:
+            return await _run_pdf_job(crop_image_regions, image_bytes, suffix.lstrip('.'))
+        except Exception as e:
+            logger.warning("Layout analysis failed, sending full image: %s", e, extra={"stage": "layout"})
+            mime_type = IMAGE_MIME_TYPES.get(suffix, 'image/jpeg')
+            return [RegionCrop(page=0, bbox=None, image=image_bytes, mime_type=mime_type)]
+
+    async def extract_regions(self, crops: list[RegionCrop]) -> list[TextRegion]:
+        """
+        Read cropped regions, preserving their order: each is tried with the
+        local engines, and those they escalate go to Vision in batches. With
+        Vision disabled, a local engine's best reading is kept regardless.
+        """
+        local = await asyncio.gather(*(self._extract_local(crop) for crop in crops))
+        regions = [
+            region if region else TextRegion(text="", page=crop.page, bbox=crop.bbox, source="none")
+            for crop, (region, _) in zip(crops, local)
+        ]
+        escalated = [idx for idx, (_, accepted) in enumerate(local) if not accepted] if self.use_vision else []
+        if escalated:
+            results = await self.extract_batch([(crops[idx].image, crops[idx].mime_type) for idx in escalated])
+            for idx, (text, confidence) in zip(escalated, results):
+                crop = crops[idx]
+                regions[idx] = TextRegion(text=text, page=crop.page, bbox=crop.bbox, source="vision", confidence=confidence)
+            self.regions_read["vision"] += len(escalated)
+        if self.local_engines and crops:
+            logger.info(
+                "Read %d regions locally, %d with Vision", len(crops) - len(escalated), len(escalated),
+                extra={"stage": "ocr", "regions": len(crops), "vision_regions": len(escalated)}
+            )
+        return regions
+
+    async def _extract_local(self, crop: RegionCrop) -> tuple[Optional[TextRegion], bool]:
+        """
+        Try the local engines in order.
+
+        Returns:
+            tuple: (first confident reading, True), or (most confident
+            reading or None, False) when the region should go to Vision
+        """
+        best = None
+        for engine in self.local_engines:
+            result = await engine.extract(crop.image)
+            if result is None:
+                continue
+            region = TextRegion(
+                text=result.text, page=crop.page, bbox=crop.bbox, source=engine.name, confidence=result.confidence
+            )
+            reason = result.escalation_reason()
+            if reason is None:
+                self.regions_read["local"] += 1
+                return region, True
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+            if best is None or region.confidence > best.confidence:
+                best = region
+        return best, False
+
+    async def extract_batch(self, images: list[tuple[bytes, str]]) -> list[tuple[str, float]]:
+        """
+        Extract text from several images, packing up to VISION_BATCH_SIZE images
+        into each Vision request. Batches whose output cannot be split back into
+        per-image text are retried one image per request.
+
+        Args:
+            images: (image_bytes, mime_type) pairs
+
+        Returns:
+            list: (extracted_text, confidence_score) per image, in input order
+        """
+        size = max(1, settings.VISION_BATCH_SIZE)
+        chunks = [images[i:i + size] for i in range(0, len(images), size)]
+        results = await asyncio.gather(*(self._extract_chunk(chunk) for chunk in chunks))
+        return [item for chunk_results in results for item in chunk_results]
+
+    async def _extract_chunk(self, chunk: list[tuple[bytes, str]]) -> list[tuple[str, float]]:
+        if len(chunk) == 1:
+            return [await self._vision(*chunk[0])]
+
+        async with self._vision_slot():
+            texts = await self._vision_batch_request(chunk)
+
+        if texts is None:
+            logger.warning(
+                "Vision batch of %d could not be split, retrying per image", len(chunk),
+                extra={"stage": "vision_batch", "batch_size": len(chunk)}
+            )
+            return list(await asyncio.gather(*(self._vision(data, mime) for data, mime in chunk)))
+        return [(text, settings.VISION_CONFIDENCE if text else 0.0) for text in texts]
+
+    async def _vision_batch_request(self, chunk: list[tuple[bytes, str]]) -> Optional[list[str]]:
+        """Send several images in one Vision request and split the delimited output."""
+        content = [{"type": "text", "text": VISION_BATCH_PROMPT.format(count=len(chunk))}]
+        for idx, (image_bytes, mime_type) in enumerate(chunk, start=1):
+            image_data = base64.b64encode(image_bytes).decode('utf-8')
+            content.append({"type": "text", "text": f"IMAGE {idx}:"})
+            content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_data}"}})
+
+        try:
+            response = await self.openai_client.create_completion(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": content}],
+                max_tokens=min(4096, 1000 * len(chunk)),
+                temperature=0.2
+            )
+        except Exception as e:
+            logger.error("OCR batch error: %s", e, extra={"stage": "vision_batch", "batch_size": len(chunk)})
+            return None
+
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            return None
+        return split_batch_output(choice.message.content or "", len(chunk))
+
+    async def _vision(self, image_bytes: bytes, mime_type: str) -> tuple[str, float]:
+        async with self._vision_slot():
+            return await self.extract_from_image_bytes(image_bytes, mime_type)
+
+    async def extract_from_image_bytes(self, image_bytes: bytes, mime_type: str) -> tuple[str, float]:
+        """
+        Extract text from encoded image bytes using OpenAI Vision.
 
         Returns:
             tuple: (extracted_text, confidence_score)
         """
         try:
-            # Read and encode image
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-
-            # Determine image format
-            suffix = Path(image_path).suffix.lower()
-            mime_type = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.gif': 'image/gif',
-                '.webp': 'image/webp'
-            }.get(suffix, 'image/jpeg')
+            image_data = base64.b64encode(image_bytes).decode('utf-8')
 
             # Use OpenAI Vision to extract text
-            response = await self.client.chat.completions.create(
+            response = await self.openai_client.create_completion(
                 model="gpt-4o",
                 messages=[
                     {
@@ -44,15 +414,7 @@ class OCRService:
                         "content": [
                             {
                                 "type": "text",
-                                "text": """Extract ALL text from this image. This is a homework problem.
-
-Include:
-- All problem text, questions, and instructions
-- Mathematical equations and expressions
-- Diagrams labels or annotations
-- Multiple choice options if present
-
-Format the output as clean, readable text. Preserve problem numbering if present."""
+                                "text": VISION_PROMPT
                             },
                             {
                                 "type": "image_url",
@@ -68,102 +430,192 @@ Format the output as clean, readable text. Preserve problem numbering if present
             )
 
             text = response.choices[0].message.content.strip()
-            # OpenAI Vision is highly reliable, confidence is high
-            confidence = 95.0 if text else 0.0
+            confidence = settings.VISION_CONFIDENCE if text else 0.0
 
             return text, confidence
 
         except Exception as e:
-            print(f"OCR Error: {e}")
+            logger.error("OCR error: %s", e, extra={"stage": "vision"})
             return "", 0.0
 
+    async def iter_pdf_pages(self, pdf_path: str) -> AsyncIterator[PdfPage]:
+        """
+        Lazily yield the pages of a PDF, one at a time, from the PDF worker pool.
+
+        Each page is classified on its own: pages with a usable text layer carry
+        their native text, pages without one (scanned) carry cropped text regions
+        for OCR, up to PDF_MAX_VISION_PAGES per document.
+        """
+        doc = await _run_pdf_job(_open_pdf, pdf_path)
+        try:
+            vision_pages = 0
+            for page_num in range(doc.page_count):
+                render = vision_pages < settings.PDF_MAX_VISION_PAGES
+                page = await _run_pdf_job(_read_pdf_page, doc, page_num, render)
+                if page.scanned and page.crops:
+                    vision_pages += 1
+                yield page
+        finally:
+            await _run_pdf_job(doc.close)
+
     async def extract_from_pdf(self, pdf_path: str) -> tuple[str, float]:
         """
         Extract text from a PDF file.
-        First tries native text extraction, then falls back to OpenAI Vision for scanned PDFs.
+        Uses native text per page and OCRs only scanned pages, so mixed PDFs
+        keep their text layer where it exists.
 
         Returns:
             tuple: (extracted_text, confidence_score)
         """
-        try:
-            doc = fitz.open(pdf_path)
-            text_parts = []
-
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                text_parts.append(text)
-
-            full_text = "\n".join(text_parts).strip()
-
-            # If native extraction yields good text, use it
-            if len(full_text) > 50:  # Threshold for meaningful content
-                confidence = 95.0
-                doc.close()
-                return full_text, confidence
-
-            # Otherwise, convert pages to images and use OpenAI Vision
-            print("PDF appears to be scanned, using OpenAI Vision...")
-            all_text = []
-
-            for page_num in range(min(len(doc), 5)):  # Limit to first 5 pages
-                page = doc[page_num]
-                # Convert page to image
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom
-                img_path = f"/tmp/page_{page_num}.png"
-                pix.save(img_path)
+        regions = await self.extract_pdf_regions(pdf_path)
+        full_text, _ = join_regions(regions)
+        return full_text, regions_confidence(regions)
 
-                # Extract text using Vision
-                page_text, _ = await self.extract_from_image(img_path)
-                all_text.append(page_text)
-
-            doc.close()
-            full_text = "\n\n".join(all_text).strip()
-            confidence = 90.0 if full_text else 0.0
-
-            return full_text, confidence
+    async def extract_pdf_regions(self, pdf_path: str) -> list[TextRegion]:
+        """
+        Extract a PDF as page/region texts in reading order.
+        Scanned regions are batched across pages, and each batch goes to OCR
+        as soon as it fills, while later pages are still being read.
+        """
+        batches: list = []
+        try:
+            ordered: list = []  # TextRegion, or (batch index, position in batch)
+            pending: list[RegionCrop] = []
+            size = max(1, settings.VISION_BATCH_SIZE)
+
+            async for page in self.iter_pdf_pages(pdf_path):
+                if not page.scanned:
+                    # The text layer is the document's own text
+                    ordered.append(TextRegion(text=page.text, page=page.number, confidence=100.0))
+                    continue
+                for crop in page.crops:
+                    ordered.append((len(batches), len(pending)))
+                    pending.append(crop)
+                    if len(pending) == size:
+                        batches.append(asyncio.create_task(self.extract_regions(pending)))
+                        pending = []
+            if pending:
+                batches.append(asyncio.create_task(self.extract_regions(pending)))
+
+            if batches:
+                logger.info(
+                    "PDF has scanned regions, using OCR",
+                    extra={"stage": "pdf", "vision_regions": sum(1 for item in ordered if isinstance(item, tuple))}
+                )
+            results = await asyncio.gather(*batches)
+            return [
+                item if isinstance(item, TextRegion) else results[item[0]][item[1]]
+                for item in ordered
+            ]
 
         except Exception as e:
-            print(f"PDF Extraction Error: {e}")
-            return "", 0.0
+            logger.error("PDF extraction error: %s", e, extra={"stage": "pdf"})
+            return []
+        finally:
+            # Batches still running after a failure (or cancellation) mid-document
+            for task in batches:
+                task.cancel()
+            await asyncio.gather(*batches, return_exceptions=True)
 
     @staticmethod
     def clean_text(text: str) -> str:
-        """Clean and normalize extracted text."""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        """Clean and normalize extracted text, preserving line structure (see app.text_cleaning)."""
+        return clean_text(text)
+
+    @staticmethod
+    def segment_problems(text: str) -> "list[ProblemSpan]":
+        """
+        Split text into problem spans in a single pass over line-start markers.
 
-        # Remove special characters that might interfere
-        text = re.sub(r'[^\w\s\d\+\-\*\/\=\(\)\.\,\?\!\:\;\"\']', '', text)
+        Recognizes "1." / "2)" / "(3)", "Q3:" / "Question 3" / "Problem 3",
+        letters "a)" / "(b)" / "C.", and roman numerals "iv." / "(II)".
+        The first numbering scheme seen is the top level; markers of any
+        other scheme inside a problem become its sub-parts. Text before the
+        first marker (a question stem or instructions) starts the first
+        problem, and lettered options right after a stem are its sub-parts,
+        along with any other letter or roman markers up to the next numbered
+        problem.
 
-        return text.strip()
+        Returns:
+            list: ProblemSpan offsets into text
+        """
+        markers = []
+        prev_alpha = {}
+        for match in _MARKER_RE.finditer(text):
+            scheme, _ = _classify_marker(match, prev_alpha)
+            if scheme is None:
+                continue
+            markers.append((match.start(), match.end(), scheme, match.group('marker')))
+
+        if not markers:
+            return []
+
+        top_scheme = markers[0][2]
+        spans: list[ProblemSpan] = []
+        lead = len(text) - len(text.lstrip())
+        has_stem = lead < markers[0][0]
+        if has_stem and top_scheme.startswith("letter"):
+            # "Find the area.\nA. 12\nB. 15": the options belong to the stem, not problems of their own
+            spans.append(ProblemSpan(lead, markers[0][0]))
+            # Only numbered problems follow; "I." after "A." is the next option, not a new problem
+            top_scheme = "numeric" if any(scheme == "numeric" for _, _, scheme, _ in markers) else None
+        for idx, (marker_start, content_start, scheme, label) in enumerate(markers):
+            next_start = markers[idx + 1][0] if idx + 1 < len(markers) else len(text)
+            if scheme == top_scheme:
+                spans.append(ProblemSpan(content_start, next_start, label))
+            elif spans:
+                spans[-1].parts.append(ProblemSpan(content_start, next_start, label))
+                spans[-1].end = next_start
+            else:
+                # Sub-part markers before the first top-level marker start a problem of their own
+                spans.append(ProblemSpan(content_start, next_start, label))
+        if has_stem:
+            spans[0].start = lead
+
+        for span in spans:
+            span.end = _rstrip_offset(text, span.start, span.end)
+            for part in span.parts:
+                part.end = _rstrip_offset(text, part.start, part.end)
+            if span.parts:
+                span.parts[-1].end = span.end
+
+        return spans
 
     @staticmethod
     def detect_problems(text: str) -> list[dict]:
         """
         Detect individual problems in text.
-        Simple heuristic: split by numbered patterns (1., 2., etc.)
+        Problem and sub-part offsets ("start"/"end") index into the given text.
         """
-        # Pattern for numbered problems: "1.", "2)", "Question 1:", etc.
-        pattern = r'(?:^|\n)(?:\d+[\.\)]|\w+\s+\d+:)'
-
-        splits = re.split(pattern, text)
-        problems = []
-
-        for idx, problem_text in enumerate(splits):
-            if problem_text.strip():
-                problems.append({
-                    "text": problem_text.strip(),
-                    "order": idx,
-                    "type": None  # Will be classified later
-                })
+        spans = OCRService.segment_problems(text)
+        problems = [
+            {
+                "text": OCRService.clean_text(text[span.start:span.end]),
+                "order": idx,
+                "type": None,  # Will be classified later
+                "label": span.label,
+                "start": span.start,
+                "end": span.end,
+                "parts": [
+                    {"label": part.label, "start": part.start, "end": part.end}
+                    for part in span.parts
+                ]
+            }
+            for idx, span in enumerate(spans)
+            if span.end > span.start
+        ]
 
         # If no numbered problems found, treat entire text as one problem
-        if len(problems) <= 1:
+        if len(problems) <= 1 and not (problems and problems[0]["parts"]):
+            stripped_start = len(text) - len(text.lstrip())
             problems = [{
-                "text": text.strip(),
+                "text": OCRService.clean_text(text),
                 "order": 0,
-                "type": None
+                "type": None,
+                "label": None,
+                "start": stripped_start,
+                "end": _rstrip_offset(text, stripped_start, len(text)),
+                "parts": []
             }]
 
         return problems
@@ -172,8 +624,8 @@ Format the output as clean, readable text. Preserve problem numbering if present
 class ParsingOrchestrator:
     """Orchestrates the parsing pipeline."""
 
-    def __init__(self):
-        self.ocr_service = OCRService()
+    def __init__(self, ocr_service: Optional[OCRService] = None):
+        self.ocr_service = ocr_service or OCRService()
 
     async def parse_submission(
         self,
@@ -194,22 +646,98 @@ class ParsingOrchestrator:
         """
         if text:
             # Direct text input
-            raw_text = text
-            confidence = 100.0
+            return self._build_parsed(text, [], 100.0, file_type)
         elif file_type == "image" and file_path:
-            # Extract from image
-            raw_text, confidence = await self.ocr_service.extract_from_image(file_path)
+            # Extract from image (cropped text regions only)
+            regions = await self.ocr_service.extract_image_regions(file_path)
         elif file_type == "pdf" and file_path:
-            # Extract from PDF
-            raw_text, confidence = await self.ocr_service.extract_from_pdf(file_path)
+            # Extract from PDF (native pages and cropped scanned regions)
+            regions = await self.ocr_service.extract_pdf_regions(file_path)
         else:
             raise ValueError("Invalid submission: must provide text or file")
 
+        return self._build_parsed(None, regions, None, file_type)
+
+    async def parse_submission_set(self, files: list[tuple[str, str]]) -> dict:
+        """
+        Parse several uploaded files (e.g. photos of a worksheet) as one submission.
+        Cropped regions from all images share Vision batches; PDFs are read concurrently.
+
+        Args:
+            files: (file_path, file_type) pairs in upload order
+
+        Returns:
+            ParsedSubmission dict
+        """
+        image_indices = [idx for idx, (_, file_type) in enumerate(files) if file_type == "image"]
+        crops_per_image = await asyncio.gather(
+            *(self.ocr_service.crop_image(files[idx][0]) for idx in image_indices)
+        )
+        pdf_tasks = {
+            idx: asyncio.create_task(self.ocr_service.extract_pdf_regions(path))
+            for idx, (path, file_type) in enumerate(files)
+            if file_type == "pdf"
+        }
+
+        all_crops = [crop for crops in crops_per_image for crop in crops]
+        image_regions = await self.ocr_service.extract_regions(all_crops)
+
+        per_file: dict = {}
+        cursor = 0
+        for idx, crops in zip(image_indices, crops_per_image):
+            per_file[idx] = image_regions[cursor:cursor + len(crops)]
+            cursor += len(crops)
+        for idx, task in pdf_tasks.items():
+            per_file[idx] = await task
+
+        regions = []
+        for idx in range(len(files)):
+            for region in per_file.get(idx, []):
+                region.file = idx
+                regions.append(region)
+
+        file_type = "pdf" if pdf_tasks else "image"
+        return self._build_parsed(None, regions, None, file_type)
+
+    def _build_parsed(
+        self,
+        text: Optional[str],
+        regions: list[TextRegion],
+        confidence: Optional[float],
+        file_type: str
+    ) -> dict:
+        """Segment extracted text into problems and assemble the ParsedSubmission dict."""
+        region_offsets: list = []
+        if text is not None:
+            raw_text = text
+        else:
+            raw_text, region_offsets = join_regions(regions)
+            confidence = regions_confidence(regions)
+
         # Clean the text
         cleaned_text = self.ocr_service.clean_text(raw_text)
 
-        # Detect individual problems
-        detected_problems = self.ocr_service.detect_problems(cleaned_text)
+        # Detect individual problems (offsets index into raw_text)
+        detected_problems = self.ocr_service.detect_problems(raw_text)
+
+        # Map each problem back to the page regions its text came from
+        if regions:
+            for problem in detected_problems:
+                problem["regions"] = [
+                    {
+                        "file": region.file,
+                        "page": region.page,
+                        "bbox": list(region.bbox) if region.bbox else None
+                    }
+                    for region, (start, end) in zip(regions, region_offsets)
+                    if start < problem["end"] and end > problem["start"]
+                ]
+
+        # Tag problems the local engine can handle so they skip the LLM later
+        for problem in detected_problems:
+            solution = local_problem_engine.recognize(problem["text"])
+            if solution:
+                problem["type"] = solution.kind
 
         return {
             "raw_text": raw_text,
@@ -1,16 +1,109 @@
-from openai import AsyncOpenAI
 from app.config import settings
+from app.services.circuit_breaker import CircuitOpenError, get_breaker, get_byok_breaker, is_provider_failure
+from app.services.llm_scheduler import get_scheduler
+from app.services.model_router import model_router
+import contextlib
 import json
-from typing import Optional, List
+import logging
+import time
+from typing import Optional, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
 
 
 class OpenAIClient:
     """Wrapper for OpenAI API calls."""
 
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model_reasoning = "gpt-4o"
-        self.model_classification = "gpt-4o-mini"
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or settings.OPENAI_API_KEY
+        self._client: Optional["AsyncOpenAI"] = None
+        # A user's own key gets a breaker of its own, so a bad key can't open ours
+        self.breaker = get_breaker("openai") if api_key is None else get_byok_breaker("openai", api_key)
+        # Calls on a user's own key don't count against our rate limit
+        self.scheduler = get_scheduler("openai") if api_key is None else None
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        """The SDK client, imported and constructed on first use."""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=settings.OPENAI_BASE_URL)
+        return self._client
+
+    def slot(self):
+        """Scheduler admission for one provider call (a no-op for BYOK clients)."""
+        return self.scheduler.slot() if self.scheduler else contextlib.nullcontext()
+
+    async def create_completion(self, **kwargs):
+        """chat.completions.create through the request scheduler and OpenAI circuit breaker."""
+        # The breaker judges the provider call only, not the wait for a slot
+        async with self.slot():
+            with self.breaker.guard():
+                return await self.client.chat.completions.create(**kwargs)
+
+    async def _complete_json(
+        self,
+        route: str,
+        messages: List[dict],
+        temperature: float,
+        validate,
+        grade_level: Optional[int] = None,
+        difficulty: Optional[str] = None
+    ):
+        """
+        JSON completion through the model cascade for `route`: each model's
+        output is checked with `validate`, and the next (larger) model is
+        tried when it fails or the provider call itself fails (timeout, 5xx,
+        429, open circuit). The last model's output is returned either way,
+        and its provider errors propagate.
+
+        Returns:
+            tuple: (parsed JSON, raw response)
+        """
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        models = model_router.select(route, grade_level, difficulty, prompt_chars)
+        for attempt, model in enumerate(models):
+            last = attempt == len(models) - 1
+            start = time.perf_counter()
+            try:
+                response = await self.create_completion(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    temperature=temperature
+                )
+            except Exception as e:
+                if last or not (isinstance(e, CircuitOpenError) or is_provider_failure(e)):
+                    raise
+                model_router.record(route, model, (time.perf_counter() - start) * 1000, valid=False, attempt=attempt)
+                logger.warning(
+                    "%s failed for %s, trying the next model: %s", model, route, e,
+                    extra={"stage": "model_router", "route": route, "model": model, "provider": "openai"}
+                )
+                continue
+            try:
+                result = json.loads(response.choices[0].message.content)
+                valid = validate(result)
+            except (json.JSONDecodeError, TypeError):
+                result, valid = None, False
+            model_router.record(
+                route, model, (time.perf_counter() - start) * 1000,
+                usage=response.usage, valid=valid, attempt=attempt
+            )
+            if valid or last:
+                if result is None:
+                    raise ValueError(f"{model} returned invalid JSON")
+                return result, response
+
+    async def close(self):
+        """Close the underlying HTTP connection pool, if one was opened."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
 
     async def classify_submission(self, problem_text: str) -> dict:
         """
@@ -43,21 +136,19 @@ Response format:
 }}"""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_classification,
+            result, _ = await self._complete_json(
+                "classification",
                 messages=[
                     {"role": "system", "content": "You are an expert educator who classifies homework problems."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.3
+                temperature=0.3,
+                validate=_valid_classification
             )
-
-            result = json.loads(response.choices[0].message.content)
             return result
 
         except Exception as e:
-            print(f"Classification error: {e}")
+            logger.error("Classification error: %s", e, extra={"stage": "classify", "provider": "openai"})
             # Return default classification
             return {
                 "subject": "other",
@@ -73,7 +164,8 @@ Response format:
         problem_text: str,
         subject: str,
         grade_level: int,
-        scaffolding_mode: str = "moderate"
+        scaffolding_mode: str = "moderate",
+        difficulty: Optional[str] = None
     ) -> dict:
         """
         Generate scaffolded guidance for a problem.
@@ -126,21 +218,21 @@ Example format:
 }}"""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_reasoning,
+            result, _ = await self._complete_json(
+                "guidance",
                 messages=[
                     {"role": "system", "content": "You are an educational tutor focused on teaching, not giving answers."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.7
+                temperature=0.7,
+                validate=_valid_guidance,
+                grade_level=grade_level,
+                difficulty=difficulty
             )
-
-            result = json.loads(response.choices[0].message.content)
             return result
 
         except Exception as e:
-            print(f"Guidance generation error: {e}")
+            logger.error("Guidance generation error: %s", e, extra={"stage": "guidance", "provider": "openai"})
             return {
                 "micro_explanation": "Let's work through this step by step.",
                 "step_breakdown": [],
@@ -155,14 +247,21 @@ Example format:
         subject: str,
         topic: str,
         difficulty: str,
-        count: int = 3
+        count: int = 3,
+        avoid: Optional[List[str]] = None,
+        grade_level: Optional[int] = None
     ) -> List[dict]:
         """
         Generate practice problems similar to the original.
+        `avoid` lists problems already generated, which must not be repeated.
 
         Returns:
             List of PracticeProblem dicts
         """
+        existing = ""
+        if avoid:
+            listed = "\n".join(f"- {text}" for text in avoid)
+            existing = f"\nAlready given to the student (do not repeat these):\n{listed}\n"
         prompt = f"""Generate {count} practice problems similar to this one:
 
 Original Problem:
@@ -171,7 +270,7 @@ Original Problem:
 Subject: {subject}
 Topic: {topic}
 Difficulty: {difficulty}
-
+{existing}
 Create variations:
 1. Same structure, different numbers
 2. Same concept, slightly different format
@@ -189,27 +288,21 @@ Return JSON array:
 ]"""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_reasoning,
+            result, _ = await self._complete_json(
+                "practice",
                 messages=[
                     {"role": "system", "content": "You are an expert at creating practice problems."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.8
+                temperature=0.8,
+                validate=lambda result: _valid_practice(result, count, original_problem),
+                grade_level=grade_level,
+                difficulty=difficulty
             )
-
-            result = json.loads(response.choices[0].message.content)
-            # Handle both array and object responses
-            if isinstance(result, dict) and "problems" in result:
-                return result["problems"]
-            elif isinstance(result, list):
-                return result
-            else:
-                return []
+            return _practice_list(result)
 
         except Exception as e:
-            print(f"Practice generation error: {e}")
+            logger.error("Practice generation error: %s", e, extra={"stage": "practice", "provider": "openai"})
             return []
 
     async def evaluate_answer(
@@ -242,21 +335,19 @@ Provide JSON:
 }}"""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_classification,
+            result, _ = await self._complete_json(
+                "evaluate",
                 messages=[
                     {"role": "system", "content": "You are an encouraging tutor evaluating student work."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.5
+                temperature=0.5,
+                validate=_valid_evaluation
             )
-
-            result = json.loads(response.choices[0].message.content)
             return result
 
         except Exception as e:
-            print(f"Evaluation error: {e}")
+            logger.error("Evaluation error: %s", e, extra={"stage": "evaluate", "provider": "openai"})
             return {
                 "is_correct": False,
                 "feedback": "Let's try again!",
@@ -264,7 +355,7 @@ Provide JSON:
             }
 
 
-    async def generate_dual_response(self, user_query: str, grade_level: int = 8) -> dict:
+    async def generate_dual_response(self, user_query: str, grade_level: int = 8, difficulty: Optional[str] = None) -> dict:
         """
         Generate a dual response: Student Explanation + Parent Context.
         """
@@ -289,30 +380,89 @@ Provide JSON:
         """
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_reasoning,
+            result, response = await self._complete_json(
+                "dual_response",
                 messages=[
                     {"role": "system", "content": "You are a helpful educational assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.7
+                temperature=0.7,
+                validate=_valid_dual_response,
+                grade_level=grade_level,
+                difficulty=difficulty
             )
-
-            result = json.loads(response.choices[0].message.content)
+            result["tokens"] = response.usage.total_tokens if response.usage else None
             return result
 
         except Exception as e:
-            print(f"OpenAI Dual Response error: {e}")
+            logger.error("Dual response error: %s", e, extra={"stage": "dual_response", "provider": "openai"})
             return {
                 "student_response": "I'm having trouble connecting to my brain right now. Please try again!",
                 "parent_context": {
                     "deeper_terms": [],
                     "teaching_tips": "Check internet connection or API status.",
                     "explanation": "Error generating response."
-                }
+                },
+                "error": True
             }
 
 
-# Singleton instance
-openai_client = OpenAIClient()
+# Output validation for the model cascade: a small-model answer that fails
+# these checks is retried on the large model.
+
+_REFUSALS = ("i'm sorry", "i cannot", "i can't help", "as an ai")
+
+
+def _substantive(text, min_chars: int) -> bool:
+    return isinstance(text, str) and len(text.strip()) >= min_chars and not text.strip().lower().startswith(_REFUSALS)
+
+
+def _valid_classification(result) -> bool:
+    return (
+        isinstance(result, dict)
+        and result.get("subject") in ("math", "reading_comp", "writing", "science", "other")
+        and isinstance(result.get("grade_level"), int) and 1 <= result["grade_level"] <= 12
+        and result.get("difficulty") in ("basic", "intermediate", "advanced")
+    )
+
+
+def _valid_guidance(result) -> bool:
+    return (
+        isinstance(result, dict)
+        and _substantive(result.get("micro_explanation"), 40)
+        and isinstance(result.get("step_breakdown"), list) and len(result["step_breakdown"]) >= 2
+        and isinstance(result.get("reveal_sequence"), list)
+    )
+
+
+def _practice_list(result) -> List[dict]:
+    # The model returns either an array or {"problems": [...]}
+    if isinstance(result, dict) and "problems" in result:
+        return result["problems"]
+    if isinstance(result, list):
+        return result
+    return []
+
+
+def _valid_practice(result, count: int, original_problem: str) -> bool:
+    problems = _practice_list(result)
+    texts = [p.get("text", "").strip() for p in problems if isinstance(p, dict)]
+    return (
+        len(texts) >= count
+        and all(len(text) >= 5 for text in texts)
+        and len(set(texts)) == len(texts)
+        and original_problem.strip() not in texts
+    )
+
+
+def _valid_evaluation(result) -> bool:
+    return isinstance(result, dict) and isinstance(result.get("is_correct"), bool) and _substantive(result.get("feedback"), 3)
+
+
+def _valid_dual_response(result) -> bool:
+    return (
+        isinstance(result, dict)
+        and _substantive(result.get("student_response"), 80)
+        and isinstance(result.get("parent_context"), dict)
+        and _substantive(result["parent_context"].get("teaching_tips"), 10)
+    )
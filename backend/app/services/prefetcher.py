@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import GuidanceArtifact, Session as SessionModel, Submission
+from app.services.artifacts import ArtifactService
+from app.services.llm_scheduler import llm_priority_class
+from app.services.problem_engine import local_problem_engine
+from app.services.submission_problems import submission_problems
+
+logger = logging.getLogger(__name__)
+
+
+class GuidancePrefetcher:
+    """
+    Speculatively generates guidance for the first PREFETCH_PROBLEMS problems
+    of a submission as soon as it is parsed, so the first /guidance request is
+    served from the stored artifact instead of waiting on the LLM.
+
+    At most PREFETCH_CONCURRENCY prefetches generate at once per worker;
+    prefetches that wait longer than PREFETCH_MAX_QUEUE_SECONDS for a slot, or
+    whose session has ended, are dropped. Ending a session cancels its
+    prefetches still running on this worker. A user request for the same
+    problem joins the prefetch instead of starting a second generation.
+    """
+
+    def __init__(self, artifacts: ArtifactService, session_factory: async_sessionmaker):
+        self.artifacts = artifacts
+        self.session_factory = session_factory
+        self.enabled = settings.PREFETCH_GUIDANCE
+        self._semaphore = asyncio.Semaphore(settings.PREFETCH_CONCURRENCY)
+        self._tasks: dict[uuid.UUID, set[asyncio.Task]] = {}  # By session (or submission when there is none)
+        self.counters = {"scheduled": 0, "completed": 0, "cancelled": 0, "dropped": 0, "failed": 0}
+
+    def schedule(self, submission: Submission):
+        """Start background guidance generation for the submission's first problems."""
+        if not self.enabled:
+            return
+        group = submission.session_id or submission.id
+        problems = (submission.parsed_problems or [])[:settings.PREFETCH_PROBLEMS]
+        for problem_index, problem in enumerate(problems):
+            # Local guidance is instant; nothing to gain
+            if not problem.get("text", "").strip() or local_problem_engine.recognize(problem["text"]):
+                continue
+            task = asyncio.get_running_loop().create_task(
+                self._prefetch(submission.id, submission.session_id, problem_index)
+            )
+            self._tasks.setdefault(group, set()).add(task)
+            task.add_done_callback(lambda t, group=group: self._discard(group, t))
+            self.counters["scheduled"] += 1
+
+    def _discard(self, group: uuid.UUID, task: asyncio.Task):
+        tasks = self._tasks.get(group)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[group]
+
+    def cancel(self, group: uuid.UUID) -> int:
+        """Cancel prefetches for a session (or submission) running on this worker; returns how many."""
+        tasks = self._tasks.pop(group, set())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    async def close(self):
+        tasks = [task for group in self._tasks.values() for task in group]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _prefetch(self, submission_id: uuid.UUID, session_id, problem_index: int):
+        queued = time.monotonic()
+        try:
+            with llm_priority_class("prefetch"):
+                await self._run(submission_id, session_id, problem_index, queued)
+            self.counters["completed"] += 1
+        except asyncio.CancelledError:
+            self.counters["cancelled"] += 1
+            raise
+        except Exception as e:
+            self.counters["failed"] += 1
+            logger.warning(
+                "Guidance prefetch failed: %s", e,
+                extra={"stage": "prefetch", "submission_id": str(submission_id)}
+            )
+
+    async def _run(self, submission_id: uuid.UUID, session_id, problem_index: int, queued: float):
+        async with self._semaphore:
+            if time.monotonic() - queued > settings.PREFETCH_MAX_QUEUE_SECONDS:
+                self.counters["dropped"] += 1
+                return
+            async with self.session_factory() as db:
+                # Sessions may be ended on another worker
+                if session_id:
+                    session = await db.get(SessionModel, session_id)
+                    if session is None or session.ended_at is not None:
+                        self.counters["dropped"] += 1
+                        return
+                problem = await submission_problems.get(db, submission_id, problem_index)
+                if problem is None:
+                    return
+                await self.artifacts.get_guidance(
+                    db, problem,
+                    provider=settings.PREFETCH_PROVIDER,
+                    prefetched=True
+                )
+
+    async def stats(self, db: AsyncSession, hours: int = 24) -> dict:
+        """
+        Whether prefetching pays off: the share of prefetched guidance that was
+        later requested, and the tokens spent on prefetches nobody opened.
+        Prefetches younger than an hour are still pending and not counted.
+
+        Returns:
+            dict with hit_rate, wasted_tokens and this worker's counters
+        """
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            select(
+                func.count(),
+                func.count(GuidanceArtifact.served_at),
+                func.coalesce(func.sum(GuidanceArtifact.tokens), 0),
+                func.coalesce(func.sum(GuidanceArtifact.tokens).filter(GuidanceArtifact.served_at.is_(None)), 0)
+            ).where(
+                GuidanceArtifact.prefetched.is_(True),
+                GuidanceArtifact.created_at >= now - timedelta(hours=hours),
+                GuidanceArtifact.created_at < now - timedelta(hours=1)
+            )
+        )
+        prefetched, served, tokens, wasted_tokens = result.one()
+        return {
+            "enabled": self.enabled,
+            "window_hours": hours,
+            "prefetched": prefetched,
+            "served": served,
+            "hit_rate": round(served / prefetched, 3) if prefetched else None,
+            "tokens": int(tokens),
+            "wasted_tokens": int(wasted_tokens),
+            "worker": {**self.counters, "hits": self.artifacts.prefetch_hits, "running": sum(map(len, self._tasks.values()))}
+        }
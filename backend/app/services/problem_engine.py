@@ -0,0 +1,540 @@
+import ast
+import random
+import re
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Optional, List
+
+
+class UnsupportedProblem(ValueError):
+    """Raised when an expression falls outside what the local engine can handle."""
+
+
+# Units grouped by dimension, expressed in the dimension's base unit
+UNITS = {
+    "length": {
+        "mm": Fraction(1, 1000), "cm": Fraction(1, 100), "m": Fraction(1),
+        "km": Fraction(1000), "in": Fraction(254, 10000), "ft": Fraction(3048, 10000),
+        "yd": Fraction(9144, 10000), "mi": Fraction(1609344, 1000),
+    },
+    "mass": {
+        "mg": Fraction(1, 1000), "g": Fraction(1), "kg": Fraction(1000),
+        "oz": Fraction(28349523125, 1000000000), "lb": Fraction(45359237, 100000),
+    },
+    "volume": {
+        "ml": Fraction(1, 1000), "l": Fraction(1), "cup": Fraction(236588, 1000000),
+        "qt": Fraction(946353, 1000000), "gal": Fraction(3785411784, 1000000000),
+    },
+    "time": {
+        "s": Fraction(1), "min": Fraction(60), "h": Fraction(3600),
+        "day": Fraction(86400), "week": Fraction(604800),
+    },
+}
+
+UNIT_ALIASES = {
+    "millimeter": "mm", "millimeters": "mm", "millimetre": "mm", "millimetres": "mm",
+    "centimeter": "cm", "centimeters": "cm", "centimetre": "cm", "centimetres": "cm",
+    "meter": "m", "meters": "m", "metre": "m", "metres": "m",
+    "kilometer": "km", "kilometers": "km", "kilometre": "km", "kilometres": "km",
+    "inch": "in", "inches": "in", "foot": "ft", "feet": "ft",
+    "yard": "yd", "yards": "yd", "mile": "mi", "miles": "mi",
+    "milligram": "mg", "milligrams": "mg", "gram": "g", "grams": "g",
+    "kilogram": "kg", "kilograms": "kg", "ounce": "oz", "ounces": "oz",
+    "pound": "lb", "pounds": "lb", "lbs": "lb",
+    "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml", "ml": "ml",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l", "cups": "cup",
+    "quart": "qt", "quarts": "qt", "gallon": "gal", "gallons": "gal",
+    "sec": "s", "second": "s", "seconds": "s", "minute": "min", "minutes": "min", "mins": "min",
+    "hr": "h", "hrs": "h", "hour": "h", "hours": "h", "days": "day", "weeks": "week",
+}
+
+UNIT_NAMES = {
+    "mm": "millimeters", "cm": "centimeters", "m": "meters", "km": "kilometers",
+    "in": "inches", "ft": "feet", "yd": "yards", "mi": "miles",
+    "mg": "milligrams", "g": "grams", "kg": "kilograms", "oz": "ounces", "lb": "pounds",
+    "ml": "milliliters", "l": "liters", "cup": "cups", "qt": "quarts", "gal": "gallons",
+    "s": "seconds", "min": "minutes", "h": "hours", "day": "days", "week": "weeks",
+}
+
+_INSTRUCTION_RE = re.compile(
+    r"^\s*(?:solve|simplify|evaluate|calculate|compute|find|work out|what is|what's)\b"
+    r"(?:\s+(?:(?:for|the value of)\s+[a-z]|[a-z](?=\s*[:,])))?\s*(?:[:,]\s*)?",
+    re.IGNORECASE,
+)
+_TRAILING_RE = re.compile(r"(?:\s*,?\s*(?:for|solve for)\s+[a-z]\s*)?[\s\?\.!]*$", re.IGNORECASE)
+_ALLOWED_MATH_RE = re.compile(r"^[0-9a-zA-Z\s\+\-\*/\^\(\)\.=]+$")
+_VARIABLE_RE = re.compile(r"[a-zA-Z]")
+_IMPLICIT_MUL_RE = re.compile(r"(?<=[0-9a-zA-Z\)])(?=[a-zA-Z\(])|(?<=\))(?=[0-9])")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+# "1 1/2"; any other digits separated only by spaces ("2 3") are ambiguous
+_MIXED_NUMBER_RE = re.compile(r"(?<![\d./])(\d+)\s+(\d+)\s*/\s*(\d+)(?![\d.])")
+_SPACED_DIGITS_RE = re.compile(r"\d\s+\d")
+# "3/4 ÷ 1/8" divides by the whole fraction, not by 1 and then by 8
+_DIVIDE_FRACTION_RE = re.compile(r"÷\s*(\d+\s*/\s*\d+)(?![\d.]|\s*\^)")
+_UNIT_WORD = r"([a-zA-Z]+)"
+_QUANTITY = r"(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"  # Optional thousands separators: "1,500"
+_CONVERT_RE = re.compile(
+    r"^(?:convert\s+)?" + _QUANTITY + r"\s*" + _UNIT_WORD + r"\s*(?:to|into|in|=\s*(?:\?|_+)?)\s*" + _UNIT_WORD + r"\s*\??$",
+    re.IGNORECASE,
+)
+_HOW_MANY_RE = re.compile(
+    r"^how many\s+" + _UNIT_WORD + r"\s+(?:are\s+)?(?:in|is|make up)\s+" + _QUANTITY + r"\s*" + _UNIT_WORD + r"\s*\??$",
+    re.IGNORECASE,
+)
+
+DECIMAL_PLACES = 4  # Decimal answers are shown to this many places
+
+_SYMBOLS = str.maketrans({"×": "*", "·": "*", "÷": "/", "−": "-", "–": "-", "²": "^2"})
+_OP_SYMBOLS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "×", ast.Div: "÷"}
+
+
+@dataclass
+class LocalSolution:
+    """Result of recognizing and solving a problem locally."""
+    kind: str  # arithmetic, fractions, linear_equation, quadratic_equation, unit_conversion
+    problem: str
+    answer: str
+    steps: List[str] = field(default_factory=list)
+    variable: Optional[str] = None
+    params: dict = field(default_factory=dict)
+
+
+def format_number(value: Fraction, decimal: bool = False) -> str:
+    """Render a Fraction as an integer, a reduced fraction, or a short decimal."""
+    if value.denominator == 1:
+        return str(value.numerator)
+    if decimal:
+        text = f"{float(value):.{DECIMAL_PLACES}f}".rstrip("0").rstrip(".")
+        return text
+    return f"{value.numerator}/{value.denominator}"
+
+
+class Poly:
+    """Polynomial in a single variable with exact rational coefficients (degree <= 2)."""
+
+    __slots__ = ("coeffs",)
+
+    def __init__(self, coeffs: Optional[dict] = None):
+        self.coeffs = {d: c for d, c in (coeffs or {}).items() if c != 0}
+
+    @classmethod
+    def const(cls, value) -> "Poly":
+        return cls({0: Fraction(value)})
+
+    @property
+    def degree(self) -> int:
+        return max(self.coeffs, default=0)
+
+    def coeff(self, degree: int) -> Fraction:
+        return self.coeffs.get(degree, Fraction(0))
+
+    def is_const(self) -> bool:
+        return self.degree == 0
+
+    def __add__(self, other: "Poly") -> "Poly":
+        out = dict(self.coeffs)
+        for d, c in other.coeffs.items():
+            out[d] = out.get(d, Fraction(0)) + c
+        return Poly(out)
+
+    def __neg__(self) -> "Poly":
+        return Poly({d: -c for d, c in self.coeffs.items()})
+
+    def __sub__(self, other: "Poly") -> "Poly":
+        return self + (-other)
+
+    def __mul__(self, other: "Poly") -> "Poly":
+        out: dict = {}
+        for d1, c1 in self.coeffs.items():
+            for d2, c2 in other.coeffs.items():
+                out[d1 + d2] = out.get(d1 + d2, Fraction(0)) + c1 * c2
+        result = Poly(out)
+        if result.degree > 2:
+            raise UnsupportedProblem("degree above 2")
+        return result
+
+    def format(self, var: str) -> str:
+        if not self.coeffs:
+            return "0"
+        parts = []
+        for d in sorted(self.coeffs, reverse=True):
+            c = self.coeffs[d]
+            sign = "-" if c < 0 else "+"
+            mag = abs(c)
+            if d == 0:
+                body = format_number(mag)
+            else:
+                body = ("" if mag == 1 else format_number(mag)) + var + ("²" if d == 2 else "")
+            parts.append((sign, body))
+        first_sign, first_body = parts[0]
+        text = ("-" if first_sign == "-" else "") + first_body
+        for sign, body in parts[1:]:
+            text += f" {sign} {body}"
+        return text
+
+
+def _normalize_math(text: str) -> str:
+    text = _DIVIDE_FRACTION_RE.sub(r"÷ (\1)", text).translate(_SYMBOLS)
+    text = _INSTRUCTION_RE.sub("", text)
+    text = _TRAILING_RE.sub("", text)
+    return text.strip()
+
+
+def _to_python(expr: str) -> str:
+    expr = _MIXED_NUMBER_RE.sub(r"(\1+\2/\3)", expr)
+    if _SPACED_DIGITS_RE.search(expr):
+        raise UnsupportedProblem("numbers separated only by a space")
+    expr = re.sub(r"\s+", "", expr).replace("^", "**")
+    return _IMPLICIT_MUL_RE.sub("*", expr)
+
+
+class _Evaluator:
+    """Walks a Python AST built from a homework expression, recording worked steps."""
+
+    def __init__(self, var: Optional[str], record: bool = False):
+        self.var = var
+        self.record = record
+        self.steps: List[str] = []
+        self.has_decimal = False
+        self.has_fraction = False
+
+    def visit(self, node) -> Poly:
+        if isinstance(node, ast.Expression):
+            return self.visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            if isinstance(node.value, float):
+                self.has_decimal = True
+                return Poly.const(Fraction(repr(node.value)))
+            return Poly.const(node.value)
+        if isinstance(node, ast.Name):
+            if node.id != self.var:
+                raise UnsupportedProblem(f"unknown symbol {node.id}")
+            return Poly({1: Fraction(1)})
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = self.visit(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp):
+            left = self.visit(node.left)
+            right = self.visit(node.right)
+            if isinstance(node.op, ast.Pow):
+                if not right.is_const() or right.coeff(0).denominator != 1 or not 0 <= right.coeff(0) <= 3:
+                    raise UnsupportedProblem("unsupported exponent")
+                result = Poly.const(1)
+                for _ in range(int(right.coeff(0))):
+                    result = result * left
+                self._record(left, "^", right, result)
+                return result
+            if isinstance(node.op, ast.Add):
+                result = left + right
+            elif isinstance(node.op, ast.Sub):
+                result = left - right
+            elif isinstance(node.op, ast.Mult):
+                result = left * right
+            elif isinstance(node.op, ast.Div):
+                if not right.is_const() or right.coeff(0) == 0:
+                    raise UnsupportedProblem("division by a variable or zero")
+                if left.is_const() and right.is_const() and (left.coeff(0) / right.coeff(0)).denominator != 1:
+                    self.has_fraction = True
+                result = Poly({d: c / right.coeff(0) for d, c in left.coeffs.items()})
+            else:
+                raise UnsupportedProblem("unsupported operator")
+            self._record(left, _OP_SYMBOLS[type(node.op)], right, result)
+            return result
+        raise UnsupportedProblem("unsupported syntax")
+
+    def _record(self, left: Poly, op: str, right: Poly, result: Poly):
+        if not self.record or not (left.is_const() and right.is_const()):
+            return
+
+        def fmt(poly: Poly) -> str:
+            return format_number(poly.coeff(0), self.has_decimal)
+
+        self.steps.append(f"{fmt(left)} {op} {fmt(right)} = {fmt(result)}")
+
+
+def _parse(expr: str, var: Optional[str], record: bool = False) -> tuple:
+    try:
+        tree = ast.parse(_to_python(expr), mode="eval")
+    except SyntaxError as e:
+        raise UnsupportedProblem(str(e))
+    evaluator = _Evaluator(var, record=record)
+    return evaluator.visit(tree), evaluator
+
+
+class LocalProblemEngine:
+    """
+    Deterministic recognizer and scaffolder for common middle-school math problems.
+    Handles arithmetic, fractions, linear/quadratic equations and unit conversions
+    without any network call; anything else returns None so callers fall back to the LLM.
+    """
+
+    TOPICS = {
+        "arithmetic": ("arithmetic-order-of-operations", 4, "basic"),
+        "fractions": ("arithmetic-fractions", 5, "basic"),
+        "linear_equation": ("algebra-linear-equations", 7, "intermediate"),
+        "quadratic_equation": ("algebra-quadratic-equations", 9, "intermediate"),
+        "unit_conversion": ("measurement-unit-conversion", 5, "basic"),
+    }
+
+    PREREQUISITES = {
+        "arithmetic": ["basic arithmetic", "order of operations"],
+        "fractions": ["multiplication facts", "equivalent fractions"],
+        "linear_equation": ["basic arithmetic", "inverse operations"],
+        "quadratic_equation": ["linear equations", "factoring", "square roots"],
+        "unit_conversion": ["multiplication and division", "place value"],
+    }
+
+    MAX_LENGTH = 200
+
+    def recognize(self, text: str) -> Optional[LocalSolution]:
+        """Recognize and solve a problem, or return None if it is not locally solvable."""
+        if not text or len(text) > self.MAX_LENGTH:
+            return None
+        try:
+            return self._recognize_units(text) or self._recognize_math(text)
+        except (UnsupportedProblem, ZeroDivisionError, OverflowError, RecursionError):
+            return None
+
+    def _recognize_units(self, text: str) -> Optional[LocalSolution]:
+        stripped = text.strip()
+        match = _CONVERT_RE.match(stripped)
+        if match:
+            value, src, dst = match.groups()
+        else:
+            match = _HOW_MANY_RE.match(stripped)
+            if not match:
+                return None
+            dst, value, src = match.groups()
+        src_unit = UNIT_ALIASES.get(src.lower(), src.lower())
+        dst_unit = UNIT_ALIASES.get(dst.lower(), dst.lower())
+        dimension = next((d for d, units in UNITS.items() if src_unit in units and dst_unit in units), None)
+        if dimension is None or src_unit == dst_unit:
+            return None
+        return self._solve_units(Fraction(value.replace(",", "")), src_unit, dst_unit, dimension, problem=stripped)
+
+    def _solve_units(self, value: Fraction, src: str, dst: str, dimension: str, problem: str) -> LocalSolution:
+        factor = UNITS[dimension][src] / UNITS[dimension][dst]
+        result = value * factor
+        # Exact when the result's decimal expansion ends within the places shown
+        exact = (result * 10 ** DECIMAL_PLACES).denominator == 1
+        op, amount = ("×", factor) if factor >= 1 else ("÷", 1 / factor)
+        answer = f"{format_number(result, decimal=True)} {dst}"
+        steps = [
+            f"Identify the units: {UNIT_NAMES[src]} to {UNIT_NAMES[dst]}.",
+            f"1 {src} = {format_number(factor, decimal=True)} {dst}" if factor >= 1
+            else f"1 {dst} = {format_number(1 / factor, decimal=True)} {src}",
+            f"{'Bigger' if factor >= 1 else 'Smaller'} units to {'smaller' if factor >= 1 else 'bigger'} units, so {'multiply' if op == '×' else 'divide'}.",
+            f"{format_number(value, decimal=True)} {op} {format_number(amount, decimal=True)} = {format_number(result, decimal=True)}"
+            + ("" if exact else " (rounded)"),
+        ]
+        return LocalSolution(
+            kind="unit_conversion",
+            problem=problem,
+            answer=answer,
+            steps=steps,
+            params={"value": value, "from": src, "to": dst, "dimension": dimension},
+        )
+
+    def _recognize_math(self, text: str) -> Optional[LocalSolution]:
+        expr = _normalize_math(text)
+        if not expr or not _ALLOWED_MATH_RE.match(expr) or not re.search(r"\d", expr):
+            return None
+        letters = set(_VARIABLE_RE.findall(expr))
+        if len(letters) > 1:
+            return None
+        var = next(iter(letters), None)
+
+        if expr.count("=") == 1 and var:
+            lhs_text, rhs_text = expr.split("=")
+            if not lhs_text.strip() or not rhs_text.strip():
+                return None
+            lhs, _ = _parse(lhs_text, var)
+            rhs, _ = _parse(rhs_text, var)
+            return self._solve_equation(lhs, rhs, var, problem=expr)
+
+        if "=" in expr or var:
+            return None
+        value, evaluator = _parse(expr, None, record=True)
+        if not value.is_const() or not evaluator.steps:
+            return None
+        kind = "fractions" if evaluator.has_fraction or re.search(r"\d\s*/\s*\d", expr) else "arithmetic"
+        steps = ["Work inside parentheses first, then × and ÷ left to right, then + and − left to right."]
+        steps.extend(evaluator.steps)
+        return LocalSolution(
+            kind=kind,
+            problem=expr,
+            answer=format_number(value.coeff(0), evaluator.has_decimal),
+            steps=steps,
+            params={"decimal": evaluator.has_decimal},
+        )
+
+    def _solve_equation(self, lhs: Poly, rhs: Poly, var: str, problem: str) -> Optional[LocalSolution]:
+        combined = lhs - rhs
+        if combined.degree == 1:
+            a, b = combined.coeff(1), combined.coeff(0)
+            root = -b / a
+            steps = [f"Start with {lhs.format(var)} = {rhs.format(var)}."]
+            if rhs.coeff(1):
+                steps.append(f"Collect the {var} terms on one side: {Poly({1: a, 0: lhs.coeff(0)}).format(var)} = {format_number(rhs.coeff(0))}.")
+            if lhs.coeff(0):
+                steps.append(f"Undo the constant term: {Poly({1: a}).format(var)} = {format_number(-b)}.")
+            if a != 1:
+                steps.append(f"Divide both sides by {format_number(a)}: {var} = {format_number(root)}.")
+            steps.append(f"Check: substitute {var} = {format_number(root)} back into the original equation.")
+            return LocalSolution(
+                kind="linear_equation",
+                problem=problem,
+                answer=f"{var} = {format_number(root)}",
+                steps=steps,
+                variable=var,
+                params={"a": a, "b": b},
+            )
+        if combined.degree == 2:
+            a, b, c = combined.coeff(2), combined.coeff(1), combined.coeff(0)
+            disc = b * b - 4 * a * c
+            steps = [
+                f"Rewrite in standard form: {combined.format(var)} = 0.",
+                f"Identify a = {format_number(a)}, b = {format_number(b)}, c = {format_number(c)}.",
+                f"Compute the discriminant: b² − 4ac = {format_number(disc)}.",
+            ]
+            if disc < 0:
+                steps.append("The discriminant is negative, so there are no real solutions.")
+                answer = "no real solutions"
+            else:
+                roots = sorted(set(self._quadratic_roots(a, b, disc)), key=Fraction)
+                steps.append(f"Apply the quadratic formula: {var} = (−b ± √(b² − 4ac)) / 2a.")
+                answer = " or ".join(f"{var} = {r}" for r in roots)
+                steps.append(f"So {answer}.")
+            return LocalSolution(
+                kind="quadratic_equation",
+                problem=problem,
+                answer=answer,
+                steps=steps,
+                variable=var,
+                params={"a": a, "b": b, "c": c},
+            )
+        return None
+
+    @staticmethod
+    def _quadratic_roots(a: Fraction, b: Fraction, disc: Fraction) -> List[str]:
+        num, den = disc.numerator, disc.denominator
+        root_num, root_den = int(num ** 0.5 + 0.5), int(den ** 0.5 + 0.5)
+        if root_num * root_num == num and root_den * root_den == den:
+            sqrt = Fraction(root_num, root_den)
+            return [format_number((-b + sqrt) / (2 * a)), format_number((-b - sqrt) / (2 * a))]
+        sqrt = float(disc) ** 0.5
+        return [f"{(float(-b) + sqrt) / float(2 * a):.3f}", f"{(float(-b) - sqrt) / float(2 * a):.3f}"]
+
+    def classify(self, solution: LocalSolution) -> dict:
+        """Build a ClassifiedSubmission-shaped dict for a locally recognized problem."""
+        topic, grade_level, difficulty = self.TOPICS[solution.kind]
+        if solution.kind == "linear_equation" and len(solution.steps) <= 3:
+            difficulty = "basic"  # One-step equations: a single inverse operation
+        return {
+            "subject": "math",
+            "topic": topic,
+            "grade_level": grade_level,
+            "difficulty": difficulty,
+            "prerequisites": list(self.PREREQUISITES[solution.kind]),
+            "detected_gaps": []
+        }
+
+    def generate_guidance(self, solution: LocalSolution) -> dict:
+        """Build a GuidanceResponse-shaped dict that scaffolds without leading with the answer."""
+        explanations = {
+            "arithmetic": "Expressions follow the order of operations: parentheses first, then multiplication and division, then addition and subtraction.",
+            "fractions": "To add or subtract fractions you need a common denominator; to multiply, multiply tops and bottoms; to divide, multiply by the reciprocal.",
+            "linear_equation": f"A linear equation is balanced like a scale. Whatever you do to one side, do to the other, until {solution.variable} is alone.",
+            "quadratic_equation": f"A quadratic equation has an {solution.variable}² term. Put it in the form a{solution.variable}² + b{solution.variable} + c = 0, then factor or use the quadratic formula.",
+            "unit_conversion": "Converting units means multiplying or dividing by how many of the small unit fit in the big unit.",
+        }
+        warnings = {
+            "arithmetic": ["Don't just work left to right — multiplication and division come before addition and subtraction."],
+            "fractions": ["Don't add the denominators together.", "Simplify your final answer."],
+            "linear_equation": ["Do the same operation to both sides.", "Watch the sign when moving a term across the equals sign."],
+            "quadratic_equation": ["Make sure one side is 0 before factoring.", "There can be two solutions — don't stop after one."],
+            "unit_conversion": ["Check whether the answer should get bigger or smaller.", "Keep track of which unit is which."],
+        }
+        work_steps = solution.steps[:-1] if len(solution.steps) > 1 else solution.steps
+        step_breakdown = [
+            {"order": i + 1, "text": step, "hint": None}
+            for i, step in enumerate(work_steps)
+        ]
+        reveal_sequence = [
+            {"level": 1, "content": explanations[solution.kind].split(". ")[0].rstrip(".") + ".", "reveal_type": "hint"},
+            {"level": 2, "content": solution.steps[0], "reveal_type": "hint"},
+            {"level": 3, "content": " ".join(work_steps), "reveal_type": "partial"},
+            {"level": 4, "content": f"{' '.join(solution.steps)} Answer: {solution.answer}", "reveal_type": "full"},
+        ]
+        return {
+            "micro_explanation": explanations[solution.kind],
+            "step_breakdown": step_breakdown,
+            "error_warnings": warnings[solution.kind],
+            "interactive_checks": [
+                {
+                    "text": "What is your final answer?",
+                    "expected_answer": solution.answer,
+                    "explanation": "Check it by substituting back or estimating."
+                }
+            ],
+            "reveal_sequence": reveal_sequence
+        }
+
+    def generate_practice_problems(self, solution: LocalSolution, count: int = 3) -> List[dict]:
+        """Generate practice variants with the same structure and fresh numbers."""
+        rng = random.Random(f"{solution.problem}:{count}")
+        problems = []
+        attempts = 0
+        while len(problems) < count and attempts < count * 10:
+            attempts += 1
+            variant = self._variant(solution, rng, len(problems))
+            if variant is None:
+                continue
+            solved = self.recognize(variant)
+            if solved is None or solved.problem == solution.problem:
+                continue
+            if any(p["text"] == variant for p in problems):
+                continue
+            _, _, difficulty = self.TOPICS[solved.kind]
+            reversed_units = solved.kind == "unit_conversion" and solved.params["from"] != solution.params["from"]
+            problems.append({
+                "text": variant,
+                "difficulty": difficulty,
+                "variation_type": "format_change" if reversed_units else "same_structure",
+                "solution": " ".join(solved.steps) + f" Answer: {solved.answer}",
+                "answer": solved.answer
+            })
+        return problems
+
+    def _variant(self, solution: LocalSolution, rng: random.Random, index: int) -> Optional[str]:
+        var = solution.variable
+        if solution.kind == "linear_equation":
+            a = rng.choice([n for n in range(-9, 10) if n not in (0,)])
+            x = rng.randint(-10, 10)
+            b = rng.randint(-20, 20)
+            lhs = Poly({1: Fraction(a), 0: Fraction(b)}).format(var)
+            return f"Solve {lhs} = {a * x + b}"
+        if solution.kind == "quadratic_equation":
+            r1, r2 = rng.randint(-9, 9), rng.randint(-9, 9)
+            poly = Poly({2: Fraction(1), 1: Fraction(-(r1 + r2)), 0: Fraction(r1 * r2)})
+            return f"Solve {poly.format(var).replace('²', '^2')} = 0"
+        if solution.kind == "unit_conversion":
+            src, dst = solution.params["from"], solution.params["to"]
+            if index % 2 == 1:
+                src, dst = dst, src
+            value = rng.randint(2, 50)
+            if solution.params["value"].denominator != 1:
+                value += rng.choice([0.25, 0.5, 0.75])
+            return f"Convert {value} {src} to {dst}"
+        # Arithmetic and fractions: keep the operators, replace the numbers
+        def swap(match):
+            number = match.group(0)
+            if "." in number:
+                return f"{rng.randint(1, 20) + rng.choice([0.25, 0.5, 0.75])}"
+            magnitude = max(2, int(number))
+            return str(rng.randint(1, max(9, min(magnitude * 2, 999))))
+        return _NUMBER_RE.sub(swap, solution.problem)
+
+
+# Singleton instance
+local_problem_engine = LocalProblemEngine()
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Optional
+import redis.asyncio as redis
+
+# Delete only while the key still holds the caller's value (e.g. its lock token)
+_DELETE_IF_EQUALS = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedStore:
+    """
+    JSON key-value store in Redis for state that must be visible to every
+    worker and replica (in-process dicts diverge as soon as there is more than one).
+    Keys are namespaced and expire after `ttl` seconds by default.
+    """
+
+    def __init__(self, client: redis.Redis, namespace: str, ttl: Optional[int] = None):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self._key(key))
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.client.set(self._key(key), json.dumps(value, default=str), ex=ttl or self.ttl)
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set the key only if it does not exist; returns whether it was set."""
+        return bool(await self.client.set(self._key(key), json.dumps(value, default=str), ex=ttl or self.ttl, nx=True))
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+    async def delete_if_equals(self, key: str, value: Any) -> bool:
+        """Delete the key if it still holds `value`; returns whether it was deleted."""
+        return bool(await self.client.eval(_DELETE_IF_EQUALS, 1, self._key(key), json.dumps(value, default=str)))
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import ProblemEmbedding, Submission
+from app.services.embeddings import same_quantities
+from app.services.problem_engine import local_problem_engine
+from app.services.similarity_index import SimilarityIndex, SimilarMatch
+from app.services.submission_problems import submission_problems
+
+logger = logging.getLogger(__name__)
+
+# Exact search on more rows than this runs off the event loop
+_INLINE_SEARCH_ROWS = 20000
+
+
+class SimilarProblemService:
+    """
+    Finds near-identical problems seen before, so their stored guidance and
+    practice can be reused instead of generated.
+
+    Every parsed problem that needs the LLM is embedded and recorded in
+    problem_embeddings. Each worker keeps a SimilarityIndex over those rows:
+    loaded from a memory-mapped snapshot at startup, then caught up from the
+    table on an interval so problems indexed by other workers become visible.
+    """
+
+    def __init__(self, embedder, session_factory: async_sessionmaker):
+        self.embedder = embedder
+        self.session_factory = session_factory
+        self.enabled = settings.SIMILARITY_ENABLED
+        self.index = SimilarityIndex(
+            dim=embedder.dim,
+            path=settings.SIMILARITY_INDEX_PATH,
+            mode=settings.SIMILARITY_INDEX_MODE
+        )
+        self._local_seqs: set[int] = set()  # Rows this worker added ahead of the catch-up cursor
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.index.load, self.embedder.name)
+        self._cursor = self.index.max_seq
+        self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Rows past the cursor may have gaps (other workers' rows not caught up yet);
+            # leave them out so the next start re-reads them from the table
+            await asyncio.to_thread(self.index.save, self.embedder.name, self._cursor)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.catch_up()
+            except Exception as e:
+                logger.warning("Similarity index refresh failed: %s", e, extra={"stage": "similarity"})
+            await asyncio.sleep(settings.SIMILARITY_REFRESH_SECONDS)
+
+    async def catch_up(self, batch: int = 5000):
+        """Add rows written since the cursor (by any worker) to the local index."""
+        # Rows younger than a few seconds may belong to transactions that commit out of order
+        settled = datetime.now(timezone.utc) - timedelta(seconds=5)
+        async with self.session_factory() as db:
+            while True:
+                result = await db.execute(
+                    select(
+                        ProblemEmbedding.id, ProblemEmbedding.submission_id,
+                        ProblemEmbedding.problem_index, ProblemEmbedding.embedding
+                    )
+                    .where(
+                        ProblemEmbedding.id > self._cursor,
+                        ProblemEmbedding.embedder == self.embedder.name,
+                        ProblemEmbedding.created_at < settled
+                    )
+                    .order_by(ProblemEmbedding.id)
+                    .limit(batch)
+                )
+                rows = result.all()
+                for seq, submission_id, problem_index, embedding in rows:
+                    if seq in self._local_seqs:
+                        continue
+                    vector = np.frombuffer(embedding, dtype=np.float32)
+                    if vector.shape == (self.index.dim,):
+                        self.index.add(seq, submission_id, problem_index, vector)
+                if rows:
+                    self._cursor = rows[-1][0]
+                    self._local_seqs = {seq for seq in self._local_seqs if seq > self._cursor}
+                if len(rows) < batch:
+                    return
+
+    async def index_submission(self, db: AsyncSession, submission: Submission):
+        """Embed and record the submission's problems that need the LLM."""
+        if not self.enabled:
+            return
+        rows, vectors = [], []
+        for problem_index, problem in enumerate(submission.parsed_problems or []):
+            text = problem.get("text", "")
+            if not text.strip() or local_problem_engine.recognize(text):
+                continue
+            vector = await self.embedder.embed(text)
+            vectors.append(vector)
+            rows.append(ProblemEmbedding(
+                submission_id=submission.id,
+                problem_index=problem_index,
+                embedder=self.embedder.name,
+                embedding=vector.astype(np.float32).tobytes()
+            ))
+        if not rows:
+            return
+        db.add_all(rows)
+        await db.commit()
+        for row, vector in zip(rows, vectors):
+            self.index.add(row.id, submission.id, row.problem_index, vector)
+            self._local_seqs.add(row.id)
+
+    async def find_similar(self, text: str, exclude: tuple) -> Optional[SimilarMatch]:
+        """
+        Best prior problem at or above SIMILARITY_THRESHOLD with the same
+        numbers and operators (see same_quantities), other than `exclude`
+        (submission_id, index).
+        """
+        vector = await self.embedder.embed(text)
+        if len(self.index) > _INLINE_SEARCH_ROWS and self.index.mode == "exact":
+            matches = await asyncio.to_thread(self.index.search, vector)
+        else:
+            matches = self.index.search(vector)
+        candidates = [
+            match for match in matches
+            if (match.submission_id, match.problem_index) != exclude and match.score >= settings.SIMILARITY_THRESHOLD
+        ]
+        if not candidates:
+            return None
+        async with self.session_factory() as db:
+            for match in candidates:
+                if await self.matches_quantities(db, text, match):
+                    return match
+        return None
+
+    @staticmethod
+    async def matches_quantities(db: AsyncSession, text: str, match: SimilarMatch) -> bool:
+        """Whether the matched problem has the same numbers and operators as `text`."""
+        try:
+            source = await submission_problems.get(db, match.submission_id, match.problem_index)
+        except IndexError:
+            return False
+        return source is not None and same_quantities(text, source.text)
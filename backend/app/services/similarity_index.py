@@ -0,0 +1,198 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One row per indexed problem: database sequence, submission UUID bytes, problem index
+KEY_DTYPE = np.dtype([("seq", "<i8"), ("submission", "S16"), ("problem", "<i4")])
+
+
+@dataclass
+class SimilarMatch:
+    """A previously seen problem close to the query."""
+    submission_id: uuid.UUID
+    problem_index: int
+    score: float  # Cosine similarity
+
+
+class SimilarityIndex:
+    """
+    In-memory vector index over unit-length problem embeddings.
+
+    exact: NumPy brute-force inner product over all rows.
+    hnsw: approximate search with hnswlib (optional dependency), built over
+    the same rows at load time.
+
+    Snapshots are plain .npy files in a directory per snapshot, named by the
+    CURRENT pointer file; on load the vectors are memory-mapped, so several
+    workers on one host share the pages and startup doesn't copy them.
+    Rows added since the snapshot live in a growable in-memory array.
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None, mode: str = "exact"):
+        self.dim = dim
+        self.path = Path(path) if path else None
+        self.mode = mode
+        self._base = np.empty((0, dim), dtype=np.float32)
+        self._base_keys = np.empty(0, dtype=KEY_DTYPE)
+        self._extra = np.empty((1024, dim), dtype=np.float32)
+        self._extra_keys = np.empty(1024, dtype=KEY_DTYPE)
+        self._extra_count = 0
+        self._hnsw = None
+        self.max_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._base) + self._extra_count
+
+    def load(self, embedder: str) -> bool:
+        """Memory-map the current snapshot if it matches this embedder and dimension; returns whether it was used."""
+        snapshot = self._current_snapshot()
+        if snapshot is None or not (snapshot / "meta.json").exists():
+            self._build_hnsw()
+            return False
+        try:
+            meta = json.loads((snapshot / "meta.json").read_text())
+            vectors = np.load(snapshot / "vectors.npy", mmap_mode="r")
+            keys = np.load(snapshot / "keys.npy", mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("Similarity snapshot unreadable, rebuilding: %s", e, extra={"stage": "similarity"})
+            self._build_hnsw()
+            return False
+        if meta.get("embedder") != embedder or meta.get("dim") != self.dim:
+            self._build_hnsw()
+            return False
+        if not len(vectors) == len(keys) == meta.get("count"):
+            logger.warning(
+                "Similarity snapshot %s is inconsistent (%d vectors, %d keys, count %s), rebuilding",
+                snapshot.name, len(vectors), len(keys), meta.get("count"), extra={"stage": "similarity"}
+            )
+            self._build_hnsw()
+            return False
+
+        self._base, self._base_keys = vectors, keys
+        self.max_seq = int(meta.get("max_seq", 0))
+        self._build_hnsw()
+        return True
+
+    def _current_snapshot(self) -> Optional[Path]:
+        if not self.path:
+            return None
+        try:
+            name = (self.path / "CURRENT").read_text().strip()
+        except OSError:
+            return None
+        return self.path / "snapshots" / name if name else None
+
+    def save(self, embedder: str, max_seq: Optional[int] = None):
+        """
+        Write a snapshot of the rows up to `max_seq` (all rows when None).
+
+        Every worker saves to the same path, so each snapshot is written to
+        its own directory and published by atomically replacing the CURRENT
+        pointer; a reader never sees files from two different snapshots.
+        Savers take a file lock; older snapshots are pruned, keeping the one
+        CURRENT pointed to before, which workers may still be loading.
+        """
+        if not self.path:
+            return
+        vectors = np.concatenate([self._base, self._extra[:self._extra_count]])
+        keys = np.concatenate([self._base_keys, self._extra_keys[:self._extra_count]])
+        if max_seq is not None:
+            keep = keys["seq"] <= max_seq
+            vectors, keys = vectors[keep], keys[keep]
+        else:
+            max_seq = self.max_seq
+
+        snapshots = self.path / "snapshots"
+        snapshots.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".lock", "w") as lock:
+            # Serializes savers, so pruning never removes a snapshot still being written
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            name = f"{time.time_ns()}-{os.getpid()}"
+            directory = snapshots / name
+            directory.mkdir()
+            np.save(directory / "vectors.npy", vectors)
+            np.save(directory / "keys.npy", keys)
+            meta = {"embedder": embedder, "dim": self.dim, "count": len(vectors), "max_seq": max_seq}
+            (directory / "meta.json").write_text(json.dumps(meta))
+
+            previous = self._current_snapshot()
+            tmp = self.path / f".CURRENT.{os.getpid()}"
+            tmp.write_text(name)
+            os.replace(tmp, self.path / "CURRENT")
+            for old in snapshots.iterdir():
+                if old not in (directory, previous):
+                    shutil.rmtree(old, ignore_errors=True)
+
+    def add(self, seq: int, submission_id: uuid.UUID, problem_index: int, vector: np.ndarray):
+        if self._extra_count == len(self._extra):
+            self._extra = np.concatenate([self._extra, np.empty_like(self._extra)])
+            self._extra_keys = np.concatenate([self._extra_keys, np.empty_like(self._extra_keys)])
+        row = self._extra_count
+        self._extra[row] = vector
+        self._extra_keys[row] = (seq, submission_id.bytes, problem_index)
+        self._extra_count += 1
+        self.max_seq = max(self.max_seq, seq)
+        if self._hnsw is not None:
+            label = len(self) - 1
+            if label >= self._hnsw.get_max_elements():
+                self._hnsw.resize_index(max(1024, 2 * self._hnsw.get_max_elements()))
+            self._hnsw.add_items(vector.reshape(1, -1), np.array([label]))
+
+    def search(self, vector: np.ndarray, k: int = 5) -> list[SimilarMatch]:
+        """Nearest rows by cosine similarity, best first."""
+        if not len(self):
+            return []
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(vector.reshape(1, -1), k=min(k, len(self)))
+            # hnswlib's "ip" space returns 1 - inner product
+            return [self._match(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+        candidates = []
+        for offset, matrix in ((0, self._base), (len(self._base), self._extra[:self._extra_count])):
+            if not len(matrix):
+                continue
+            scores = matrix @ vector
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            candidates += [(float(scores[i]), offset + int(i)) for i in top]
+        candidates.sort(reverse=True)
+        return [self._match(row, score) for score, row in candidates[:k]]
+
+    def _key(self, row: int):
+        if row < len(self._base):
+            return self._base_keys[row]
+        return self._extra_keys[row - len(self._base)]
+
+    def _match(self, row: int, score: float) -> SimilarMatch:
+        key = self._key(row)
+        return SimilarMatch(
+            submission_id=uuid.UUID(bytes=bytes(key["submission"]).ljust(16, b"\0")),
+            problem_index=int(key["problem"]),
+            score=score
+        )
+
+    def _build_hnsw(self):
+        if self.mode != "hnsw":
+            return
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; using exact search", extra={"stage": "similarity"})
+            self.mode = "exact"
+            return
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=max(1024, 2 * len(self)), ef_construction=200, M=16)
+        index.set_ef(64)
+        if len(self):
+            vectors = np.concatenate([self._base, self._extra[:self._extra_count]])
+            index.add_items(vectors, np.arange(len(vectors)))
+        self._hnsw = index
@@ -0,0 +1,398 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+from urllib.parse import urlencode
+from app.config import settings
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed keys: <sha256>.<ext>
+_KEY_RE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,5}$')
+# Direct uploads land on a per-upload key first: staging/<nonce>/<sha256>.<ext>
+_STAGING_RE = re.compile(r'^staging/[0-9a-f]{32}/([0-9a-f]{64}\.[a-z0-9]{1,5})$')
+
+
+class StorageError(Exception):
+    """Raised when an object cannot be stored or read."""
+
+
+@dataclass
+class StoredObject:
+    """An object in upload storage."""
+    key: str
+    size: int
+    sha256: str
+    content_type: str
+    created: bool  # False when identical content was already stored
+
+
+def content_key(sha256: str, ext: str) -> str:
+    """Storage key for content with the given SHA-256 (hex) and file extension."""
+    return f"{sha256.lower()}.{ext.lower()}"
+
+
+def is_content_key(key: str) -> bool:
+    return bool(_KEY_RE.match(key))
+
+
+def staging_key(sha256: str, ext: str) -> str:
+    """
+    A fresh, unguessable key for one direct upload. Only the client that asked
+    for it can complete the upload, so knowing a file's hash is not enough to
+    claim an object someone else stored.
+    """
+    return f"staging/{secrets.token_hex(16)}/{content_key(sha256, ext)}"
+
+
+def is_staging_key(key: str) -> bool:
+    return bool(_STAGING_RE.match(key))
+
+
+def _hash_file(fileobj: BinaryIO) -> tuple[str, int]:
+    """SHA-256 and size of a file object, read in chunks from the start."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+async def file_sha256(fileobj: BinaryIO) -> str:
+    """SHA-256 of a file object's contents, hashed in a worker thread."""
+    digest, _ = await asyncio.to_thread(_hash_file, fileobj)
+    return digest
+
+
+class StorageBackend(ABC):
+    """
+    Upload storage. Objects are keyed by content hash, so identical uploads
+    are stored once. Subclasses implement the primitive operations.
+    """
+
+    name = "base"
+
+    async def exists(self, key: str) -> bool:
+        return await self.size(key) is not None
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """Object size in bytes, or None if it does not exist."""
+
+    @abstractmethod
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of an object."""
+
+    @abstractmethod
+    def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Stream an object without loading it into memory."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Delete an object (a no-op if it does not exist)."""
+
+    @abstractmethod
+    async def _put_file(self, fileobj: BinaryIO, key: str, content_type: str):
+        """Write a file object to `key`."""
+
+    @abstractmethod
+    async def _move(self, source: str, key: str):
+        """Move an object to another key, replacing what is there."""
+
+    @abstractmethod
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str) -> dict:
+        """
+        Describe a direct-to-storage upload of exactly this content.
+
+        Returns:
+            dict: url, method and headers the client must send the bytes with
+        """
+
+    @abstractmethod
+    def download_url(self, key: str) -> str:
+        """URL the client downloads the object from."""
+
+    async def promote(self, staged: str) -> str:
+        """
+        Move a completed direct upload to its content key, or drop it when
+        identical content is already stored. The staged bytes were checked
+        against their hash when they were uploaded.
+
+        Returns:
+            str: the content key
+        """
+        match = _STAGING_RE.match(staged)
+        if not match:
+            raise StorageError(f"Not a staged upload: {staged}")
+        key = match.group(1)
+        if await self.exists(key):
+            await self.delete(staged)
+        else:
+            await self._move(staged, key)
+        return key
+
+    async def store_file(self, fileobj: BinaryIO, ext: str, content_type: str) -> StoredObject:
+        """Store a file object under its content hash, skipping the write if it already exists."""
+        sha256, size = await asyncio.to_thread(_hash_file, fileobj)
+        key = content_key(sha256, ext)
+        created = not await self.exists(key)
+        if created:
+            await self._put_file(fileobj, key, content_type)
+        return StoredObject(key=key, size=size, sha256=sha256, content_type=content_type, created=created)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        """
+        Yield a local path for an object, for readers that need a real file
+        (PyMuPDF). The object is streamed to a temporary file and removed afterwards.
+        """
+        fd, tmp_name = tempfile.mkstemp(suffix=Path(key).suffix)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                async for chunk in self.iter_chunks(key):
+                    await asyncio.to_thread(tmp.write, chunk)
+            yield Path(tmp_name)
+        finally:
+            os.unlink(tmp_name)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Filesystem storage under UPLOAD_DIR, for development and single-node setups.
+    Direct uploads go to a signed PUT route on the API itself, standing in for
+    an object store's presigned URL.
+    """
+
+    name = "local"
+    DIRECT_UPLOAD_PATH = "/api/submissions/upload/direct"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise StorageError(f"Invalid key: {key}")
+        return path
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(self._path(key).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        def read():
+            with open(self._path(key), "rb") as f:
+                f.seek(start)
+                return f.read(max(0, end - start))
+        return await asyncio.to_thread(read)
+
+    async def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._path(key).unlink, True)
+
+    async def _put_file(self, fileobj: BinaryIO, key: str, content_type: str):
+        def write():
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(fileobj, tmp, CHUNK_SIZE)
+            os.replace(tmp_name, path)
+        await asyncio.to_thread(write)
+
+    async def _move(self, source: str, key: str):
+        await asyncio.to_thread(os.replace, self._path(source), self._path(key))
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes], sha256: str, size: int):
+        """Write a streamed body to `key`, rejecting it unless its hash and size match."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        digest = hashlib.sha256()
+        received = 0
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                async for chunk in chunks:
+                    received += len(chunk)
+                    if received > size:
+                        raise StorageError("Upload is larger than declared")
+                    digest.update(chunk)
+                    await asyncio.to_thread(tmp.write, chunk)
+            if received != size or digest.hexdigest() != sha256:
+                raise StorageError("Upload does not match its declared size and SHA-256")
+            os.replace(tmp_name, path)
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+
+    def _signature(self, key: str, size: int, sha256: str, expires: int) -> str:
+        message = f"{key}:{size}:{sha256}:{expires}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify_upload(self, key: str, size: int, sha256: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, size, sha256, expires), signature)
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str) -> dict:
+        expires = int(time.time()) + settings.STORAGE_PRESIGN_EXPIRES
+        query = urlencode({
+            "size": size,
+            "sha256": sha256,
+            "expires": expires,
+            "signature": self._signature(key, size, sha256, expires)
+        })
+        return {
+            "url": f"{self.DIRECT_UPLOAD_PATH}/{key}?{query}",
+            "method": "PUT",
+            "headers": {"Content-Type": content_type}
+        }
+
+    def download_url(self, key: str) -> str:
+        return f"/uploads/{key}"
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        # Already on disk; no copy needed
+        yield self._path(key)
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible object storage (AWS S3, MinIO, R2, ...). Clients upload and
+    download directly with presigned URLs, so file bytes bypass API workers.
+    Requires boto3.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, region: Optional[str] = None):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise StorageError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)") from e
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            config=Config(signature_version="s3v4", max_pool_connections=32)
+        )
+        self._client_error = ClientError
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b""
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{end - 1}"
+        )
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def iter_chunks(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self._key(key))
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+    async def _put_file(self, fileobj: BinaryIO, key: str, content_type: str):
+        # upload_fileobj streams in parts rather than reading the whole file
+        await asyncio.to_thread(
+            self.client.upload_fileobj, fileobj, self.bucket, self._key(key),
+            ExtraArgs={"ContentType": content_type}
+        )
+
+    async def _move(self, source: str, key: str):
+        await asyncio.to_thread(
+            self.client.copy_object,
+            Bucket=self.bucket, Key=self._key(key), CopySource={"Bucket": self.bucket, "Key": self._key(source)}
+        )
+        await self.delete(source)
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str) -> dict:
+        # S3 rejects the PUT unless the body matches the signed length and checksum
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(key),
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum
+            },
+            ExpiresIn=settings.STORAGE_PRESIGN_EXPIRES
+        )
+        return {
+            "url": url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type, "x-amz-checksum-sha256": checksum}
+        }
+
+    def download_url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=settings.STORAGE_PRESIGN_EXPIRES
+        )
+
+
+def create_storage() -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND."""
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.S3_BUCKET:
+            raise StorageError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION
+        )
+    return LocalStorage(settings.UPLOAD_DIR)
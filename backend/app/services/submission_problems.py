@@ -0,0 +1,102 @@
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Submission
+from app.text_storage import expand_problem
+
+
+@dataclass(frozen=True)
+class SubmissionProblem:
+    """One parsed problem with the submission fields guidance and practice need."""
+    submission_id: uuid.UUID
+    problem_index: int
+    text: str
+    problem_count: int
+    session_id: Optional[uuid.UUID] = None
+    student_id: Optional[uuid.UUID] = None
+    subject: Optional[str] = None
+    topic: Optional[str] = None
+    grade_level: Optional[int] = None
+    difficulty: Optional[str] = None
+
+
+class SubmissionProblemCache:
+    """
+    Reads a single parsed problem plus the submission's classification,
+    extracting the problem in Postgres (parsed_problems -> idx) so the other
+    problems are not transferred. Problems longer than
+    PROBLEM_TEXT_INLINE_CHARS are stored as offsets into raw_text; for those
+    the whole (compressed) raw_text is read and decompressed, since Postgres
+    can't slice it. Short problems, most of them, keep their text inline and
+    never touch raw_text. A submission's problems
+    and classification never change once stored, so entries are kept in a
+    per-worker LRU without invalidation.
+    """
+
+    def __init__(self, max_entries: int = settings.SUBMISSION_PROBLEM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, SubmissionProblem] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, submission_id: uuid.UUID, problem_index: int) -> Optional[SubmissionProblem]:
+        """
+        The problem, or None if the submission does not exist.
+
+        Raises:
+            IndexError: the submission has no problem at `problem_index`
+        """
+        if problem_index < 0:
+            raise IndexError(problem_index)
+        key = (submission_id, problem_index)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        stored = Submission.stored_problems[problem_index]
+        result = await db.execute(
+            select(
+                stored.label("problem"),
+                case((~stored.has_key("text"), Submission.raw_text)).label("raw_text"),
+                func.coalesce(func.jsonb_array_length(Submission.stored_problems), 0).label("problem_count"),
+                Submission.session_id,
+                Submission.student_id,
+                Submission.subject,
+                Submission.topic,
+                Submission.grade_level,
+                Submission.difficulty
+            ).where(Submission.id == submission_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        if not row.problem:
+            raise IndexError(problem_index)
+
+        problem = SubmissionProblem(
+            submission_id=submission_id,
+            problem_index=problem_index,
+            text=expand_problem(row.raw_text, row.problem).get("text", ""),
+            problem_count=row.problem_count,
+            session_id=row.session_id,
+            student_id=row.student_id,
+            subject=row.subject,
+            topic=row.topic,
+            grade_level=row.grade_level,
+            difficulty=row.difficulty
+        )
+        self._entries[key] = problem
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return problem
+
+
+submission_problems = SubmissionProblemCache()
@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+import asyncio
+import importlib
+import logging
+import time
+import redis.asyncio as redis
+from fastapi import Request
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine, AsyncSessionLocal
+from app.services.artifacts import ArtifactService
+from app.services.embeddings import create_embedder
+from app.services.gemini_client import GeminiClient
+from app.services.health_monitor import HealthMonitor
+from app.services.idempotency import IdempotentRequests
+from app.services.llm_scheduler import start_schedulers, stop_schedulers
+from app.services.llm_service import LLMService
+from app.services.ocr import OCRService, ParsingOrchestrator
+from app.services.openai_client import OpenAIClient
+from app.services.prefetcher import GuidancePrefetcher
+from app.services.shared_store import SharedStore
+from app.services.similar_problems import SimilarProblemService
+from app.services.storage import StorageBackend, create_storage
+
+logger = logging.getLogger(__name__)
+
+# SDKs imported lazily on first use; warm-up imports them ahead of the first request
+_LAZY_MODULES = ("fitz", "openai", "google.generativeai")
+
+
+@dataclass
+class AppState:
+    """
+    Services and connection pools shared by every request in a worker process.
+    Built once in the app lifespan and closed on shutdown; state that must be
+    consistent across workers and replicas lives in Redis, not here.
+    """
+    redis: redis.Redis
+    store: SharedStore
+    storage: StorageBackend
+    openai_client: OpenAIClient
+    gemini_client: GeminiClient
+    llm_service: LLMService
+    parsing_orchestrator: ParsingOrchestrator
+    health: HealthMonitor
+    similar_problems: SimilarProblemService
+    artifacts: ArtifactService
+    prefetcher: GuidancePrefetcher
+    idempotency: IdempotentRequests
+
+    @classmethod
+    def create(cls) -> "AppState":
+        redis_client = redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+        openai_client = OpenAIClient()
+        gemini_client = GeminiClient()
+        # OCR shares the OpenAI client's connection pool
+        ocr_service = OCRService(openai_client)
+        store = SharedStore(redis_client, namespace="homework", ttl=settings.SHARED_STATE_TTL)
+        llm_service = LLMService(gemini_client, openai_client)
+        similar_problems = SimilarProblemService(create_embedder(openai_client), AsyncSessionLocal)
+        artifacts = ArtifactService(openai_client, llm_service, similar_problems, store, AsyncSessionLocal)
+        return cls(
+            redis=redis_client,
+            store=store,
+            storage=create_storage(),
+            openai_client=openai_client,
+            gemini_client=gemini_client,
+            llm_service=llm_service,
+            parsing_orchestrator=ParsingOrchestrator(ocr_service),
+            health=HealthMonitor(engine, redis_client, ocr_service),
+            similar_problems=similar_problems,
+            artifacts=artifacts,
+            prefetcher=GuidancePrefetcher(artifacts, AsyncSessionLocal),
+            idempotency=IdempotentRequests(SharedStore(redis_client, namespace="idempotency"))
+        )
+
+    async def start(self):
+        """Start background tasks (health probes, similarity index refresh, LLM scheduler sync)."""
+        self.health.start()
+        start_schedulers(self.redis)
+        await self.similar_problems.start()
+
+    async def warm_up(self) -> dict:
+        """
+        Open a database and a Redis connection and import the lazily loaded SDKs,
+        all in parallel, so the first requests don't pay for them.
+
+        Returns:
+            dict: milliseconds per step, or the error message of a failed step
+        """
+        async def database():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        async def sdks():
+            for module in _LAZY_MODULES:
+                await asyncio.to_thread(importlib.import_module, module)
+
+        async def timed(name: str, step):
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(step(), settings.STARTUP_WARMUP_TIMEOUT)
+            except Exception as e:
+                logger.warning("Warm-up of %s failed: %s", name, e, extra={"stage": "startup"})
+                return name, f"error: {e}"
+            return name, round((time.perf_counter() - start) * 1000, 1)
+
+        results = await asyncio.gather(
+            timed("database", database),
+            timed("redis", self.redis.ping),
+            timed("sdks", sdks)
+        )
+        return dict(results)
+
+    async def close(self):
+        """Close connection pools; in-flight requests have finished by the time lifespan exits."""
+        await self.health.stop()
+        await self.prefetcher.close()
+        await self.artifacts.close()
+        await self.similar_problems.stop()
+        await stop_schedulers()
+        await self.openai_client.close()
+        await self.redis.aclose()
+
+
+def get_state(request: Request) -> AppState:
+    """Dependency returning the application state built in lifespan."""
+    return request.app.state.services
+
+
+def get_storage(request: Request) -> StorageBackend:
+    return get_state(request).storage
+
+
+def get_openai_client(request: Request) -> OpenAIClient:
+    return get_state(request).openai_client
+
+
+def get_artifacts(request: Request) -> ArtifactService:
+    return get_state(request).artifacts
+
+
+def get_prefetcher(request: Request) -> GuidancePrefetcher:
+    return get_state(request).prefetcher
@@ -0,0 +1,38 @@
+"""
+Normalisation of extracted text, shared by OCR parsing and stored problems.
+
+Problems stored as offsets into raw_text record which cleaner produced their
+text ("text_span": "clean-v1") and are rebuilt with that same cleaner, so a
+released version must never change. To change cleaning, add a new version,
+point CLEAN_VERSION at it and keep the old one in CLEANERS.
+"""
+import re
+
+_JUNK_CHARS = re.compile(r'[^\w\s\+\-\*\/\=\(\)\[\]\.\,\?\!\:\;\"\'\^%<>×÷−²³√π°$]')
+_HORIZONTAL_WS = re.compile(r'[^\S\n]{2,}|[^\S \n]')
+_LINE_EDGE_WS = re.compile(r' \n ?|\n ')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def _clean_v1(text: str) -> str:
+    # Remove characters that might interfere (keeps math symbols and newlines)
+    text = _JUNK_CHARS.sub('', text)
+
+    # Collapse runs of spaces/tabs, trim each line, and squeeze blank lines
+    text = _HORIZONTAL_WS.sub(' ', text)
+    text = _LINE_EDGE_WS.sub('\n', text)
+    text = _BLANK_LINES.sub('\n\n', text)
+
+    return text.strip()
+
+
+CLEANERS = {
+    "clean-v1": _clean_v1,
+    "clean": _clean_v1,  # Problems stored before cleaners were versioned
+}
+CLEAN_VERSION = "clean-v1"  # The cleaner new text goes through
+
+
+def clean_text(text: str) -> str:
+    """Clean and normalize extracted text with the current cleaner, preserving line structure."""
+    return CLEANERS[CLEAN_VERSION](text)
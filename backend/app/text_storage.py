@@ -0,0 +1,144 @@
+"""
+Compact storage for submission text.
+
+raw_text is stored as a zstd frame (optionally compressed with a dictionary
+trained on homework text), and parsed problems whose text is just a cleaned
+slice of raw_text keep only their offsets. Both are decoded transparently by
+the Submission model.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+import zstandard as zstd
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.config import settings
+from app.text_cleaning import CLEAN_VERSION, CLEANERS, clean_text
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"  # Never the start of valid UTF-8 text, so plain rows are told apart
+
+# ----------------------------------------------------------------------
+# zstd with shared dictionaries
+# ----------------------------------------------------------------------
+
+_dictionaries: Optional[dict[int, zstd.ZstdCompressionDict]] = None
+_local = threading.local()
+
+
+def dictionaries() -> dict[int, zstd.ZstdCompressionDict]:
+    """Trained dictionaries in TEXT_DICTIONARY_DIR by id (<id>.zdict), loaded once per process."""
+    global _dictionaries
+    if _dictionaries is None:
+        loaded = {}
+        directory = Path(settings.TEXT_DICTIONARY_DIR)
+        for path in sorted(directory.glob("*.zdict")) if directory.is_dir() else []:
+            dictionary = zstd.ZstdCompressionDict(path.read_bytes())
+            loaded[dictionary.dict_id()] = dictionary
+        if settings.TEXT_DICTIONARY_ID and settings.TEXT_DICTIONARY_ID not in loaded:
+            logger.warning(
+                "Text dictionary %d not found in %s; compressing without one",
+                settings.TEXT_DICTIONARY_ID, directory, extra={"stage": "startup"}
+            )
+        _dictionaries = loaded
+    return _dictionaries
+
+
+def _compressor() -> zstd.ZstdCompressor:
+    # Compressor objects aren't thread-safe; the CLI and tests may use threads
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        dictionary = dictionaries().get(settings.TEXT_DICTIONARY_ID)
+        compressor = zstd.ZstdCompressor(level=settings.TEXT_COMPRESSION_LEVEL, dict_data=dictionary)
+        _local.compressor = compressor
+    return compressor
+
+
+def compress_text(text: str) -> bytes:
+    """UTF-8 bytes, zstd-compressed unless shorter than TEXT_COMPRESSION_MIN_BYTES."""
+    data = text.encode("utf-8")
+    if len(data) < settings.TEXT_COMPRESSION_MIN_BYTES:
+        return data
+    return _compressor().compress(data)
+
+
+def decompress_text(data: bytes) -> str:
+    if not data.startswith(ZSTD_MAGIC):
+        return data.decode("utf-8")
+    dict_id = zstd.get_frame_parameters(data).dict_id
+    dictionary = dictionaries().get(dict_id) if dict_id else None
+    if dict_id and dictionary is None:
+        raise ValueError(f"Text was compressed with dictionary {dict_id}, which is not in {settings.TEXT_DICTIONARY_DIR}")
+    return zstd.ZstdDecompressor(dict_data=dictionary).decompress(data).decode("utf-8")
+
+
+def is_compressed(data: Optional[bytes]) -> bool:
+    return data is not None and data.startswith(ZSTD_MAGIC)
+
+
+def train_dictionary(samples: list[str], dict_id: int, size: int = 112_640) -> bytes:
+    """
+    Train a dictionary on sample texts and return its bytes. Use
+    `python -m app.compact_submissions --train-dictionary <id>`, which writes
+    it to TEXT_DICTIONARY_DIR/<id>.zdict where dictionaries() finds it.
+    """
+    dictionary = zstd.train_dictionary(size, [sample.encode("utf-8") for sample in samples], dict_id=dict_id)
+    return dictionary.as_bytes()
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored as BYTEA: zstd frames, or plain UTF-8 for short and not yet migrated values."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(bytes(value)) if value is not None else None
+
+
+# ----------------------------------------------------------------------
+# Problems as offsets into raw_text
+# ----------------------------------------------------------------------
+
+def compact_problems(raw_text: Optional[str], problems: Optional[list]) -> list:
+    """
+    Drop each problem's "text" when it is longer than PROBLEM_TEXT_INLINE_CHARS
+    and can be rebuilt from its start/end offsets, marking how: "exact" for a
+    verbatim slice, the cleaner's version (CLEAN_VERSION) for a cleaned one.
+    Anything else keeps its text:
+    reading a short problem alone must not mean loading the whole raw_text.
+    """
+    if not raw_text or not problems:
+        return problems or []
+    compacted = []
+    for problem in problems:
+        start, end, text = problem.get("start"), problem.get("end"), problem.get("text")
+        if (
+            text is not None and len(text) > settings.PROBLEM_TEXT_INLINE_CHARS
+            and isinstance(start, int) and isinstance(end, int) and 0 <= start <= end <= len(raw_text)
+        ):
+            span = raw_text[start:end]
+            mode = "exact" if text == span else CLEAN_VERSION if text == clean_text(span) else None
+            if mode:
+                problem = {key: value for key, value in problem.items() if key != "text"}
+                problem["text_span"] = mode
+        compacted.append(problem)
+    return compacted
+
+
+def expand_problem(raw_text: Optional[str], problem: dict) -> dict:
+    """A stored problem with its text restored."""
+    mode = problem.get("text_span")
+    if mode is None:
+        return problem
+    span = (raw_text or "")[problem["start"]:problem["end"]]
+    text = span if mode == "exact" else CLEANERS[mode](span)
+    return {"text": text, **{key: value for key, value in problem.items() if key != "text_span"}}
+
+
+def expand_problems(raw_text: Optional[str], problems: Optional[list]) -> list:
+    return [expand_problem(raw_text, problem) for problem in problems or []]
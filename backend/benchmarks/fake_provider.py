@@ -0,0 +1,261 @@
+"""
+Local fake OpenAI / Gemini HTTP server for benchmarks.
+
+Serves OpenAI-compatible /v1/chat/completions (JSON and SSE streaming) and the
+Gemini REST generateContent route, returning canned payloads shaped like what
+the app's prompts ask for. Latency is drawn from a log-normal distribution and
+a configurable fraction of requests fail with 429/500.
+
+Usage (from backend/):
+    python -m benchmarks.fake_provider --port 9100 --latency-ms 800 --sigma 0.4 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeProviderConfig:
+    """Latency and failure behaviour of the fake provider."""
+    latency_ms: float = 800.0  # Median latency of a completion
+    sigma: float = 0.4  # Log-normal shape; 0 gives a constant latency
+    vision_latency_ms: float = 2500.0  # Median latency when the request carries images
+    error_rate: float = 0.0  # Fraction of requests answered with an error
+    rate_limit_share: float = 0.5  # Share of errors that are 429 rather than 500
+    stream_chunks: int = 8
+    seed: int = 0
+
+
+WORKSHEET_TEXT = "1. Solve 2x + 5 = 13\n2. Explain why the moon has phases.\n3. Convert 5 km to m"
+
+
+def _sample_latency(config: FakeProviderConfig, rng: random.Random, median_ms: float) -> float:
+    if config.sigma <= 0:
+        return median_ms / 1000
+    return rng.lognormvariate(math.log(median_ms), config.sigma) / 1000
+
+
+def _prompt_text(messages: list) -> tuple[str, int]:
+    """Return the concatenated text of the messages and the number of images."""
+    texts, images = [], 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images += 1
+    return "\n".join(texts), images
+
+
+def fake_completion(prompt: str, images: int) -> str:
+    """Build a plausible completion for one of the app's prompts."""
+    if images:
+        if "=== IMAGE" in prompt:
+            return "\n".join(f"=== IMAGE {idx} ===\n{WORKSHEET_TEXT}" for idx in range(1, images + 1))
+        return WORKSHEET_TEXT
+    if "classify" in prompt:
+        return json.dumps({
+            "subject": "science", "topic": "astronomy-moon-phases", "grade_level": 6,
+            "difficulty": "basic", "prerequisites": ["earth and sun"], "detected_gaps": []
+        })
+    if "student_response" in prompt:
+        return json.dumps({
+            "student_response": "The moon doesn't make its own light. " * 20,
+            "parent_context": {
+                "deeper_terms": ["lunar phase", "synodic month"],
+                "teaching_tips": "Use a lamp and a ball to model it. " * 5,
+                "explanation": "Phases come from the changing angle between Sun, Earth and Moon. " * 10
+            }
+        })
+    if "Generate guidance" in prompt:
+        return json.dumps({
+            "micro_explanation": "Think about where the light comes from.",
+            "step_breakdown": [{"order": i, "text": f"Step {i}", "hint": None} for i in range(1, 5)],
+            "error_warnings": ["Don't confuse phases with eclipses"],
+            "interactive_checks": [{"text": "Where is the Sun?", "expected_answer": None, "explanation": "Good"}],
+            "reveal_sequence": [{"level": i, "content": f"Hint {i}", "reveal_type": "hint"} for i in range(1, 5)]
+        })
+    match = re.search(r"Generate (\d+) practice problems", prompt)
+    if match:
+        count = int(match.group(1))
+        return json.dumps({"problems": [
+            {"text": f"Practice problem {i}", "difficulty": "basic",
+             "variation_type": "same_structure", "solution": "Worked solution", "answer": "42"}
+            for i in range(1, count + 1)
+        ]})
+    if "Evaluate this student's answer" in prompt:
+        return json.dumps({"is_correct": False, "feedback": "Close! Check your signs.", "next_hint": "Look at step 2."})
+    return json.dumps({"ok": True})
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI(title="Fake LLM provider")
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "errors": 0}
+
+    def maybe_error():
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            status = 429 if rng.random() < config.rate_limit_share else 500
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "fake provider error", "type": "rate_limit" if status == 429 else "server_error"}},
+                headers={"retry-after": "1"} if status == 429 else None
+            )
+        return None
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+        prompt, images = _prompt_text(body.get("messages", []))
+        error = maybe_error()
+        if error is not None:
+            await asyncio.sleep(_sample_latency(config, rng, config.latency_ms) / 4)
+            return error
+
+        median_ms = config.vision_latency_ms if images else config.latency_ms
+        latency = _sample_latency(config, rng, median_ms)
+        content = fake_completion(prompt, images)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "gpt-4o")
+        usage = {
+            "prompt_tokens": len(prompt) // 4 + images * 765,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": len(prompt) // 4 + images * 765 + len(content) // 4
+        }
+
+        if body.get("stream"):
+            async def events():
+                chunks = max(1, config.stream_chunks)
+                step = math.ceil(len(content) / chunks)
+                for idx in range(chunks):
+                    await asyncio.sleep(latency / chunks)
+                    delta = {"content": content[idx * step:(idx + 1) * step]}
+                    if idx == 0:
+                        delta["role"] = "assistant"
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": None,
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini_generate(model_action: str, request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+        prompt = "\n".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        error = maybe_error()
+        if error is not None:
+            return error
+        await asyncio.sleep(_sample_latency(config, rng, config.latency_ms))
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": fake_completion(prompt, 0)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }]
+        }
+
+    return app
+
+
+class FakeProviderServer:
+    """Runs the fake provider with uvicorn on a background thread (its own event loop)."""
+
+    def __init__(self, config: FakeProviderConfig, host: str = "127.0.0.1", port: int = 9100):
+        import uvicorn
+
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="fake-provider", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake provider failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def add_provider_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median completion latency")
+    parser.add_argument("--vision-latency-ms", type=float, default=2500.0, help="median Vision latency")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal latency shape")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+
+
+def config_from_args(args) -> FakeProviderConfig:
+    return FakeProviderConfig(
+        latency_ms=args.latency_ms,
+        sigma=args.sigma,
+        vision_latency_ms=args.vision_latency_ms,
+        error_rate=args.error_rate,
+        stream_chunks=args.stream_chunks
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Gemini provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_provider_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
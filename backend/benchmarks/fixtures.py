@@ -0,0 +1,53 @@
+"""Synthetic upload fixtures (images, native and scanned PDFs) built with PyMuPDF."""
+import fitz  # PyMuPDF
+
+WORKSHEET_LINES = [
+    "Worksheet 4 - Mixed Review",
+    "",
+    "1. Solve 2x + 5 = 13",
+    "2. Explain why the moon has phases.",
+    "   a) Draw the Sun, Earth and Moon.",
+    "   b) Label the new moon.",
+    "3. Convert 5 km to m",
+    "4. What is 3/4 + 1/8?",
+]
+
+
+def _worksheet_page(doc, lines=WORKSHEET_LINES):
+    page = doc.new_page(width=612, height=792)
+    y = 72
+    for line in lines:
+        page.insert_text((72, y), line, fontsize=14)
+        y += 40 if not line.startswith("   ") else 28
+    return page
+
+
+def native_pdf(pages: int = 3) -> bytes:
+    """A PDF with a real text layer."""
+    doc = fitz.open()
+    for _ in range(pages):
+        _worksheet_page(doc)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def worksheet_png(zoom: float = 2.0) -> bytes:
+    """A worksheet photo stand-in: one page rendered to PNG."""
+    doc = fitz.open()
+    page = _worksheet_page(doc)
+    data = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+    doc.close()
+    return data
+
+
+def scanned_pdf(pages: int = 2) -> bytes:
+    """A PDF whose pages are images only (no text layer), like a scanner produces."""
+    image = worksheet_png()
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=image)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,109 @@
+"""
+Import-time profile of the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+summarises the output: total import time, the slowest top-level packages and
+the slowest individual modules. Lazily loaded SDKs (PyMuPDF, openai,
+google.generativeai) should not appear here.
+
+Usage (from backend/):
+    python -m benchmarks.importtime [--top 15] [--budget-ms 800] [--baseline PATH] [--save-baseline PATH]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks import report
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Settings that must be present for app.config to load; no connection is made at import
+_DUMMY_ENV = {
+    "OPENAI_API_KEY": "importtime",
+    "DATABASE_URL": "postgresql://importtime@localhost/importtime",
+    "REDIS_URL": "redis://localhost:6379",
+}
+
+
+def profile(module: str = "app.main") -> list[tuple[str, int, int, int]]:
+    """
+    Returns:
+        list: (module, self_us, cumulative_us, depth) per imported module, in import order
+    """
+    env = {**_DUMMY_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def summarise(rows: list, top: int) -> dict:
+    """Aggregate self time per top-level package and pick the slowest modules."""
+    packages: dict = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    total_us = sum(self_us for _, self_us, _, _ in rows)
+    slowest_packages = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    slowest_modules = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "total": {"import": {"total_ms": total_us / 1000, "modules": len(rows)}},
+        "packages": {name: {"self_ms": us / 1000} for name, us in slowest_packages},
+        "modules": {name: {"self_ms": self_us / 1000, "cumulative_ms": cum_us / 1000}
+                    for name, self_us, cum_us, _ in slowest_modules},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of app.main")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="keep the fastest of N runs to reduce noise")
+    parser.add_argument("--budget-ms", type=float, help="exit 1 if total import time exceeds this")
+    parser.add_argument("--baseline", help="compare against a saved report")
+    parser.add_argument("--save-baseline", help="write this run's report as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(max(1, args.runs))]
+    rows = min(runs, key=lambda run: sum(self_us for _, self_us, _, _ in run))
+    results = summarise(rows, args.top)
+
+    for section, entries in results.items():
+        report.print_table(section, entries)
+
+    lazy = sorted({name.split(".")[0] for name, *_ in rows} & {"fitz", "openai", "google", "boto3"})
+    if lazy:
+        print(f"\nWARNING: lazily loaded SDKs imported at startup: {', '.join(lazy)}")
+
+    if args.save_baseline:
+        report.save(results, args.save_baseline)
+
+    failed = False
+    total_ms = results["total"]["import"]["total_ms"]
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"\nImport time {total_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
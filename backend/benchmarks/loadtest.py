@@ -0,0 +1,189 @@
+"""
+Load test for the API hot paths against a local fake LLM/Vision provider.
+
+Drives /upload (image, native PDF, scanned PDF), /text, /guidance and /practice
+at a fixed concurrency through the ASGI app in-process, so event-loop lag and
+memory are measured on the same process that serves requests. Needs the
+database from docker-compose (DATABASE_URL); no provider keys are used.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --concurrency 20 --requests 200
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import resource
+import sys
+import time
+
+from benchmarks import fixtures, report
+from benchmarks.fake_provider import FakeProviderServer, add_provider_arguments, config_from_args
+
+# Problems the local engine cannot solve, so /guidance and /practice reach the (fake) LLM
+LLM_PROBLEMS = [
+    "Explain why the moon has phases.",
+    "What is the main idea of the second paragraph?",
+    "Describe how a plant cell differs from an animal cell.",
+    "Write a topic sentence about recycling.",
+]
+LOCAL_PROBLEMS = ["Solve 2x + 5 = 13", "3/4 + 1/8", "Convert 5 km to m"]
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag as the overshoot of a short sleep."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def take(self) -> list:
+        samples, self.samples = self.samples, []
+        return samples
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_scenario(make_request, concurrency: int, total: int, monitor: LoopLagMonitor) -> dict:
+    """Issue `total` requests from `concurrency` workers and summarize latencies."""
+    latencies, errors = [], 0
+    counter = itertools.count()
+    monitor.take()
+
+    async def worker():
+        nonlocal errors
+        while next(counter) < total:
+            start = time.perf_counter()
+            try:
+                response = await make_request()
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    lag = monitor.take()
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": report.percentile(latencies, 50),
+        "p95_ms": report.percentile(latencies, 95),
+        "p99_ms": report.percentile(latencies, 99),
+        "loop_lag_p99_ms": report.percentile(lag, 99),
+        "loop_lag_max_ms": max(lag, default=0.0),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    from app.main import app
+
+    image = fixtures.worksheet_png()
+    native = fixtures.native_pdf()
+    scanned = fixtures.scanned_pdf()
+    headers = {"X-Provider": args.guidance_provider}
+
+    monitor = LoopLagMonitor()
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            monitor.start()
+
+            # Seed submissions for /guidance and /practice
+            seeded = []
+            for text in itertools.islice(itertools.cycle(LLM_PROBLEMS + LOCAL_PROBLEMS), 20):
+                response = await client.post("/api/submissions/text", json={"text": text})
+                response.raise_for_status()
+                seeded.append(response.json()["id"])
+            ids = itertools.cycle(seeded)
+
+            scenarios = {
+                "upload_image": lambda: client.post(
+                    "/api/submissions/upload", files={"file": ("sheet.png", image, "image/png")}),
+                "upload_pdf_native": lambda: client.post(
+                    "/api/submissions/upload", files={"file": ("sheet.pdf", native, "application/pdf")}),
+                "upload_pdf_scanned": lambda: client.post(
+                    "/api/submissions/upload", files={"file": ("scan.pdf", scanned, "application/pdf")}),
+                "text": lambda: client.post(
+                    "/api/submissions/text", json={"text": LLM_PROBLEMS[0]}),
+                "guidance": lambda: client.get(
+                    f"/api/submissions/{next(ids)}/guidance", headers=headers),
+                "practice": lambda: client.get(
+                    f"/api/submissions/{next(ids)}/practice", params={"count": 3}),
+            }
+            selected = args.scenarios or list(scenarios)
+            for name in selected:
+                total = args.requests if not name.startswith("upload") else max(1, args.requests // 4)
+                results[name] = await run_scenario(scenarios[name], args.concurrency, total, monitor)
+                print(f"  {name}: done")
+
+            await monitor.stop()
+
+    memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"scenarios": results, "process": {"loadtest": {"memory_hwm_mb": memory_mb}}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test against a fake LLM provider")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario (uploads use a quarter)")
+    parser.add_argument("--scenarios", nargs="*", help="subset of scenarios to run")
+    parser.add_argument("--guidance-provider", default="openai", choices=["openai", "gemini"])
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--baseline", help="fail if results regress against this report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="write results to this path")
+    add_provider_arguments(parser)
+    args = parser.parse_args()
+
+    with FakeProviderServer(config_from_args(args), port=args.fake_port) as fake:
+        # Settings are read at import time, so point the app at the fake before importing it
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["GEMINI_API_ENDPOINT"] = fake.url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+        os.environ.setdefault("ENVIRONMENT", "benchmark")
+        results = asyncio.run(run(args))
+
+    for section, entries in results.items():
+        report.print_table(section, entries)
+
+    if args.save_baseline:
+        report.save(results, args.save_baseline)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
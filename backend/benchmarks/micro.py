@@ -0,0 +1,128 @@
+"""
+Micro-benchmarks for CPU-bound hot paths: text cleaning, problem segmentation
+(including 100-page PDF-sized text), local problem recognition, answer
+checking and response serialization.
+
+Usage (from backend/):
+    python -m benchmarks.micro [--baseline benchmarks/micro_baseline.json] [--save-baseline PATH]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmarks import report
+
+
+def build_worksheet_text(pages: int, seed: int = 42) -> str:
+    """Build text shaped like native PDF extraction of a multi-page worksheet set."""
+    rng = random.Random(seed)
+    out = []
+    number = 1
+    for page in range(pages):
+        out.append(f"Unit {page // 10 + 1}   Practice Set   Page {page + 1}\n\nSolve each problem. Show your work.\n\n")
+        for _ in range(rng.randint(6, 12)):
+            a, b, c = rng.randint(2, 9), rng.randint(1, 20), rng.randint(10, 99)
+            style = rng.choice(["{n}.", "{n})", "Q{n}:", "Question {n}:"])
+            out.append(f"{style.format(n=number)}  {a}x + {b} = {c}\n")
+            if rng.random() < 0.4:
+                for letter in "abc"[:rng.randint(2, 3)]:
+                    out.append(f"   {letter}) Explain step {letter} in   your own words.\n")
+            if rng.random() < 0.2:
+                for roman in ("i", "ii", "iii"):
+                    out.append(f"   ({roman}) A train travels {rng.randint(10, 90)}.5 km in {rng.randint(2, 9)} min.\n")
+            out.append("\n")
+            number += 1
+        out.append("\f\n")
+    return "".join(out)
+
+
+def measure(fn, rounds: int, inner: int = 1) -> dict:
+    """Time `fn` for `rounds` rounds of `inner` calls; report per-call microseconds."""
+    fn()  # warm-up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - start) / inner * 1e6)
+    return {
+        "mean_us": sum(samples) / len(samples),
+        "p95_us": report.percentile(samples, 95),
+    }
+
+
+def build_cases() -> dict:
+    from app.schemas import SubmissionResponse
+    from app.services.ocr import OCRService
+    from app.services.problem_engine import local_problem_engine
+    from app.services.answer_checker import answer_checker
+    from app.services.embeddings import HashingEmbedder
+    from app.services.similarity_index import SimilarityIndex
+
+    page = build_worksheet_text(1)
+    textbook = build_worksheet_text(100)
+    problems = OCRService.detect_problems(textbook)[:40]
+    row = SimpleNamespace(
+        id=uuid.uuid4(), subject="math", topic="algebra-linear-equations", grade_level=7,
+        difficulty="intermediate", parsed_problems=problems, created_at=datetime.now(timezone.utc)
+    )
+
+    embedder = HashingEmbedder()
+    index = SimilarityIndex(embedder.dim)
+    for seq, problem in enumerate(OCRService.detect_problems(textbook)):
+        index.add(seq, uuid.uuid4(), 0, embedder.embed_sync(problem["text"]))
+    query = embedder.embed_sync(problems[0]["text"])
+
+    return {
+        "clean_text_page": (lambda: OCRService.clean_text(page), 2000, 1),
+        "clean_text_100_pages": (lambda: OCRService.clean_text(textbook), 20, 1),
+        "segment_problems_100_pages": (lambda: OCRService.segment_problems(textbook), 20, 1),
+        "detect_problems_page": (lambda: OCRService.detect_problems(page), 2000, 1),
+        "detect_problems_100_pages": (lambda: OCRService.detect_problems(textbook), 20, 1),
+        "local_recognize_linear": (lambda: local_problem_engine.recognize("Solve 3(x - 2) = 2x + 7"), 2000, 10),
+        "local_recognize_miss": (lambda: local_problem_engine.recognize("Explain why the moon has phases."), 2000, 10),
+        "answer_check_fraction": (lambda: answer_checker.check("3/4", "0.75"), 2000, 10),
+        "answer_check_roots": (lambda: answer_checker.check("x = 2 or x = -3", "-3, 2"), 2000, 10),
+        "serialize_submission": (lambda: SubmissionResponse.model_validate(row).model_dump_json(), 500, 1),
+        "json_dumps_problems": (lambda: json.dumps(problems), 500, 1),
+        "hashing_embed_problem": (lambda: embedder.embed_sync(problems[0]["text"]), 2000, 10),
+        "similarity_search_textbook": (lambda: index.search(query), 500, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for CPU-bound hot paths")
+    parser.add_argument("--only", nargs="*", help="subset of benchmarks to run")
+    parser.add_argument("--baseline", help="fail if results regress against this report")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", help="write results to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (fn, rounds, inner) in build_cases().items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, rounds, inner)
+
+    output = {"micro": results}
+    report.print_table("micro", results)
+
+    if args.save_baseline:
+        report.save(output, args.save_baseline)
+    if args.baseline:
+        regressions = report.compare(output, report.load(args.baseline), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark report helpers: percentiles, baseline storage and regression checks."""
+import json
+import math
+from pathlib import Path
+
+# Metrics where a larger value is a regression, and where a smaller one is
+HIGHER_IS_WORSE = (
+    "p50_ms", "p95_ms", "p99_ms", "error_rate", "loop_lag_p99_ms", "mean_us", "memory_hwm_mb",
+    "total_ms", "self_ms", "cumulative_ms"
+)
+LOWER_IS_WORSE = ("throughput_rps",)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def save(report: dict, path: str):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare a report against a baseline with the same shape ({section: {name: {metric: value}}}).
+
+    Returns:
+        list: human-readable regressions; empty when within tolerance
+    """
+    regressions = []
+    for section, entries in baseline.items():
+        if not isinstance(entries, dict):
+            continue
+        for name, metrics in entries.items():
+            now = current.get(section, {}).get(name)
+            if not isinstance(metrics, dict) or now is None:
+                continue
+            for metric, base in metrics.items():
+                value = now.get(metric)
+                if value is None or not base:
+                    continue
+                if metric in HIGHER_IS_WORSE and value > base * (1 + tolerance):
+                    regressions.append(f"{section}.{name}.{metric}: {value:.3f} > baseline {base:.3f} (+{tolerance:.0%})")
+                elif metric in LOWER_IS_WORSE and value < base * (1 - tolerance):
+                    regressions.append(f"{section}.{name}.{metric}: {value:.3f} < baseline {base:.3f} (-{tolerance:.0%})")
+    return regressions
+
+
+def print_table(section: str, entries: dict):
+    print(f"\n[{section}]")
+    for name, metrics in entries.items():
+        row = "  ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" for key, value in metrics.items())
+        print(f"  {name:<26} {row}")
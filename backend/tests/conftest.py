@@ -0,0 +1,6 @@
+import os
+
+# Settings require these; unit tests never connect to them
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://test@localhost/test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
@@ -0,0 +1,78 @@
+import pytest
+
+from app.services.answer_checker import answer_checker
+
+# (expected, student, is_correct); None means the answer must go to the LLM
+CASES = [
+    # Numbers, fractions and decimals
+    ("4", "4", True),
+    ("4", "5", False),
+    ("0.5", "1/2", True),
+    ("3/4", "0.75", True),
+    ("1/3", "0.33", True),
+    ("1/3", "0.3", False),
+    ("1.414", "1.4142", True),
+    ("-3", "3", False),
+    # Thousands separators
+    ("1000", "1,000", True),
+    ("1,000", "1000", True),
+    ("12,345,678", "12345678", True),
+    ("1,200", "1.2", False),
+    # Mixed numbers
+    ("1 1/2", "1.5", True),
+    ("1 1/2", "3/2", True),
+    ("-1 1/2", "-1.5", True),
+    ("2 1/2", "2.50", True),
+    ("1 1/2", "1/2", False),
+    # Assignments and sets of roots
+    ("2", "x = 2", True),
+    ("2, 3", "3,2", True),
+    ("x=2 or x=-2", "-2, 2", True),
+    ("-2, 2", "2", False),
+    ("-2, 2", "2, 5", False),
+    ("2", "2, 2", True),
+    ("2, 2", "2", True),
+    ("2, 2", "2, 3", False),
+    ("no solution", "none", True),
+    ("no real solutions", "2", False),
+    # Expressions in one variable
+    ("2(x+3)", "2x+6", True),
+    ("2(x+3)", "2x+3", False),
+    ("x^2", "x*x", True),
+    # Units
+    ("2.5 km", "2500 m", True),
+    ("1,000 m", "1 km", True),
+    ("5 m", "5 kg", False),
+    ("3/4", "0.75 m", True),
+    # Not plain math
+    ("3", "three", None),
+    ("Paris", "paris", None),
+    ("", "4", None),
+]
+
+
+@pytest.mark.parametrize("expected, student, is_correct", CASES)
+def test_check(expected, student, is_correct):
+    result = answer_checker.check(expected, student)
+    if is_correct is None:
+        assert result is None
+    else:
+        assert result is not None and result.is_correct == is_correct
+
+
+@pytest.mark.parametrize("expected, student, hint", [
+    ("5", "-5", "Check the sign of your answer."),
+    ("2/3", "3/2", "Your answer looks flipped — check which number goes on top."),
+    ("2.5", "25", "Check the decimal point — your answer is off by a factor of 10."),
+])
+def test_hints(expected, student, hint):
+    assert answer_checker.check(expected, student).next_hint == hint
+
+
+def test_empty_answer_is_wrong():
+    result = answer_checker.check("4", "  ")
+    assert not result.is_correct and result.feedback == "Enter an answer to check."
+
+
+def test_partial_root_set_feedback():
+    assert answer_checker.check("-2, 2", "2").feedback.startswith("You found 1 of the 2 solutions")
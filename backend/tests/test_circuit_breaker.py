@@ -0,0 +1,47 @@
+import pytest
+
+from app.config import settings
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitOpenError, byok_breaker_states, get_breaker, get_byok_breaker
+from app.services.openai_client import OpenAIClient
+
+
+class InternalServerError(Exception):
+    """Stands in for the SDK's 5xx error (matched by name)."""
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_byok_breakers", type(circuit_breaker._byok_breakers)())
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        with pytest.raises(InternalServerError):
+            with breaker.guard():
+                raise InternalServerError()
+
+
+def test_byok_breaker_survives_across_clients():
+    fail(OpenAIClient(api_key="sk-user").breaker, settings.CIRCUIT_FAILURE_THRESHOLD)
+    with pytest.raises(CircuitOpenError):
+        OpenAIClient(api_key="sk-user").breaker.check()
+    # Neither another user's key nor our own key is affected
+    OpenAIClient(api_key="sk-other").breaker.check()
+    assert OpenAIClient().breaker is get_breaker("openai")
+    assert byok_breaker_states() == {"openai": {"keys": 2, "open": 1}}
+
+
+def test_breaker_name_does_not_contain_the_key():
+    assert "sk-secret" not in get_byok_breaker("openai", "sk-secret").name
+
+
+def test_least_recently_used_keys_are_evicted(monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BYOK_MAX_KEYS", 2)
+    first = get_byok_breaker("openai", "a")
+    get_byok_breaker("openai", "b")
+    assert get_byok_breaker("openai", "a") is first
+    get_byok_breaker("openai", "c")
+    assert get_byok_breaker("openai", "a") is first
+    assert len(circuit_breaker._byok_breakers) == 2
+    assert get_byok_breaker("gemini", "a") is not first
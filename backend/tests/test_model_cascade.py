@@ -0,0 +1,68 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.model_router import model_router
+from app.services.openai_client import OpenAIClient
+
+
+class RateLimitError(Exception):
+    """Stands in for openai.RateLimitError (matched by name)."""
+
+
+def completion(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def run_cascade(outcomes, route="classification"):
+    """Run _complete_json where each model call returns or raises the next outcome."""
+    client = OpenAIClient(api_key="test")
+    calls = []
+
+    async def create_completion(model, **kwargs):
+        calls.append(model)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return completion(outcome)
+
+    client.create_completion = create_completion
+    model_router.routes.clear()
+    result = asyncio.run(client._complete_json(route, [{"role": "user", "content": "x"}], 0.3, validate=lambda r: r.get("ok")))
+    return result[0], calls
+
+
+@pytest.mark.parametrize("first", [
+    json.dumps({"ok": False}),
+    "not json",
+    RateLimitError("429"),
+    asyncio.TimeoutError(),
+    CircuitOpenError("openai circuit open"),
+])
+def test_cascade_moves_to_the_next_model(first):
+    result, calls = run_cascade([first, json.dumps({"ok": True})])
+    assert result == {"ok": True}
+    assert calls == [settings.MODEL_SMALL, settings.MODEL_LARGE]
+    stats = model_router.routes["classification"]
+    assert (stats.requests, stats.escalations) == (1, 1)
+    assert stats.models[settings.MODEL_SMALL].invalid == 1
+
+
+def test_valid_first_answer_does_not_escalate():
+    result, calls = run_cascade([json.dumps({"ok": True})])
+    assert result == {"ok": True}
+    assert calls == [settings.MODEL_SMALL]
+
+
+def test_client_errors_are_not_retried_on_a_larger_model():
+    with pytest.raises(ValueError):
+        run_cascade([ValueError("bad request"), json.dumps({"ok": True})])
+
+
+def test_last_model_failure_propagates():
+    with pytest.raises(RateLimitError):
+        run_cascade([RateLimitError("429"), RateLimitError("429")])
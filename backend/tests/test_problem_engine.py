@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.problem_engine import local_problem_engine
+
+# (problem, kind, answer); kind None means it must go to the LLM
+CASES = [
+    # Arithmetic and fractions
+    ("2 + 3 * 4", "arithmetic", "14"),
+    ("(2 + 3) * 4", "arithmetic", "20"),
+    ("12 − 4 × 2", "arithmetic", "4"),
+    ("2^3 + 1", "arithmetic", "9"),
+    ("0.5 + 0.25", "arithmetic", "0.75"),
+    ("What is 7 × 8?", "arithmetic", "56"),
+    ("1/2 + 1/3", "fractions", "5/6"),
+    ("3/4 ÷ 1/8", "fractions", "6"),
+    ("1 1/2 + 2 1/4", "fractions", "15/4"),
+    ("3 × 1 1/2", "fractions", "9/2"),
+    # Linear equations
+    ("Solve 2x + 3 = 7", "linear_equation", "x = 2"),
+    ("Find x: 3x - 5 = 10", "linear_equation", "x = 5"),
+    ("Solve for y: 4y = 2", "linear_equation", "y = 1/2"),
+    ("x/2 + 1 = 4", "linear_equation", "x = 6"),
+    ("2(x + 3) = 14", "linear_equation", "x = 4"),
+    # Quadratic equations
+    ("x^2 - 5x + 6 = 0", "quadratic_equation", "x = 2 or x = 3"),
+    ("x^2 - 19x + 90 = 0", "quadratic_equation", "x = 9 or x = 10"),
+    ("x^2 - 4x + 4 = 0", "quadratic_equation", "x = 2"),
+    ("2x^2 = 8", "quadratic_equation", "x = -2 or x = 2"),
+    ("x^2 = 2", "quadratic_equation", "x = -1.414 or x = 1.414"),
+    ("x^2 + 1 = 0", "quadratic_equation", "no real solutions"),
+    # Unit conversion
+    ("Convert 5 km to m", "unit_conversion", "5000 m"),
+    ("Convert 2.5 kg to g", "unit_conversion", "2500 g"),
+    ("Convert 1,500 m to km", "unit_conversion", "1.5 km"),
+    ("How many inches are in 3 feet?", "unit_conversion", "36 in"),
+    ("How many grams are in 2,000 kg?", "unit_conversion", "2000000 g"),
+    ("12 in = ? ft", "unit_conversion", "1 ft"),
+    ("3 hours in minutes", "unit_conversion", "180 min"),
+    ("1 mile to km", "unit_conversion", "1.6093 km"),
+    ("1000000 mm to km", "unit_conversion", "1 km"),
+    # Left to the LLM
+    ("5 kg to m", None, None),
+    ("5 m to m", None, None),
+    ("x + 1 = x + 2", None, None),
+    ("x^3 = 8", None, None),
+    ("2x + 3y = 5", None, None),
+    ("1/0 + 2", None, None),
+    ("2 3 + 1", None, None),
+    ("What is 15% of 80?", None, None),
+    ("Explain photosynthesis", None, None),
+]
+
+
+@pytest.mark.parametrize("problem, kind, answer", CASES)
+def test_recognize(problem, kind, answer):
+    solution = local_problem_engine.recognize(problem)
+    if kind is None:
+        assert solution is None
+    else:
+        assert (solution.kind, solution.answer) == (kind, answer)
+
+
+def test_inexact_conversion_is_marked_rounded():
+    assert local_problem_engine.recognize("1 mile to km").steps[-1].endswith("(rounded)")
+    assert not local_problem_engine.recognize("Convert 5 km to m").steps[-1].endswith("(rounded)")
+
+
+@pytest.mark.parametrize("problem", [problem for problem, kind, _ in CASES if kind])
+def test_practice_problems_are_locally_solvable(problem):
+    solution = local_problem_engine.recognize(problem)
+    for practice in local_problem_engine.generate_practice_problems(solution):
+        assert practice["answer"]
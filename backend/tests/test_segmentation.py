@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.ocr import OCRService
+
+
+def outline(text):
+    """(label, [part labels]) for each detected problem."""
+    return [(problem["label"], [part["label"] for part in problem["parts"]]) for problem in OCRService.detect_problems(text)]
+
+
+LETTERS = "abcdefghij"
+
+CASES = [
+    ("numbered", "1. Solve x + 1 = 2\n2. Solve x + 2 = 3", [("1.", []), ("2.", [])]),
+    ("paren numbers", "(1) 3 + 4\n(2) 5 + 6", [("(1)", []), ("(2)", [])]),
+    ("question labels", "Q1: 2 + 2\nQuestion 2 3 + 3\nProblem 3. 4 + 4", [("Q1:", []), ("Question 2", []), ("Problem 3.", [])]),
+    ("numbered with parts", "1. Solve\n  a) x + 1 = 2\n  b) x + 2 = 4\n2. Simplify 2(x + 1)", [("1.", ["a)", "b)"]), ("2.", [])]),
+    ("parts restart per problem", "Q1: Find\n(a) p\n(b) q\nQ2: Find\n(a) r", [("Q1:", ["(a)", "(b)"]), ("Q2:", ["(a)"])]),
+    ("roman problems", "i. x\nii. y\niii. z\niv. w", [("i.", []), ("ii.", []), ("iii.", []), ("iv.", [])]),
+    ("lower letters through i and j", "\n".join(f"{c}) q" for c in LETTERS), [(f"{c})", []) for c in LETTERS]),
+    ("upper letters through I and J", "\n".join(f"{c}. q" for c in LETTERS.upper()), [(f"{c}.", []) for c in LETTERS.upper()]),
+    ("letters u to x", "u) a\nv) b\nw) c\nx) d", [("u)", []), ("v)", []), ("w)", []), ("x)", [])]),
+    ("letter parts reach i", "1. x\n" + "\n".join(f"{c}) q" for c in LETTERS[:9]) + "\n2. y", [("1.", [f"{c})" for c in LETTERS[:9]]), ("2.", [])]),
+    ("roman outline with letter parts", "I. Algebra\nA. q1\nB. q2\nII. Geometry\nA. q3", [("I.", ["A.", "B."]), ("II.", ["A."])]),
+    ("letter problems with roman parts", "A. Solve\nI. x + 1 = 2\nII. x + 2 = 3\nB. Next", [("A.", ["I.", "II."]), ("B.", [])]),
+    ("stem with options", "Find the area.\nA. 12\nB. 15\nC. 18\nD. 21", [(None, ["A.", "B.", "C.", "D."])]),
+    ("stem with options through I", "Pick one.\n" + "\n".join(f"{c}. {n}" for n, c in enumerate("ABCDEFGHI")), [(None, [f"{c}." for c in "ABCDEFGHI"])]),
+    ("roman after a stem's option", "Choose one:\nA. x\nI. z", [(None, ["A.", "I."])]),
+    ("stem options then numbered", "Which is prime?\nA. 4\nB. 7\n2. Solve 2x = 4", [(None, ["A.", "B."]), ("2.", [])]),
+    ("no markers", "Just solve 3x = 9 please.", [(None, [])]),
+    ("decimals are not markers", "1.5 + 2.5 = ?", [(None, [])]),
+]
+
+
+@pytest.mark.parametrize("text, expected", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_segmentation(text, expected):
+    assert outline(text) == expected
+
+
+@pytest.mark.parametrize("text", [case[1] for case in CASES], ids=[case[0] for case in CASES])
+def test_offsets_cover_the_problem_text(text):
+    for problem in OCRService.detect_problems(text):
+        span = text[problem["start"]:problem["end"]]
+        assert span == span.strip()
+        assert OCRService.clean_text(span) == problem["text"]
+        for part in problem["parts"]:
+            assert problem["start"] <= part["start"] <= part["end"] <= problem["end"]
+
+
+def test_instructions_before_numbered_problems_join_the_first():
+    problems = OCRService.detect_problems("Show your work.\n1. 2 + 2\n2. 3 + 3")
+    assert [problem["text"] for problem in problems] == ["Show your work.\n1. 2 + 2", "3 + 3"]
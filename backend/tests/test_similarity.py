@@ -0,0 +1,130 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.embeddings import HashingEmbedder, problem_quantities, same_quantities
+from app.services.similarity_index import SimilarityIndex
+
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder(dim=256)
+
+
+def similarity(embedder, a: str, b: str) -> float:
+    return float(embedder.embed_sync(a) @ embedder.embed_sync(b))
+
+
+def test_hashing_embedder_is_deterministic_and_unit_length(embedder):
+    vector = embedder.embed_sync("Solve 2x + 3 = 7")
+    assert np.array_equal(vector, HashingEmbedder(dim=256).embed_sync("Solve 2x + 3 = 7"))
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+    assert not embedder.embed_sync("   ").any()
+
+
+@pytest.mark.parametrize("a, b", [
+    ("1. Solve 2x + 3 = 7", "3) solve  2x + 3 = 7"),
+    ("Q4: What is 3/4 + 1/8?", "what is 3/4 + 1/8?"),
+])
+def test_relabelled_copies_pass_the_threshold(embedder, a, b):
+    assert similarity(embedder, a, b) >= settings.SIMILARITY_THRESHOLD
+
+
+def test_unrelated_problems_stay_below_the_threshold(embedder):
+    assert similarity(embedder, "Explain photosynthesis in plants", "Solve 2x + 3 = 7") < settings.SIMILARITY_THRESHOLD
+
+
+@pytest.mark.parametrize("a, b, same", [
+    ("2x+3=7", "2x+3=9", False),
+    ("A train travels 60 km in 5 hours. What is its speed?", "A train travels 60 km in 7 hours. What is its speed?", False),
+    ("24 apples, 1/3 are eaten", "36 apples, 1/4 are eaten", False),
+    ("2x + 3 = 7", "2x+3=7", True),
+    ("1. Solve 2x + 3 = 7", "Problem 5: solve 2x + 3 = 7", True),
+    ("Add 1,200 and 3 × 4", "Add 1200 and 3 * 4", True),
+    ("What is 2.50 + 1?", "What is 2.5 + 1?", True),
+    ("Explain photosynthesis.", "Explain photosynthesis", True),
+])
+def test_same_quantities(a, b, same):
+    assert same_quantities(a, b) is same
+
+
+def test_number_changes_can_score_above_the_threshold(embedder):
+    # Why reuse needs the quantity gate: the embedding alone would accept this pair
+    a = "A train travels 60 km in 5 hours. What is its speed?"
+    b = "A train travels 60 km in 7 hours. What is its speed?"
+    assert similarity(embedder, a, b) >= settings.SIMILARITY_THRESHOLD
+    assert not same_quantities(a, b)
+
+
+def test_problem_quantities_normalizes_numbers_and_operators():
+    assert problem_quantities("3. Add 1,200.50 × 007") == ("1200.5", "*", "7")
+
+
+def build_index(embedder, texts, path=None):
+    index = SimilarityIndex(embedder.dim, path=path)
+    ids = []
+    for seq, text in enumerate(texts, 1):
+        submission_id = uuid.uuid4()
+        index.add(seq, submission_id, seq - 1, embedder.embed_sync(text))
+        ids.append(submission_id)
+    return index, ids
+
+
+TEXTS = ["Solve 2x + 3 = 7", "Explain photosynthesis in plants", "Convert 5 km to m", "What is 3/4 + 1/8?"]
+
+
+def test_index_search_returns_the_nearest_rows_best_first(embedder):
+    index, ids = build_index(embedder, TEXTS)
+    assert len(index) == len(TEXTS)
+    matches = index.search(embedder.embed_sync("2. solve 2x + 3 = 7"), k=2)
+    assert [m.submission_id for m in matches][0] == ids[0]
+    assert matches[0].problem_index == 0
+    assert matches[0].score == pytest.approx(1.0, abs=1e-5)
+    assert matches[0].score >= matches[1].score
+    assert SimilarityIndex(embedder.dim).search(embedder.embed_sync("x")) == []
+
+
+def test_index_grows_past_its_initial_capacity(embedder):
+    texts = [f"Problem about {n} marbles" for n in range(1500)]
+    index, ids = build_index(embedder, texts)
+    assert len(index) == 1500
+    assert index.search(embedder.embed_sync(texts[1400]), k=1)[0].submission_id == ids[1400]
+
+
+def test_save_and_memory_mapped_load_round_trip(embedder, tmp_path):
+    index, ids = build_index(embedder, TEXTS, path=tmp_path)
+    index.save(embedder.name, max_seq=3)  # The last row is past the cursor and left out
+
+    loaded = SimilarityIndex(embedder.dim, path=tmp_path)
+    assert loaded.load(embedder.name)
+    assert isinstance(loaded._base, np.memmap)
+    assert len(loaded) == 3 and loaded.max_seq == 3
+    match = loaded.search(embedder.embed_sync("Convert 5 km to m"), k=1)[0]
+    assert (match.submission_id, match.problem_index) == (ids[2], 2)
+
+    # Rows added after loading are searched alongside the snapshot
+    loaded.add(4, ids[3], 3, embedder.embed_sync(TEXTS[3]))
+    assert loaded.search(embedder.embed_sync(TEXTS[3]), k=1)[0].submission_id == ids[3]
+
+
+def test_load_rejects_other_embedders_and_inconsistent_snapshots(embedder, tmp_path):
+    index, _ = build_index(embedder, TEXTS, path=tmp_path)
+    index.save(embedder.name)
+    assert not SimilarityIndex(embedder.dim, path=tmp_path).load("openai")
+    assert not SimilarityIndex(128, path=tmp_path).load(embedder.name)
+
+    snapshot = tmp_path / "snapshots" / (tmp_path / "CURRENT").read_text()
+    np.save(snapshot / "keys.npy", np.load(snapshot / "keys.npy")[:2])
+    assert not SimilarityIndex(embedder.dim, path=tmp_path).load(embedder.name)
+
+
+def test_each_save_publishes_a_complete_snapshot(embedder, tmp_path):
+    index, _ = build_index(embedder, TEXTS, path=tmp_path)
+    for _ in range(3):
+        index.save(embedder.name)
+    # The current snapshot and the one before it are kept
+    assert len(list((tmp_path / "snapshots").iterdir())) == 2
+    loaded = SimilarityIndex(embedder.dim, path=tmp_path)
+    assert loaded.load(embedder.name) and len(loaded) == len(TEXTS)
@@ -0,0 +1,58 @@
+import pytest
+
+from app.config import settings
+from app.services.ocr import OCRService
+from app.text_cleaning import CLEAN_VERSION, CLEANERS, clean_text
+from app.text_storage import compact_problems, compress_text, decompress_text, expand_problem, expand_problems, is_compressed
+
+LONG = "A train leaves the station at 9:00 and travels   at 60 km/h. " * 6  # Longer than PROBLEM_TEXT_INLINE_CHARS
+
+WORKSHEETS = [
+    "1. Solve 2x + 3 = 7\n2. What is 3/4 + 1/8?\n3. Convert 5 km to m",
+    f"Worksheet 4\n\n1. {LONG}\n   a) How far does it go by noon?\n   b) {LONG}\n2. Explain why the moon has phases.",
+    f"Q1: {LONG}\n\n\n\nQ2:   {LONG}  \t  \nQ3: Simplify 2(x + 3) – 4 @@ ##",
+    "Find the area.\nA. 12\nB. 15\nC. 18\nD. 21",
+    "Just one problem with no markers, but   irregular   spacing.",
+]
+
+
+@pytest.mark.parametrize("text", WORKSHEETS)
+def test_compacted_problems_expand_to_the_parsed_problems(text):
+    problems = OCRService.detect_problems(text)
+    compacted = compact_problems(text, problems)
+    assert expand_problems(text, compacted) == problems
+
+
+def test_only_long_problems_are_stored_as_offsets():
+    text = WORKSHEETS[1]
+    compacted = compact_problems(text, OCRService.detect_problems(text))
+    for problem in compacted:
+        if "text" in problem:
+            assert len(problem["text"]) <= settings.PROBLEM_TEXT_INLINE_CHARS or "text_span" not in problem
+        else:
+            assert problem["end"] - problem["start"] > settings.PROBLEM_TEXT_INLINE_CHARS
+    assert {problem.get("text_span") for problem in compacted} >= {CLEAN_VERSION}
+
+
+def test_problems_stored_before_versioning_still_expand():
+    span = f"  {LONG}\t"
+    problem = {"start": 0, "end": len(span), "order": 0, "text_span": "clean"}
+    assert expand_problem(span, problem)["text"] == clean_text(span)
+    assert CLEANERS["clean"] is CLEANERS[CLEAN_VERSION]
+
+
+def test_text_that_is_not_a_slice_keeps_its_text():
+    problems = [{"text": "Rewritten " + LONG, "start": 0, "end": 10, "order": 0}]
+    assert compact_problems(LONG, problems) == problems
+
+
+def test_ocr_cleaning_is_the_shared_cleaner():
+    text = "Q1:   2x  +  3 = 7 @@\n\n\n\n  next\tline  "
+    assert OCRService.clean_text(text) == clean_text(text) == "Q1: 2x + 3 = 7\n\nnext line"
+
+
+@pytest.mark.parametrize("text", ["short", LONG * 5, "Ünïcödé √2 × π " * 40])
+def test_compress_round_trip(text):
+    data = compress_text(text)
+    assert is_compressed(data) == (len(text.encode()) >= settings.TEXT_COMPRESSION_MIN_BYTES)
+    assert decompress_text(data) == text